@@ -0,0 +1,197 @@
+"""
+Benchmark of the member cache policies
+
+Builds discord.py's connection state for a synthetic server, answers its
+member chunk requests and member fetches from a fake gateway, and measures
+for each policy in members.policies how long startup takes and how much
+memory the process holds after startup, after the commands that need every
+member, and after voters are looked up one at a time. Each policy runs in
+its own process so one policy's cache can't inflate another's memory.
+
+run from the src directory:
+    python -m benchmarks.member_cache --members 100000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import discord
+
+import members
+
+guild_id = 1000
+bot_id = 1
+# member ids start here, after the bot and the server's own ids
+first_member_id = 10000
+# discord sends a server's members in chunks of at most this many
+chunk_size = 1000
+
+
+def member_payload(user_id, bot=False):
+    return {"user": {"id": str(user_id), "username": "member" + str(user_id),
+                     "discriminator": "0", "global_name": None,
+                     "avatar": None, "bot": bot},
+            "roles": [], "joined_at": "2023-01-01T00:00:00+00:00",
+            "deaf": False, "mute": False, "flags": 0}
+
+
+def guild_payload(member_count):
+    """
+    a large server of the bot and member_count others as it arrives on
+    connecting, without its member list
+    """
+    return {"id": str(guild_id), "name": "benchmark",
+            "member_count": member_count + 1, "large": True, "features": [],
+            "roles": [{"id": str(guild_id), "name": "@everyone",
+                       "permissions": "0", "position": 0, "color": 0,
+                       "hoist": False, "managed": False,
+                       "mentionable": False}],
+            "channels": [], "members": [member_payload(bot_id, bot=True)]}
+
+
+class FakeDiscord:
+    """
+    Stands in for the gateway and the http api, answering chunk requests
+    and member fetches with synthetic members
+    """
+
+    def __init__(self, state, member_count):
+        self.state = state
+        self.member_count = member_count
+        self.fetches = 0
+
+    async def request_chunks(self, guild_id, query="", limit=0,
+                             presences=False, nonce=None):
+        # the chunks arrive after the request, as they would from discord
+        asyncio.get_running_loop().call_soon(self.send_chunks, guild_id,
+                                             nonce)
+
+    def send_chunks(self, guild_id, nonce):
+        chunk_count = max(1, -(-self.member_count // chunk_size))
+        for index in range(chunk_count):
+            start = first_member_id + index * chunk_size
+            end = min(start + chunk_size, first_member_id + self.member_count)
+            payloads = [member_payload(user_id)
+                        for user_id in range(start, end)]
+            if index == 0:
+                payloads.append(member_payload(bot_id, bot=True))
+            self.state.parse_guild_members_chunk({
+                "guild_id": str(guild_id), "nonce": nonce,
+                "chunk_index": index, "chunk_count": chunk_count,
+                "members": payloads})
+
+    async def get_member(self, guild_id, member_id):
+        self.fetches += 1
+        return member_payload(member_id)
+
+
+def rss_bytes():
+    """
+    :return: the resident memory of this process
+    :rtype: int
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # the peak is the best there is without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def run_policy(policy, member_count, lookups):
+    """
+    :return: the measurements for one policy
+    :rtype: dict
+    """
+    intents = discord.Intents.default()
+    intents.members = True
+    client = discord.Client(
+        intents=intents, member_cache_flags=members.cache_flags(policy),
+        chunk_guilds_at_startup=members.chunk_at_startup(policy))
+    state = client._connection
+    state.loop = asyncio.get_running_loop()
+    fake = FakeDiscord(state, member_count)
+    client.ws = fake
+    state.http = fake
+    state.user = discord.ClientUser(state=state,
+                                    data=member_payload(bot_id)["user"])
+    lookup = members.MemberLookup(policy)
+    gc.collect()
+    r_val = {"policy": policy, "baseline": rss_bytes()}
+
+    start = time.perf_counter()
+    guild = state._add_guild_from_data(guild_payload(member_count))
+    if state._guild_needs_chunking(guild):
+        await state.chunk_guild(guild)
+    r_val["startup_seconds"] = time.perf_counter() - start
+    gc.collect()
+    r_val["startup"] = rss_bytes()
+
+    start = time.perf_counter()
+    for _ in range(2):
+        # ?purgemembers and ?startpoll
+        found = len(await lookup.all_members(guild))
+    r_val["all_members_seconds"] = (time.perf_counter() - start) / 2
+    gc.collect()
+    r_val["after_all_members"] = rss_bytes()
+
+    start = time.perf_counter()
+    for i in range(lookups):
+        # every voter is looked up twice, the second time from the cache
+        await lookup.get_member(guild, first_member_id + i // 2)
+    r_val["lookup_seconds"] = time.perf_counter() - start
+    gc.collect()
+    r_val["after_lookups"] = rss_bytes()
+
+    r_val["cached"] = len(guild.members)
+    r_val["found"] = found
+    r_val["fetches"] = fake.fetches
+    return r_val
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="member cache policy benchmark")
+    parser.add_argument("--members", type=int, default=100000,
+                        help="how many members the server has")
+    parser.add_argument("--lookups", type=int, default=2000,
+                        help="how many single member lookups to make")
+    parser.add_argument("--policy", choices=members.policies,
+                        help="run only this policy in this process and "
+                             + "print its measurements as json")
+    args = parser.parse_args()
+
+    if args.policy is not None:
+        print(json.dumps(asyncio.run(run_policy(args.policy, args.members,
+                                                args.lookups))))
+        return
+
+    print("{:<6} {:>9} {:>10} {:>10} {:>10} {:>10} {:>8} {:>8}".format(
+        "policy", "startup", "rss start", "rss all", "rss end", "all",
+        "cached", "fetches"))
+    for policy in members.policies:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.member_cache",
+             "--policy", policy, "--members", str(args.members),
+             "--lookups", str(args.lookups)],
+            check=True, capture_output=True, text=True).stdout
+        result = json.loads(output)
+        baseline = result["baseline"]
+        print("{:<6} {:>8.3f}s {:>7.1f}MiB {:>7.1f}MiB {:>7.1f}MiB "
+              "{:>9.3f}s {:>8} {:>8}".format(
+                  policy, result["startup_seconds"],
+                  (result["startup"] - baseline) / 2 ** 20,
+                  (result["after_all_members"] - baseline) / 2 ** 20,
+                  (result["after_lookups"] - baseline) / 2 ** 20,
+                  result["all_members_seconds"], result["cached"],
+                  result["fetches"]))
+
+
+if __name__ == "__main__":
+    main()
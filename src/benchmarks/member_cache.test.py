@@ -0,0 +1,21 @@
+import asyncio
+import unittest
+from benchmarks import member_cache
+
+
+class TestMemberCacheBenchmark(unittest.TestCase):
+
+    def test_policies(self):
+        results = {policy: asyncio.run(member_cache.run_policy(policy, 2500, 10))
+                   for policy in member_cache.members.policies}
+        for result in results.values():
+            self.assertEqual(result["found"], 2501)
+        self.assertEqual(results["full"]["cached"], 2501)
+        self.assertEqual(results["lazy"]["cached"], 2501)
+        self.assertEqual(results["lean"]["cached"], 1)
+        self.assertEqual(results["full"]["fetches"], 0)
+        self.assertEqual(results["lean"]["fetches"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
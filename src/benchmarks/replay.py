@@ -0,0 +1,537 @@
+"""
+Replays a recording made by recorder.Recorder against the bot's commands
+and cogs, offline, and reports throughput and latency
+
+Every command in the recording is sent through the bot's own command
+handling at the time it was recorded, scaled by --speed, with fake discord
+objects standing in for servers, channels, members and messages and
+storage.MemoryStorage for the saved data. The event loop's clock runs
+--speed times as fast as the real one, so the sleeps in commands,
+countdowns and confirmation timeouts are sped up along with the recording.
+Every api call a fake makes takes --latency seconds on that clock.
+
+run from the src directory:
+    python -m benchmarks.replay recordings/commands-20241014-180000.jsonl.gz \
+        --speed 10 --latency 0.1
+"""
+import argparse
+import asyncio
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+import re
+import selectors
+import time
+
+from discord.ext import commands
+
+import recorder
+import storage
+from voting import electorate
+
+# the ids the fakes make up start here, above any number in a recording
+first_new_id = 10 ** 9
+mention = re.compile(r"<@!?(\d+)>")
+
+
+class World:
+    """
+    The servers, channels and users of a replay, and a count of the api
+    calls made to them
+
+    :param latency: how long every api call takes, in seconds
+    :type latency: float
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.api_calls = Counter()
+        self.new_ids = iter(range(first_new_id, first_new_id * 2))
+        self.guilds = dict()
+        self.channels = dict()
+        self.users = dict()
+        # parent channel id to the ids of the threads commands will create
+        self.threads = defaultdict(deque)
+        self.bot_user = FakeUser(self, next(self.new_ids), bot=True)
+
+    async def api(self, name):
+        self.api_calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def new_id(self):
+        return next(self.new_ids)
+
+    def add_guild(self, entry):
+        guild = FakeGuild(self, entry["guild"], entry["roles"])
+        for channel_id, name, category in entry["channels"]:
+            self.channels[channel_id] = FakeChannel(self, channel_id, name,
+                                                    guild, category)
+            if category is not None:
+                guild.category(category)
+        self.guilds[guild.id] = guild
+
+    def add_user(self, entry):
+        if "guild" not in entry:
+            self.users[entry["user"]] = FakeUser(
+                self, entry["user"], entry["age"], entry.get("bot", False))
+            return
+        guild = self.guilds[entry["guild"]]
+        guild.members_by_id[entry["user"]] = FakeMember(
+            self, entry["user"], guild, entry.get("roles", []),
+            entry["age"], entry.get("early", False),
+            entry.get("bot", False))
+        self.users.setdefault(entry["user"], FakeUser(
+            self, entry["user"], entry["age"], entry.get("bot", False)))
+
+    def add_thread(self, entry):
+        if "t" in entry:
+            self.threads[entry["parent"]].append(entry["thread"])
+        else:
+            self.make_thread(entry["parent"], entry["thread"])
+
+    def make_thread(self, parent_id, thread_id=None, name="thread"):
+        parent = self.channels[parent_id]
+        if thread_id is None:
+            thread_id = self.new_id()
+        thread = FakeChannel(self, thread_id, name, parent.guild,
+                             parent.category_name, parent_id)
+        self.channels[thread_id] = thread
+        return thread
+
+    def dm_channel(self, user_id, channel_id=None):
+        user = self.users[user_id]
+        if user.dm is None:
+            if channel_id is None:
+                channel_id = self.new_id()
+            user.dm = FakeChannel(self, channel_id, None, None, None)
+            self.channels[channel_id] = user.dm
+        return user.dm
+
+    def author(self, entry):
+        if "guild" in entry:
+            return self.guilds[entry["guild"]].members_by_id[entry["user"]]
+        return self.users[entry["user"]]
+
+    def channel(self, entry):
+        if "guild" in entry:
+            return self.channels[entry["channel"]]
+        return self.dm_channel(entry["user"], entry["channel"])
+
+    def message(self, entry, content):
+        channel = self.channel(entry)
+        return FakeMessage(self, channel, self.author(entry), content)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    async def fetch_user(self, user_id):
+        await self.api("fetch_user")
+        return self.users[user_id]
+
+
+class FakeRole:
+    def __init__(self, id, name, guild):
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.mention = "<@&" + str(id) + ">"
+
+
+class FakeCategory:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class FakeGuild:
+    def __init__(self, world, id, role_names):
+        self.world = world
+        self.id = id
+        self.roles = [FakeRole(id, "@everyone", self)]
+        for name in role_names[1:]:
+            self.roles.append(FakeRole(world.new_id(), name, self))
+        self.categories = []
+        self.members_by_id = dict()
+        self.chunked = True
+
+    @property
+    def channels(self):
+        return [channel for channel in self.world.channels.values()
+                if channel.guild is self]
+
+    text_channels = channels
+
+    @property
+    def members(self):
+        return list(self.members_by_id.values())
+
+    @property
+    def me(self):
+        return self.world.bot_user
+
+    def role(self, name):
+        for role in self.roles:
+            if role.name == name:
+                return role
+        role = FakeRole(self.world.new_id(), name, self)
+        self.roles.append(role)
+        return role
+
+    def category(self, name):
+        for category in self.categories:
+            if category.name == name:
+                return category
+        category = FakeCategory(self.world.new_id(), name)
+        self.categories.append(category)
+        return category
+
+    def get_member(self, user_id):
+        return self.members_by_id.get(user_id)
+
+    async def fetch_member(self, user_id):
+        await self.world.api("fetch_member")
+        return self.members_by_id[user_id]
+
+    async def chunk(self, cache=True):
+        await self.world.api("chunk")
+        return self.members
+
+
+class FakeChannel:
+    """
+    A text channel, thread or dm channel, which has no guild
+    """
+
+    def __init__(self, world, id, name, guild, category_name,
+                 parent_id=None):
+        self.world = world
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.category_name = category_name
+        self.parent_id = parent_id
+        self.mention = "<#" + str(id) + ">"
+        self.messages = []
+
+    @property
+    def category(self):
+        if self.guild is None or self.category_name is None:
+            return None
+        return self.guild.category(self.category_name)
+
+    @property
+    def category_id(self):
+        category = self.category
+        return None if category is None else category.id
+
+    async def send(self, content=None, **kwargs):
+        await self.world.api("send")
+        message = FakeMessage(self.world, self, self.world.bot_user, content)
+        self.messages.append(message)
+        return message
+
+    async def create_thread(self, name=None, **kwargs):
+        await self.world.api("create_thread")
+        waiting = self.world.threads[self.id]
+        return self.world.make_thread(
+            self.id, waiting.popleft() if waiting else None, name)
+
+    async def history(self, limit=100):
+        for message in reversed(self.messages[-limit:]):
+            yield message
+
+
+class FakeUser:
+    def __init__(self, world, id, age=365, bot=False):
+        self.world = world
+        self.id = id
+        self.name = "user" + str(id)
+        self.display_name = self.name
+        self.mention = "<@" + str(id) + ">"
+        self.bot = bot
+        self.created_at = datetime.now(timezone.utc) - timedelta(days=age)
+        self.dm = None
+
+    async def send(self, content=None, **kwargs):
+        return await self.world.dm_channel(self.id).send(content, **kwargs)
+
+
+class FakeMember(FakeUser):
+    def __init__(self, world, id, guild, role_names, age, early, bot=False):
+        super().__init__(world, id, age, bot)
+        self.guild = guild
+        self.roles = [guild.roles[0]] + [guild.role(name)
+                                         for name in role_names]
+        # just either side of the cutoff
+        self.joined_at = electorate.join_cutoff + timedelta(
+            days=-1 if early else 1)
+
+    async def add_roles(self, *roles, **kwargs):
+        await self.world.api("add_roles")
+        self.roles.extend(role for role in roles if role not in self.roles)
+
+    async def remove_roles(self, *roles, **kwargs):
+        await self.world.api("remove_roles")
+        self.roles = [role for role in self.roles if role not in roles]
+
+    async def edit(self, roles=None, **kwargs):
+        await self.world.api("edit_member")
+        if roles is not None:
+            self.roles = [self.guild.roles[0]] + list(roles)
+
+
+class FakeMessage:
+    # commands.Context keeps the message's connection state, which only
+    # its own send uses
+    _state = None
+
+    def __init__(self, world, channel, author, content):
+        self.world = world
+        self.id = world.new_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content or ""
+        self.attachments = []
+        self.mentions = []
+        if self.guild is not None:
+            self.mentions = [
+                member for member in
+                (self.guild.get_member(int(user_id))
+                 for user_id in mention.findall(self.content))
+                if member is not None]
+
+    async def edit(self, content=None, **kwargs):
+        await self.world.api("edit")
+        if content is not None:
+            self.content = content
+        return self
+
+    async def delete(self):
+        await self.world.api("delete")
+
+    async def add_reaction(self, emoji):
+        await self.world.api("add_reaction")
+
+    async def pin(self):
+        await self.world.api("pin")
+
+
+class ReplayContext(commands.Context):
+    """
+    Sends through the fake channel rather than discord's http client
+    """
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class ScaledSelector:
+    """
+    Waits for io for a timeout on the scaled clock
+    """
+
+    def __init__(self, selector, speed):
+        self.selector = selector
+        self.speed = speed
+
+    def select(self, timeout=None):
+        return self.selector.select(None if timeout is None
+                                    else timeout / self.speed)
+
+    def __getattr__(self, name):
+        return getattr(self.selector, name)
+
+
+class ScaledLoop(asyncio.SelectorEventLoop):
+    """
+    An event loop whose clock runs speed times as fast as the real one
+    """
+
+    def __init__(self, speed):
+        super().__init__(ScaledSelector(selectors.DefaultSelector(), speed))
+        self.speed = speed
+
+    def time(self):
+        return super().time() * self.speed
+
+
+class Replayer:
+    """
+    Runs a recording's commands against the bot
+
+    :param bot: the bot, with its cogs added
+    :param world: the fakes the commands run against
+    :type world: World
+    """
+
+    def __init__(self, bot, confirmations, world):
+        self.bot = bot
+        self.confirmations = confirmations
+        self.world = world
+        # command name to the real seconds from when each was due until it
+        # finished
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+
+    async def command_error(self, ctx, error):
+        self.errors[type(error).__name__] += 1
+
+    async def run_entry(self, entry, due):
+        if "answer" in entry:
+            message = self.world.message(entry, entry["answer"])
+            await self.confirmations.on_message(message)
+            name = "(" + entry["answer"] + ")"
+        else:
+            message = self.world.message(entry, entry["text"])
+            ctx = await self.bot.get_context(message, cls=ReplayContext)
+            await self.bot.invoke(ctx)
+            name = entry["cmd"]
+        self.latencies[name].append(time.perf_counter() - due)
+
+    async def run(self, entries):
+        """
+        replays the entries at their recorded times
+
+        :param entries: the recording, from recorder.read
+        :type entries: list
+        :return: how many real seconds the replay took
+        :rtype: float
+        """
+        for entry in entries:
+            if "channels" in entry:
+                self.world.add_guild(entry)
+            elif "user" in entry and "t" not in entry:
+                self.world.add_user(entry)
+            elif "thread" in entry:
+                self.world.add_thread(entry)
+
+        loop = asyncio.get_running_loop()
+        speed = getattr(loop, "speed", 1)
+        start = loop.time()
+        real_start = time.perf_counter()
+        tasks = []
+        for entry in entries:
+            if "t" not in entry or "thread" in entry:
+                continue
+            delay = start + entry["t"] - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            due = real_start + entry["t"] / speed
+            tasks.append(asyncio.create_task(self.run_entry(entry, due)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - real_start
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def add_cogs(bot, world):
+    """
+    adds the cogs to the bot from main, running against the fakes and in
+    memory storage
+
+    :return: the confirmations cog
+    """
+    from confirmations import Confirmations
+    from members import MemberLookup
+    from races import Races
+    from roles import Roles
+    from voting.polls import Polls
+
+    bot._connection.user = world.bot_user
+    bot.get_channel = world.get_channel
+    bot.get_user = world.get_user
+    bot.fetch_user = world.fetch_user
+    bot_storage = storage.MemoryStorage()
+    await bot.add_cog(Races(bot, bot_storage))
+    await bot.add_cog(Roles(bot))
+    confirmations = Confirmations(bot, bot_storage)
+    await bot.add_cog(confirmations)
+    await bot.add_cog(Polls(bot, bot_storage, confirmations,
+                            MemberLookup("lean")))
+    return confirmations
+
+
+async def replay(entries, latency=0):
+    """
+    :param entries: the recording, from recorder.read
+    :type entries: list
+    :param latency: how long every api call takes, in seconds
+    :type latency: float
+    :return: the replayer after the replay, and how long it took
+    :rtype: tuple
+    """
+    # main's bot carries the commands that aren't in a cog
+    import main
+
+    world = World(latency)
+    async with main.bot as bot:
+        confirmations = await add_cogs(bot, world)
+        replayer = Replayer(bot, confirmations, world)
+        bot.on_command_error = replayer.command_error
+        seconds = await replayer.run(entries)
+        for cog in list(bot.cogs):
+            await bot.remove_cog(cog)
+    return replayer, seconds
+
+
+def run(entries, speed=1, latency=0):
+    """
+    replays a recording on an event loop sped up by speed
+
+    :rtype: tuple
+    """
+    with asyncio.Runner(loop_factory=lambda: ScaledLoop(speed)) as runner:
+        return runner.run(replay(entries, latency))
+
+
+def report(replayer, seconds):
+    """
+    :return: the throughput and latency of a replay, as lines of text
+    :rtype: list
+    """
+    every = [latency for latencies in replayer.latencies.values()
+             for latency in latencies]
+    lines = ["{} commands in {:.2f}s, {:.1f}/s, {} failed, {} api calls"
+             .format(len(every), seconds, len(every) / max(seconds, 1e-9),
+                     sum(replayer.errors.values()),
+                     sum(replayer.world.api_calls.values()))]
+    lines.append("{:<20} {:>6} {:>9} {:>9} {:>9}".format(
+        "command", "count", "p50 ms", "p95 ms", "max ms"))
+    rows = sorted(replayer.latencies.items(), key=lambda row: -len(row[1]))
+    if every:
+        rows.insert(0, ("all", every))
+    for name, latencies in rows:
+        lines.append("{:<20} {:>6} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+            name, len(latencies), percentile(latencies, 0.5) * 1000,
+            percentile(latencies, 0.95) * 1000, max(latencies) * 1000))
+    for name, count in replayer.errors.most_common():
+        lines.append("failed with " + name + ": " + str(count))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="replay recorded commands against the bot")
+    parser.add_argument("recording", help="a recording from the recorder")
+    parser.add_argument("--speed", type=float, default=1,
+                        help="how many times as fast as recorded to replay")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="seconds every fake api call takes, on the "
+                             + "recording's clock")
+    args = parser.parse_args()
+
+    replayer, seconds = run(recorder.read(args.recording), args.speed,
+                            args.latency)
+    for line in report(replayer, seconds):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
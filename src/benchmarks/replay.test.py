@@ -0,0 +1,54 @@
+import unittest
+from benchmarks import replay
+
+# a race in a thread of race-organization, as the recorder writes it
+recording = [
+    {"guild": 1, "channels": [[2, "race-organization", "races"],
+                              [3, "general", None]],
+     "roles": ["@everyone", "Admin"]},
+    {"user": 4, "guild": 1, "roles": [], "age": 400, "early": True},
+    {"user": 5, "guild": 1, "roles": ["Admin"], "age": 30, "early": False},
+    {"t": 0.0, "cmd": "startrace", "text": "?startrace ff1 race",
+     "user": 4, "channel": 2, "guild": 1},
+    {"t": 0.1, "thread": 6, "parent": 2},
+    {"t": 6.0, "cmd": "join", "text": "?join", "user": 4, "channel": 6,
+     "guild": 1},
+    {"t": 6.5, "cmd": "join", "text": "?join", "user": 5, "channel": 6,
+     "guild": 1},
+    {"t": 7.0, "cmd": "ready", "text": "?ready", "user": 4, "channel": 6,
+     "guild": 1},
+    {"t": 7.5, "cmd": "ready", "text": "?r", "user": 5, "channel": 6,
+     "guild": 1},
+    {"t": 8.0, "cmd": "lockrace", "text": "?lockrace", "user": 5,
+     "channel": 3, "guild": 1},
+]
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_race(self):
+        replayer, seconds = replay.run(recording, speed=100, latency=0.05)
+        self.assertEqual(sum(len(latencies) for latencies
+                             in replayer.latencies.values()), 6)
+        self.assertEqual(len(replayer.latencies["join"]), 2)
+        # lockrace isn't run outside a race
+        self.assertEqual(sum(replayer.errors.values()), 1)
+        self.assertLess(seconds, 5)
+
+        thread = replayer.world.channels[6]
+        sent = [message.content for message in thread.messages]
+        self.assertIn("go!", sent)
+        self.assertEqual(sent[-11:], [str(10 - i) for i in range(10)]
+                         + ["go!"])
+        self.assertEqual(replayer.world.api_calls["create_thread"], 1)
+
+    def test_report(self):
+        replayer, seconds = replay.run(recording[:4], speed=100)
+        lines = replay.report(replayer, seconds)
+        self.assertTrue(lines[0].startswith("1 commands in"))
+        self.assertTrue(lines[2].startswith("all"))
+        self.assertTrue(lines[3].startswith("startrace"))
+
+
+if __name__ == "__main__":
+    unittest.main()
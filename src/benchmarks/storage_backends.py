@@ -0,0 +1,144 @@
+"""
+Benchmark of the storage backends
+
+Runs the same workload against every backend in storage.py: saving a set
+of polls at once, loading them all back as the bot does on startup,
+reading a batch of them, saving one poll per ballot as voters submit, and
+archiving ended polls in transactions. Redis is skipped if it can't be
+reached, and only the benchmark's own keys are written to it.
+
+run from the src directory:
+    python -m benchmarks.storage_backends --polls 200 --saves 5000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import storage
+
+backends = ("memory", "sqlite", "redis")
+# put in front of the benchmark's redis hash names, away from the bot's
+redis_prefix = "benchmark:"
+
+
+def open_backend(backend, directory):
+    """
+    :param directory: where sqlite puts its file
+    :type directory: str
+    :return: the backend's storage, or None if it isn't available
+    :rtype: storage.Storage or None
+    """
+    if backend == "memory":
+        return storage.MemoryStorage()
+    if backend == "sqlite":
+        return storage.SqliteStorage(os.path.join(directory, "bench.sqlite3"))
+    try:
+        import redis
+    except ImportError:
+        return None
+    client = redis.StrictRedis(
+        host=os.environ.get("REDIS_HOST", "localhost"),
+        port=int(os.environ.get("REDIS_PORT", "6379")),
+        decode_responses=False)
+    try:
+        client.ping()
+    except redis.RedisError:
+        return None
+    return storage.RedisStorage(client, redis_prefix)
+
+
+def run_workload(db, polls, saves, poll_bytes, seed=1):
+    """
+    :param db: the storage to run against, its "voting" and
+        "voting_archive" namespaces are cleared
+    :type db: storage.Storage
+    :param polls: how many polls are saved
+    :type polls: int
+    :param saves: how many single poll saves are made
+    :type saves: int
+    :param poll_bytes: how large a saved poll is
+    :type poll_bytes: int
+    :return: seconds taken by each part of the workload, and what was read
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    ids = [str(10 ** 17 + i) for i in range(polls)]
+    data = {id: rng.randbytes(poll_bytes) for id in ids}
+    db.clear("voting")
+    db.clear("voting_archive")
+    r_val = dict()
+
+    start = time.perf_counter()
+    db.put_many("voting", data)
+    r_val["put_many"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = db.get_all("voting")
+    r_val["get_all"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = db.get_many("voting", rng.sample(ids, len(ids) // 2))
+    r_val["get_many"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(saves):
+        db.put("voting", rng.choice(ids), data[rng.choice(ids)])
+    r_val["put"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for id in ids[:len(ids) // 2]:
+        with db.transaction() as transaction:
+            transaction.put("voting_archive", id, data[id])
+            transaction.delete("voting", id)
+    r_val["archive"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for id in rng.sample(ids[:len(ids) // 2], len(ids) // 4):
+        db.get("voting_archive", id)
+    r_val["get"] = time.perf_counter() - start
+
+    r_val["loaded"] = len(loaded)
+    r_val["batch"] = len(batch)
+    r_val["open"] = len(db.get_all("voting"))
+    r_val["archived"] = len(db.get_all("voting_archive"))
+    db.clear("voting")
+    db.clear("voting_archive")
+    return r_val
+
+
+def main():
+    parser = argparse.ArgumentParser(description="storage backend benchmark")
+    parser.add_argument("--polls", type=int, default=200,
+                        help="how many polls are saved")
+    parser.add_argument("--saves", type=int, default=5000,
+                        help="how many single poll saves are made")
+    parser.add_argument("--poll-bytes", type=int, default=20000,
+                        help="how large a saved poll is")
+    parser.add_argument("--backends", default=",".join(backends),
+                        help="comma separated backends to run, from "
+                             + ",".join(backends))
+    args = parser.parse_args()
+
+    parts = ("put_many", "get_all", "get_many", "put", "archive", "get")
+    print("{:<7}".format("backend")
+          + "".join("{:>10}".format(part) for part in parts))
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends.lower().split(","):
+            db = open_backend(backend, directory)
+            if db is None:
+                print("{:<7} unavailable".format(backend))
+                continue
+            try:
+                result = run_workload(db, args.polls, args.saves,
+                                      args.poll_bytes)
+            finally:
+                db.close()
+            print("{:<7}".format(backend)
+                  + "".join("{:>9.3f}s".format(result[part])
+                            for part in parts))
+
+
+if __name__ == "__main__":
+    main()
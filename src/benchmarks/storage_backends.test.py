@@ -0,0 +1,23 @@
+import tempfile
+import unittest
+from benchmarks import storage_backends
+
+
+class TestStorageBackendsBenchmark(unittest.TestCase):
+
+    def test_same_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for backend in ("memory", "sqlite"):
+                db = storage_backends.open_backend(backend, directory)
+                try:
+                    result = storage_backends.run_workload(db, 20, 50, 100)
+                finally:
+                    db.close()
+                self.assertEqual(result["loaded"], 20)
+                self.assertEqual(result["batch"], 10)
+                self.assertEqual(result["open"], 10)
+                self.assertEqual(result["archived"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+"""
+Benchmark and regression suite for STV counting
+
+Generates synthetic ranked electorates, times StvElection.get_winners on
+them and compares the winners against stored golden results, so speedups
+to the count can not change who gets elected.
+
+run from the src directory:
+    python -m benchmarks.stv --sizes 1k,100k --memory
+"""
+import argparse
+import bisect
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from voting.ffrvoter import FFRVoter
+from voting.stv_election import StvElection
+
+golden_path = os.path.join(os.path.dirname(__file__), "golden", "stv.json")
+
+scenarios = [
+    {"name": "ic-1k-5c-1s", "model": "impartial", "ballots": 1000,
+     "candidates": 5, "seats": 1, "seed": 1},
+    {"name": "ic-1k-20c-3s", "model": "impartial", "ballots": 1000,
+     "candidates": 20, "seats": 3, "seed": 2, "truncate": True},
+    {"name": "mallows-1k-10c-2s", "model": "mallows", "ballots": 1000,
+     "candidates": 10, "seats": 2, "seed": 3, "phi": 0.5},
+    {"name": "mallows-1k-50c-5s", "model": "mallows", "ballots": 1000,
+     "candidates": 50, "seats": 5, "seed": 4, "phi": 0.8,
+     "truncate": True},
+    {"name": "ic-100k-10c-3s", "model": "impartial", "ballots": 100000,
+     "candidates": 10, "seats": 3, "seed": 5, "truncate": True},
+    {"name": "mallows-100k-30c-5s", "model": "mallows", "ballots": 100000,
+     "candidates": 30, "seats": 5, "seed": 6, "phi": 0.7,
+     "truncate": True},
+    {"name": "ic-1m-5c-2s", "model": "impartial", "ballots": 1000000,
+     "candidates": 5, "seats": 2, "seed": 7},
+    {"name": "mallows-1m-50c-10s", "model": "mallows", "ballots": 1000000,
+     "candidates": 50, "seats": 10, "seed": 8, "phi": 0.9,
+     "truncate": True},
+]
+
+sizes = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+
+def truncate_ballot(rng, ranking):
+    """
+    cuts a ranking short at a random length, like voters who only rank the
+    candidates they care about
+    """
+    return ranking[:1 + int(rng.random() * len(ranking))]
+
+
+def impartial_culture(rng, candidate_count, ballot_count, truncate=False):
+    """
+    every ranking of the candidates is equally likely
+
+    :return: ballots as lists of candidate indexes in preference order
+    :rtype: list
+    """
+    ballots = []
+    for _ in range(ballot_count):
+        ranking = list(range(candidate_count))
+        for i in range(candidate_count - 1, 0, -1):
+            j = int(rng.random() * (i + 1))
+            ranking[i], ranking[j] = ranking[j], ranking[i]
+        ballots.append(truncate_ballot(rng, ranking) if truncate
+                       else ranking)
+    return ballots
+
+
+def mallows(rng, candidate_count, ballot_count, phi, truncate=False):
+    """
+    rankings cluster around a random reference ranking, a ranking that is
+    d swaps away from it is phi ** d times as likely, sampled with the
+    repeated insertion model
+
+    :return: ballots as lists of candidate indexes in preference order
+    :rtype: list
+    """
+    reference = impartial_culture(rng, candidate_count, 1)[0]
+    # cumulative insertion probabilities for the ith reference candidate
+    insertion = []
+    for i in range(candidate_count):
+        weights = [phi ** (i - j) for j in range(i + 1)]
+        total = sum(weights)
+        cumulative = []
+        running = 0
+        for weight in weights:
+            running += weight / total
+            cumulative.append(running)
+        insertion.append(cumulative)
+
+    ballots = []
+    for _ in range(ballot_count):
+        ranking = []
+        for i in range(candidate_count):
+            position = min(bisect.bisect(insertion[i], rng.random()), i)
+            ranking.insert(position, reference[i])
+        ballots.append(truncate_ballot(rng, ranking) if truncate
+                       else ranking)
+    return ballots
+
+
+def generate(scenario):
+    """
+    :return: the ballots for a scenario
+    :rtype: list
+    """
+    rng = random.Random(scenario["seed"])
+    if scenario["model"] == "impartial":
+        return impartial_culture(rng, scenario["candidates"],
+                                 scenario["ballots"],
+                                 scenario.get("truncate", False))
+    return mallows(rng, scenario["candidates"], scenario["ballots"],
+                   scenario["phi"], scenario.get("truncate", False))
+
+
+def build_election(scenario, ballots):
+    """
+    builds an StvElection holding the ballots, as if every voter had
+    submitted one
+
+    :rtype: StvElection
+    """
+    election = StvElection(scenario["name"], "benchmark", scenario["seats"])
+    for i in range(scenario["candidates"]):
+        option_id = str(i)
+        election.options[option_id] = {"id": option_id,
+                                        "mention": "<@" + option_id + ">",
+                                        "display_name": "candidate " + option_id,
+                                        "index": i}
+    for voter_num, ballot in enumerate(ballots):
+        voter = FFRVoter(str(voter_num), "voter " + str(voter_num))
+        voter.set_vote({str(rank + 1): str(candidate)
+                        for rank, candidate in enumerate(ballot)})
+        election.voters[voter.id] = voter
+    election.rebuild_tally()
+    election.start_poll()
+    return election
+
+
+def run_scenario(scenario, memory=False):
+    """
+    counts a scenario, timing the count and optionally measuring its peak
+    memory
+
+    :return: the winners, ties and measurements
+    :rtype: dict
+    """
+    election = build_election(scenario, generate(scenario))
+    start = time.perf_counter()
+    results = election.get_winners()
+    seconds = time.perf_counter() - start
+
+    r_val = {"winners": sorted(results["winners"], key=int),
+             "tied": sorted(results["tied"], key=int),
+             "seconds": seconds}
+    if memory:
+        tracemalloc.start()
+        election.get_winners()
+        r_val["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return r_val
+
+
+def load_golden():
+    with open(golden_path) as golden_file:
+        return json.load(golden_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="STV counting benchmark")
+    parser.add_argument("--sizes", default="1k,100k",
+                        help="comma separated electorate sizes to run, "
+                             + "from " + ",".join(sizes))
+    parser.add_argument("--memory", action="store_true",
+                        help="also measure peak memory of the count")
+    parser.add_argument("--update-golden", action="store_true",
+                        help="store these results as the golden results")
+    args = parser.parse_args()
+
+    wanted = set(sizes[size] for size in args.sizes.lower().split(","))
+    golden = load_golden()
+    failed = False
+    for scenario in scenarios:
+        if scenario["ballots"] not in wanted:
+            continue
+        result = run_scenario(scenario, args.memory)
+        outcome = {"winners": result["winners"], "tied": result["tied"]}
+        expected = golden.get(scenario["name"])
+        if args.update_golden:
+            golden[scenario["name"]] = outcome
+            status = "stored"
+        elif expected is None:
+            status = "no golden"
+        elif expected == outcome:
+            status = "ok"
+        else:
+            status = "MISMATCH"
+            failed = True
+        line = "{:<22} {:>9.3f}s".format(scenario["name"], result["seconds"])
+        if args.memory:
+            line += " {:>9.1f}MiB".format(result["peak_bytes"] / 2 ** 20)
+        print(line + "  " + status)
+
+    if args.update_golden:
+        with open(golden_path, "w") as golden_file:
+            json.dump(golden, golden_file, indent=2, sort_keys=True)
+            golden_file.write("\n")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import random
+import unittest
+from benchmarks import stv
+
+
+class TestStvBenchmark(unittest.TestCase):
+
+    def test_golden_results(self):
+        golden = stv.load_golden()
+        for scenario in stv.scenarios:
+            if scenario["ballots"] > 1000:
+                continue
+            result = stv.run_scenario(scenario)
+            self.assertEqual({"winners": result["winners"],
+                              "tied": result["tied"]},
+                             golden[scenario["name"]], scenario["name"])
+
+    def test_generated_ballots_are_rankings(self):
+        rng = random.Random(0)
+        for ballot in stv.mallows(rng, 8, 200, 0.6, truncate=True):
+            self.assertTrue(1 <= len(ballot) <= 8)
+            self.assertEqual(len(set(ballot)), len(ballot))
+            self.assertTrue(all(0 <= x < 8 for x in ballot))
+        for ballot in stv.impartial_culture(rng, 8, 200):
+            self.assertEqual(sorted(ballot), list(range(8)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+import time
+
+from discord.ext import commands
+
+import constants
+
+
+class Confirmations(commands.Cog):
+    """
+    Routes yes/no replies to pending confirmations
+
+    Commands ask for a confirmation with a kind and some json data instead of
+    waiting on the message event themselves, a single message listener then
+    finds the pending confirmation for each reply by (user id, channel id).
+    Pending confirmations are saved to storage so they survive a restart, which
+    is why the reply is handed to a handler registered for its kind rather
+    than to the coroutine that asked.
+    """
+
+    def __init__(self, bot, storage):
+        self.bot = bot
+        self.storage = storage
+        self.handlers = dict()
+        self.pending = dict()
+        self.timers = dict()
+        try:
+            self.load_all()
+        except Exception as e:
+            logging.error("Error loading saved confirmations")
+            logging.exception(e)
+
+    def load_all(self):
+        logging.info("loading saved confirmations")
+        for k, v in self.storage.get_all("confirmations").items():
+            user_id, channel_id = k.split(":")
+            self.pending[(int(user_id), int(channel_id))] = json.loads(v)
+
+    async def cog_load(self):
+        for key, entry in self.pending.items():
+            self.schedule_expiry(key, entry)
+
+    async def cog_unload(self):
+        for timer in self.timers.values():
+            timer.cancel()
+
+    def register(self, kind, on_answer, on_timeout=None):
+        """
+        sets the handlers for a kind of confirmation
+
+        :param kind: the kind of confirmation
+        :type kind: str
+        :param on_answer: awaited with the reply message, True for yes or
+            False for no, and the data the confirmation was asked with
+        :param on_timeout: awaited with the user id, channel id and data if
+            nobody replies in time
+        """
+        self.handlers[kind] = (on_answer, on_timeout)
+
+    async def ask(self, user_id, channel_id, kind, data=None,
+                  timeout=constants.confirmation_timeout_seconds):
+        """
+        waits for the user to reply yes or no in the channel, replacing any
+        confirmation they already have pending there
+
+        :param kind: the kind of confirmation, which picks the handler
+        :type kind: str
+        :param data: json serializable data for the handler
+        :param timeout: seconds to wait for a reply
+        :type timeout: int
+        """
+        key = (user_id, channel_id)
+        self.resolve(key)
+        entry = {"kind": kind, "data": data, "expires": time.time() + timeout}
+        self.pending[key] = entry
+        self.storage.put("confirmations", self.field(key),
+                         json.dumps(entry).encode("utf-8"))
+        self.schedule_expiry(key, entry)
+
+    def schedule_expiry(self, key, entry):
+        delay = max(0, entry["expires"] - time.time())
+        self.timers[key] = asyncio.get_running_loop().call_later(
+            delay, self.expire, key, entry)
+
+    def expire(self, key, entry):
+        if self.pending.get(key) is not entry:
+            return
+        self.resolve(key)
+        on_timeout = self.handlers.get(entry["kind"], (None, None))[1]
+        if on_timeout is not None:
+            asyncio.create_task(on_timeout(key[0], key[1], entry["data"]))
+
+    def resolve(self, key):
+        """
+        removes a pending confirmation
+
+        :return: the confirmation, or None if there wasn't one
+        :rtype: dict or None
+        """
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        entry = self.pending.pop(key, None)
+        if entry is not None:
+            self.storage.delete("confirmations", self.field(key))
+        return entry
+
+    def resolve_kinds(self, kinds):
+        """
+        removes every pending confirmation of the given kinds, without
+        calling their handlers
+
+        :type kinds: set
+        """
+        for key, entry in list(self.pending.items()):
+            if entry["kind"] in kinds:
+                self.resolve(key)
+
+    def field(self, key):
+        return str(key[0]) + ":" + str(key[1])
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        key = (message.author.id, message.channel.id)
+        if key not in self.pending:
+            return
+        answer = message.content.lower()
+        if answer != "yes" and answer != "no":
+            return
+        entry = self.resolve(key)
+        try:
+            on_answer = self.handlers[entry["kind"]][0]
+        except KeyError:
+            logging.error("no handler for confirmation kind %s",
+                          entry["kind"])
+            return
+        await on_answer(message, answer == "yes", entry["data"])
@@ -102,4 +102,43 @@ self_assignable_roles_descriptions =\
 role_requests = "role-requests"
 polls_category = "Administration"
 voting_age_days = 14
+# members who joined after this can't vote
+voting_join_cutoff = "2024-03-15 03:59:59.000000+00:00"
 seat_count = 1
+stv_trace_format = "jsonl"
+count_workers = 2
+count_timeout_seconds = 600
+count_progress_seconds = 5
+compress_exports = False
+confirmation_timeout_seconds = 120
+ballot_timeout_seconds = 900
+# how many ended polls to keep loaded after a command needs one
+archive_cache_size = 8
+# how long a provisional recount waits for more ballots before it starts
+provisional_debounce_seconds = 30
+# how long ?tieanalysis runs trials for by default, and at most
+tie_analysis_seconds = 10
+tie_analysis_max_seconds = 60
+# how many members are kept in memory, one of members.policies: "full"
+# caches everyone, "lazy" chunks a server when a command first needs it and
+# "lean" keeps nobody and fetches members on demand
+member_cache_policy = "lean"
+# how long a member fetched on demand is kept, and how many are kept
+member_ttl_seconds = 300
+member_ttl_cache_size = 1024
+# how many outbound discord api calls can be in flight at once, the rest
+# wait in priority order
+outbound_workers = 4
+# the lowest level logged, and whether log records are written as JSON
+# lines or as plain text
+log_level = "INFO"
+log_json = True
+# where to record the commands the bot is used with for benchmarks.replay,
+# or None to not record, and how many entries are written between flushes
+record_commands_dir = None
+record_flush_entries = 50
+# where the bot keeps its data, one of "redis", "sqlite" or "memory", see
+# storage.py, the file sqlite uses, and what redis hash names start with
+storage_backend = "redis"
+sqlite_path = "ffrbot.sqlite3"
+redis_prefix = ""
@@ -1,11 +1,6 @@
 import time
 from datetime import timedelta
 from sys import maxsize
-import redis
-import os
-
-redis_db = redis.Redis(host=os.environ.get("REDIS_HOST", "localhost"),
-                       port=int(os.environ.get("REDIS_PORT", "6379")))
 
 
 class Race:
@@ -0,0 +1,135 @@
+"""
+Logging through a queue to a background thread, as JSON lines
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# what is known about the command being run, set in the command's task so
+# concurrent commands don't see each other's
+context = contextvars.ContextVar("log_context", default={})
+started = contextvars.ContextVar("log_started", default=None)
+
+# record attributes copied into the JSON, from the context or from extra=
+fields = ("command", "guild", "channel", "race", "poll", "duration")
+
+text_format = "%(asctime)s %(levelname)-8s %(message)s"
+date_format = "%Y-%m-%d %H:%M:%S"
+
+
+def bind(**values):
+    """
+    adds fields to the records logged from now on in this task
+    """
+    context.set({**context.get(), **values})
+
+
+def command_started(ctx):
+    """
+    binds the command being run, for the bot's before_invoke hook
+    """
+    bind(command=ctx.command.qualified_name,
+         guild=None if ctx.guild is None else ctx.guild.id,
+         channel=ctx.channel.id)
+    started.set(time.perf_counter())
+
+
+def command_finished(ctx):
+    """
+    logs how long the command took, for the bot's after_invoke hook
+    """
+    start = started.get()
+    if start is None:
+        return
+    logging.info("%s %s", ctx.command.qualified_name,
+                 "failed" if ctx.command_failed else "done",
+                 extra={"duration": round(time.perf_counter() - start, 4)})
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue with the command's context attached, leaving
+    the message to be formatted by the listener. The record's arguments are
+    formatted later on another thread, so they should not be changed after
+    they are logged.
+    """
+
+    def prepare(self, record):
+        for key, value in context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record, date_format),
+                 "level": record.levelname,
+                 "logger": record.name,
+                 "message": record.getMessage()}
+        for key in fields:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def output_handler(json_output=True, stream=None):
+    output = logging.StreamHandler(sys.stderr if stream is None else stream)
+    if json_output:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(text_format, date_format))
+    return output
+
+
+def replace_handlers(handler, level):
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def setup(level=logging.INFO, json_output=True, stream=None):
+    """
+    sends every log record through a queue to a background thread, in place
+    of logging.basicConfig
+
+    :param level: the lowest level to log
+    :param json_output: whether to write JSON lines or plain text
+    :type json_output: bool
+    :param stream: where to write, stderr by default
+    :return: the listener writing the records, already started
+    :rtype: logging.handlers.QueueListener
+    """
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        records, output_handler(json_output, stream))
+    replace_handlers(ContextQueueHandler(records), level)
+    listener.start()
+    # write what is still queued when the bot exits
+    atexit.register(listener.stop)
+    return listener
+
+
+def setup_worker(level=logging.INFO, json_output=True, stream=None):
+    """
+    logs straight to the stream, for the initializer of a process pool, a
+    forked worker inherits the queue handler but not the thread writing
+    the queue, so its records would be lost
+
+    :param level: the lowest level to log
+    :param json_output: whether to write JSON lines or plain text
+    :type json_output: bool
+    :param stream: where to write, stderr by default
+    """
+    replace_handlers(output_handler(json_output, stream), level)
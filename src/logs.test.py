@@ -0,0 +1,128 @@
+import asyncio
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+import logs
+
+
+class Formatted:
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "formatted"
+
+
+def log_error(message):
+    logging.error(message)
+    sys.stderr.flush()
+    return os.getpid()
+
+
+class TestLogs(unittest.TestCase):
+
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.handlers = list(self.root.handlers)
+        self.level = self.root.level
+        self.stream = io.StringIO()
+        self.listener = logs.setup(logging.INFO, stream=self.stream)
+        atexit.unregister(self.listener.stop)
+        self.stopped = False
+
+    def tearDown(self):
+        if not self.stopped:
+            self.listener.stop()
+        for handler in list(self.root.handlers):
+            self.root.removeHandler(handler)
+        for handler in self.handlers:
+            self.root.addHandler(handler)
+        self.root.setLevel(self.level)
+
+    def records(self):
+        self.listener.stop()
+        self.stopped = True
+        return [json.loads(line)
+                for line in self.stream.getvalue().splitlines()]
+
+    def test_json_records(self):
+        logging.info("saving poll %s", "123")
+        try:
+            raise ValueError("bad ballot")
+        except ValueError as e:
+            logging.exception(e)
+        records = self.records()
+        self.assertEqual(records[0]["message"], "saving poll 123")
+        self.assertEqual(records[0]["level"], "INFO")
+        self.assertEqual(records[1]["message"], "bad ballot")
+        self.assertIn("ValueError", records[1]["exception"])
+
+    def test_lazy_formatting(self):
+        value = Formatted()
+        logging.debug("skipped %s", value)
+        self.assertEqual(value.count, 0)
+        logging.info("logged %s", value)
+        self.records()
+        self.assertEqual(value.count, 1)
+
+    def test_command_context(self):
+        def context(name, channel_id):
+            return SimpleNamespace(
+                command=SimpleNamespace(qualified_name=name), guild=None,
+                channel=SimpleNamespace(id=channel_id), command_failed=False)
+
+        async def command(name, channel_id, race):
+            ctx = context(name, channel_id)
+            logs.command_started(ctx)
+            if race:
+                logs.bind(race=channel_id)
+            await asyncio.sleep(0)
+            logging.info("inside %s", name)
+            logs.command_finished(ctx)
+
+        async def run():
+            await asyncio.gather(command("ready", 1, True),
+                                 command("vote", 2, False))
+
+        asyncio.run(run())
+        records = {record["message"]: record for record in self.records()}
+        self.assertEqual(records["inside ready"]["race"], 1)
+        self.assertEqual(records["inside ready"]["command"], "ready")
+        self.assertNotIn("race", records["inside vote"])
+        self.assertEqual(records["inside vote"]["channel"], 2)
+        self.assertIn("duration", records["vote done"])
+        self.assertNotIn("duration", records["inside vote"])
+
+    def test_worker_records(self):
+        read, write = os.pipe()
+        saved = os.dup(2)
+        os.dup2(write, 2)
+        try:
+            with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=logs.setup_worker,
+                    initargs=(logging.INFO,)) as executor:
+                pid = executor.submit(log_error, "worker failed").result()
+        finally:
+            os.dup2(saved, 2)
+            os.close(saved)
+            os.close(write)
+        with os.fdopen(read) as output:
+            records = [json.loads(line) for line in output]
+        self.assertNotEqual(pid, os.getpid())
+        self.assertEqual([record["message"] for record in records],
+                         ["worker failed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
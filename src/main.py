@@ -7,8 +7,6 @@ from math import ceil
 from random import random
 from typing import List
 
-import os
-import redis
 
 from discord.ext import commands
 from discord.utils import get
@@ -16,47 +14,66 @@ from discord.message import Message
 
 import discord
 
+from confirmations import Confirmations
+import logs
+import members
+import outbound
+import replies
+import storage
 from races import Races
+from recorder import Recorder
 from roles import Roles
 from voting.polls import Polls
 
 import constants
 
 
-# format logging
-logging.basicConfig(
-    format="%(asctime)s %(levelname)-8s %(message)s",
-    level=logging.INFO,
-    datefmt="%Y-%m-%d %H:%M:%S")
-
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
 description = "FFR discord bot"
 
-bot = commands.Bot(command_prefix="?", description=description,
-                   case_insensitive=True, intents=intents)
+member_lookup = members.MemberLookup()
 
-redis_pool = redis.ConnectionPool(host=os.environ.get(
-    "REDIS_HOST", "localhost"), port=int(
-    os.environ.get(
-        "REDIS_PORT", "6379")),
-    decode_responses=False)
+bot = commands.Bot(command_prefix="?", description=description,
+                   case_insensitive=True, intents=intents,
+                   member_cache_flags=members.cache_flags(
+                       member_lookup.policy),
+                   chunk_guilds_at_startup=members.chunk_at_startup(
+                       member_lookup.policy))
 
-redis_races = redis.StrictRedis(connection_pool=redis_pool)
-redis_polls = redis.StrictRedis(connection_pool=redis_pool)
+not_allowed_here = "That command isn't allowed here."
 
 
 
 
 @bot.event
 async def on_ready():
-    logging.info("discord.py version: " + discord.__version__)
-    logging.info("Logged in as")
-    logging.info(bot.user.name)
-    logging.info(bot.user.id)
-    logging.info("------")
+    logging.info("discord.py version: %s", discord.__version__)
+    logging.info("Logged in as %s %s", bot.user.name, bot.user.id)
+
+
+@bot.before_invoke
+async def before_command(ctx):
+    logs.command_started(ctx)
+
+
+@bot.after_invoke
+async def after_command(ctx):
+    logs.command_finished(ctx)
+
+
+@bot.event
+async def on_command_error(ctx, error):
+    # a slash command that fails a check still has to be answered, typed
+    # commands keep the default handling
+    if (ctx.interaction is not None
+            and not ctx.interaction.response.is_done()
+            and isinstance(error, commands.CheckFailure)):
+        await replies.reply(ctx, not_allowed_here)
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
 
 
 def is_admin(ctx):
@@ -65,6 +82,19 @@ def is_admin(ctx):
         or (user.id == int(140605120579764226))
 
 
+@bot.command()
+@commands.check(is_admin)
+async def synccommands(ctx):
+    """
+    Registers the slash commands with discord, only needed after they change
+    :param ctx: context of the command
+    :return: None
+    """
+    synced = await bot.tree.sync()
+    await ctx.author.send("synced " + str(len(synced)) + " slash commands")
+    await ctx.message.delete()
+
+
 def allow_seed_rolling(ctx):
     return (ctx.channel.name == constants.call_for_races_channel) or\
            (ctx.channel.category_id == get(ctx.guild.categories, name="races")
@@ -81,6 +111,10 @@ async def purgemembers(ctx):
     """
     user = ctx.message.author
     role = await getrole(ctx)
+    if role is None:
+        await user.send(not_allowed_here)
+        await ctx.message.delete()
+        return
 
     if role in user.roles and role.name in constants.adminroles:
         if role.name == constants.challengeseedadmin:
@@ -92,11 +126,11 @@ async def purgemembers(ctx):
         else:
             role = get(ctx.message.guild.roles,
                        name=constants.ducklingrole)
-        members = ctx.message.guild.members
-        role_members = [x for x in members if role in x.roles]
+        guild_members = await member_lookup.all_members(ctx.message.guild)
+        role_members = [x for x in guild_members if role in x.roles]
 
         for x in role_members:
-            await x.remove_roles(role)
+            await outbound.call(outbound.cosmetic, x.remove_roles, role)
     else:
         await user.send("... Wait a second.. YOU AREN'T AN ADMIN! (note, you"
                         " need the correct admin role and need to use this"
@@ -106,7 +140,7 @@ async def purgemembers(ctx):
     await ctx.message.delete()
 
 
-@bot.command()
+@bot.hybrid_command()
 async def submit(ctx, runnertime: str = None):
     """
     Submits a runners time to the leaderboard and gives the appropriate role
@@ -116,16 +150,18 @@ async def submit(ctx, runnertime: str = None):
     """
     user = ctx.message.author
     role = await getrole(ctx)
+    if role is None:
+        await replies.reply(ctx, not_allowed_here)
+        return
     if (role.name == constants.ducklingrole and
             constants.rolerequiredduckling not in
             [role.name for role in user.roles]):
-        await user.send("You're not a duckling!")
-        await ctx.message.delete()
+        await replies.reply(ctx, "You're not a duckling!")
         return
 
     if runnertime is None:
-        await user.send("You must include a time when you submit a time.")
-        await ctx.message.delete()
+        await replies.reply(ctx, "You must include a time when you submit "
+                                 "a time.")
         return
 
     if role is not None and role not in user.roles\
@@ -137,12 +173,13 @@ async def submit(ctx, runnertime: str = None):
             # still maintain a consistent style on the leaderboard
             t = datetime.strptime(runnertime, "%H:%M:%S")
         except ValueError:
-            await user.send("The time you provided '" + str(runnertime) +
-                            "', this is not in the format HH:MM:SS"
-                            "(or you took a day or longer)")
-            await ctx.message.delete()
+            await replies.reply(ctx, "The time you provided '"
+                                + str(runnertime)
+                                + "', this is not in the format HH:MM:SS"
+                                  "(or you took a day or longer)")
             return
 
+        await replies.defer(ctx)
         await user.add_roles(role)
         delta = timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
         username = re.sub('[()-]', '', user.display_name)
@@ -182,13 +219,13 @@ async def submit(ctx, runnertime: str = None):
                 leaderboard_list[i][1] + "\n"
         new_leaderboard += "\nForfeits - " + str(forfeits)
 
-        await leaderboard.edit(content=new_leaderboard)
+        await outbound.call(outbound.cosmetic, leaderboard.edit,
+                            content=new_leaderboard)
         await (await getspoilerchat(ctx)).send('GG %s' % user.mention)
-        await ctx.message.delete()
+        await replies.finish(ctx)
         await changeparticipants(ctx)
     else:
-        await user.send("You already have the relevent role.")
-        await ctx.message.delete()
+        await replies.reply(ctx, "You already have the relevent role.")
 
 
 @bot.command()
@@ -273,11 +310,12 @@ async def remove(ctx):
                 leaderboard_list[i][1] + "\n"
         new_leaderboard += "\nForfeits - " + str(forfeits)
 
-        await leaderboard.edit(content=new_leaderboard)
+        await outbound.call(outbound.cosmetic, leaderboard.edit,
+                            content=new_leaderboard)
         await ctx.message.delete()
 
 
-@bot.command()
+@bot.hybrid_command()
 async def createleaderboard(ctx, name):
     """
     Creates a leaderboard post with a title and the number of forfeits
@@ -288,10 +326,12 @@ async def createleaderboard(ctx, name):
 
     user = ctx.message.author
     if name is None:
-        await user.send("You did not submit a name.")
-        await ctx.message.delete()
+        await replies.reply(ctx, "You did not submit a name.")
         return
     role = await getrole(ctx)
+    if role is None:
+        await replies.reply(ctx, not_allowed_here)
+        return
 
     # gross way of doing this, works for now
     if role in user.roles and role.name == constants.challengeseedadmin:
@@ -317,13 +357,15 @@ async def createleaderboard(ctx, name):
             .send("Number of participants: 0")
 
     else:
-        await user.send(("... Wait a second.. YOU AREN'T AN ADMIN! (note, you"
-                         " need the admin role for this channel)"))
+        await replies.reply(ctx, "... Wait a second.. YOU AREN'T AN ADMIN! "
+                                 "(note, you need the admin role for this "
+                                 "channel)")
+        return
 
-    await ctx.message.delete()
+    await replies.finish(ctx)
 
 
-@bot.command()
+@bot.hybrid_command()
 async def ff(ctx):
     """
     Increments the number of forfeits and gives the appropriate
@@ -333,10 +375,13 @@ async def ff(ctx):
     """
     user = ctx.message.author
     role = await getrole(ctx)
+    if role is None:
+        await replies.reply(ctx, not_allowed_here)
+        return
 
-    if role is not None and role not in user.roles\
-            and role.name in constants.nonadminroles:
+    if role not in user.roles and role.name in constants.nonadminroles:
 
+        await replies.defer(ctx)
         await user.add_roles(role)
         leaderboard = await getleaderboard(ctx)
         new_leaderboard = leaderboard.content.split("\n")
@@ -345,11 +390,12 @@ async def ff(ctx):
         seperator = "\n"
         new_leaderboard = seperator.join(new_leaderboard)
 
-        await leaderboard.edit(content=new_leaderboard)
-        await ctx.message.delete()
+        await outbound.call(outbound.cosmetic, leaderboard.edit,
+                            content=new_leaderboard)
+        await replies.finish(ctx)
         await changeparticipants(ctx)
     else:
-        await ctx.message.delete()
+        await replies.finish(ctx)
 
 
 # @bot.command()
@@ -358,7 +404,7 @@ async def ff(ctx):
 #     SystemExit()
 
 
-@bot.command()
+@bot.hybrid_command()
 async def spec(ctx):
     """
     Gives the user the appropriate role
@@ -367,9 +413,12 @@ async def spec(ctx):
     """
     user = ctx.message.author
     role = await getrole(ctx)
-    if role is not None and role.name in constants.nonadminroles:
+    if role is None:
+        await replies.reply(ctx, not_allowed_here)
+        return
+    if role.name in constants.nonadminroles:
         await user.add_roles(role)
-    await ctx.message.delete()
+    await replies.finish(ctx)
 
 
 async def getrole(ctx):
@@ -378,10 +427,9 @@ async def getrole(ctx):
     Acts as a check for making sure commands are executed in the correct
     spot as well
     :param ctx: context of the command
-    :return: Role or None
+    :return: Role, or None if the command isn't allowed in this channel
     """
 
-    user = ctx.message.author
     roles = ctx.message.guild.roles
     channel = ctx.message.channel
     channels = ctx.message.guild.channels
@@ -405,7 +453,6 @@ async def getrole(ctx):
     elif channel == duckseedspoilerobj:
         role = get(roles, name=constants.ducklingadminrole)
     else:
-        await user.send("That command isn't allowed here.")
         return None
 
     return role
@@ -416,9 +463,8 @@ async def getleaderboard(ctx):
     Returns the leaderboard Message object depending on the channel the
     command is used in
     :param ctx: context of the command
-    :return: Message or None
+    :return: Message, or None if the command wasn't used in a seed channel
     """
-    user = ctx.message.author
     channel = ctx.message.channel
     channels = ctx.message.guild.channels
     challengeseed = get(channels, name=constants.challengeseedchannel)
@@ -437,7 +483,6 @@ async def getleaderboard(ctx):
                                 name=constants.ducklingleaderboard).history(
             limit=100)
     else:
-        await user.send("That command isn't allowed here.")
         return None
 
     async for x in leaderboard:
@@ -453,10 +498,9 @@ async def getspoilerchat(ctx):
     Returns the spoiler Channel object depending on the channel the command
     is used in
     :param ctx: context of the command
-    :return: Channel or None
+    :return: Channel, or None if the command wasn't used in a seed channel
     """
 
-    user = ctx.message.author
     channel = ctx.message.channel
     channels = ctx.message.guild.channels
     challengeseed = get(channels, name=constants.challengeseedchannel)
@@ -470,7 +514,6 @@ async def getspoilerchat(ctx):
     elif channel == ducklingseed:
         spoilerchat = get(channels, name=constants.ducklingspoiler)
     else:
-        await user.send("That command isn't allowed here.")
         return None
 
     return spoilerchat
@@ -495,7 +538,10 @@ async def changeparticipants(ctx, increment=True, channel=None):
     else:
         num_partcipents -= 1
     new_participants = "Number of participants: " + str(num_partcipents)
-    await participants.edit(content=new_participants)
+    # the new count is worked out from the message, so this edit can't be
+    # replaced by a later one
+    await outbound.call(outbound.cosmetic, participants.edit,
+                        content=new_participants)
 
 
 # used to clear channels for testing purposes
@@ -560,15 +606,27 @@ def handle_exit(client, loop):
 
 
 async def main(client, token):
-    await bot.add_cog(Races(bot, redis_races))
+    if constants.record_commands_dir is not None:
+        await bot.add_cog(Recorder(bot, constants.record_commands_dir))
+    # connected here rather than on import, worker processes import this
+    # module too
+    bot_storage = storage.connect(constants.storage_backend)
+    await bot.add_cog(Races(bot, bot_storage))
     await bot.add_cog(Roles(bot))
-    await bot.add_cog(Polls(bot, redis_polls))
+    confirmations = Confirmations(bot, bot_storage)
+    await bot.add_cog(confirmations)
+    await bot.add_cog(Polls(bot, bot_storage, confirmations,
+                             member_lookup))
 
     async with client:
         await client.start(token)
 
-with open('token.txt', 'r') as f:
-    token = f.read()
-token = token.strip()
 
-asyncio.run(main(bot, token))
+# guarded so worker processes that import this module don't start the bot
+if __name__ == "__main__":
+    logs.setup(level=constants.log_level, json_output=constants.log_json)
+    with open('token.txt', 'r') as f:
+        token = f.read()
+    token = token.strip()
+
+    asyncio.run(main(bot, token))
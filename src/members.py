@@ -0,0 +1,107 @@
+"""
+Looking up server members under one of the member cache policies
+"""
+from collections import OrderedDict
+import time
+
+import discord
+
+import constants
+
+policies = ("full", "lazy", "lean")
+
+
+def cache_flags(policy):
+    """
+    :param policy: the member cache policy
+    :type policy: str
+    :rtype: discord.MemberCacheFlags
+    :raises ValueError: if the policy isn't one of policies
+    """
+    if policy == "full":
+        return discord.MemberCacheFlags.all()
+    if policy == "lazy":
+        return discord.MemberCacheFlags.from_intents(
+            discord.Intents(guilds=True, members=True))
+    if policy == "lean":
+        return discord.MemberCacheFlags.none()
+    raise ValueError(policy)
+
+
+def chunk_at_startup(policy):
+    """
+    :param policy: the member cache policy
+    :type policy: str
+    :return: whether every server's members are requested on connecting
+    :rtype: bool
+    """
+    return policy == "full"
+
+
+class MemberLookup:
+    """
+    Finds members for the commands that need them, from the member cache
+    when the policy keeps one, or from discord when it doesn't
+
+    :param policy: the member cache policy, one of policies
+    :type policy: str
+    :param ttl: how many seconds a fetched member is kept for
+    :type ttl: float
+    :param size: how many fetched members are kept at most
+    :type size: int
+    """
+
+    def __init__(self, policy=constants.member_cache_policy,
+                 ttl=constants.member_ttl_seconds,
+                 size=constants.member_ttl_cache_size):
+        if policy not in policies:
+            raise ValueError(policy)
+        self.policy = policy
+        self.ttl = ttl
+        self.size = size
+        # (guild id, user id) to (expiry time, member), oldest first
+        self.fetched = OrderedDict()
+
+    async def all_members(self, guild):
+        """
+        :param guild: the server
+        :type guild: discord.Guild
+        :return: every member of the server
+        :rtype: list
+        """
+        if guild.chunked:
+            return guild.members
+        # the lean policy gets the member list without keeping it
+        return await guild.chunk(cache=self.policy != "lean")
+
+    async def get_member(self, guild, user_id):
+        """
+        :param guild: the server
+        :type guild: discord.Guild
+        :param user_id: the id of the user
+        :type user_id: int
+        :return: the user as a member of the server, or None if they aren't
+            in it
+        :rtype: discord.Member or None
+        """
+        member = guild.get_member(user_id)
+        if member is not None:
+            return member
+
+        key = (guild.id, user_id)
+        now = time.monotonic()
+        cached = self.fetched.get(key)
+        if cached is not None:
+            if cached[0] > now:
+                self.fetched.move_to_end(key)
+                return cached[1]
+            del self.fetched[key]
+
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            member = None
+        self.fetched[key] = (now + self.ttl, member)
+        while len(self.fetched) > self.size:
+            self.fetched.popitem(last=False)
+        return member
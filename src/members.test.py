@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import discord
+
+import members
+
+
+class FakeGuild:
+    def __init__(self, cached=(), chunked=False):
+        self.id = 1
+        self.cached = {member.id: member for member in cached}
+        self.chunked = chunked
+        self.fetches = []
+        self.chunks = []
+
+    @property
+    def members(self):
+        return list(self.cached.values())
+
+    def get_member(self, user_id):
+        return self.cached.get(user_id)
+
+    async def fetch_member(self, user_id):
+        self.fetches.append(user_id)
+        if user_id < 0:
+            raise discord.NotFound(SimpleNamespace(status=404, reason=""),
+                                   "Unknown Member")
+        return SimpleNamespace(id=user_id)
+
+    async def chunk(self, cache=True):
+        self.chunks.append(cache)
+        return [SimpleNamespace(id=2), SimpleNamespace(id=3)]
+
+
+class TestMembers(unittest.TestCase):
+
+    def test_cache_flags(self):
+        self.assertEqual(members.cache_flags("full"),
+                         discord.MemberCacheFlags.all())
+        self.assertEqual(members.cache_flags("lean"),
+                         discord.MemberCacheFlags.none())
+        self.assertTrue(members.cache_flags("lazy").joined)
+        self.assertTrue(members.chunk_at_startup("full"))
+        self.assertFalse(members.chunk_at_startup("lazy"))
+        with self.assertRaises(ValueError):
+            members.cache_flags("everyone")
+
+    def test_all_members(self):
+        lookup = members.MemberLookup("lean")
+        guild = FakeGuild()
+        found = asyncio.run(lookup.all_members(guild))
+        self.assertEqual([member.id for member in found], [2, 3])
+        self.assertEqual(guild.chunks, [False])
+
+        lookup = members.MemberLookup("lazy")
+        asyncio.run(lookup.all_members(guild))
+        self.assertEqual(guild.chunks, [False, True])
+
+        guild = FakeGuild([SimpleNamespace(id=4)], chunked=True)
+        found = asyncio.run(lookup.all_members(guild))
+        self.assertEqual([member.id for member in found], [4])
+        self.assertEqual(guild.chunks, [])
+
+    def test_get_member(self):
+        lookup = members.MemberLookup("lean", ttl=60, size=2)
+        guild = FakeGuild([SimpleNamespace(id=5)])
+
+        async def lookups(user_ids):
+            return [await lookup.get_member(guild, user_id)
+                    for user_id in user_ids]
+
+        found = asyncio.run(lookups([5, 6, 6, -1, -1]))
+        self.assertEqual([found[0].id, found[1].id, found[2].id], [5, 6, 6])
+        self.assertIsNone(found[3])
+        self.assertIsNone(found[4])
+        self.assertEqual(guild.fetches, [6, -1])
+
+        # 7 pushes out 6, the least recently used
+        asyncio.run(lookups([-1, 7, 6]))
+        self.assertEqual(guild.fetches, [6, -1, 7, 6])
+
+    def test_ttl(self):
+        lookup = members.MemberLookup("lean", ttl=0, size=2)
+        guild = FakeGuild()
+        asyncio.run(lookup.get_member(guild, 8))
+        asyncio.run(lookup.get_member(guild, 8))
+        self.assertEqual(guild.fetches, [8, 8])
+        self.assertEqual(len(lookup.fetched), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
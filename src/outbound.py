@@ -0,0 +1,196 @@
+"""
+Queueing the bot's outbound discord api calls by priority
+"""
+import asyncio
+import heapq
+import itertools
+
+import constants
+
+# call priorities, lower first: countdowns and race start messages, which
+# don't wait for a worker, replies to the user of a command, and edits that
+# only tidy up, like leaderboards and race posts
+race_start = 0
+user_reply = 1
+cosmetic = 2
+
+
+class Call:
+    """
+    A queued api call
+
+    :param priority: one of race_start, user_reply or cosmetic
+    :type priority: int
+    :param func: the coroutine function making the call
+    :param key: calls with the same key replace each other while queued,
+        or None
+    """
+
+    def __init__(self, priority, func, args, kwargs, key, future):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.future = future
+        self.started = False
+
+
+class Scheduler:
+    """
+    Makes queued calls with a fixed number of workers, lowest priority
+    number first and in the order they were queued within a priority.
+    race_start calls don't wait for a worker, they are made right away.
+
+    :param workers: how many calls can be in flight at once
+    :type workers: int
+    """
+
+    def __init__(self, workers=constants.outbound_workers):
+        self.workers = workers
+        self.loop = None
+        self.tasks = []
+        self.direct = set()
+        # (priority, sequence number, call), a call is queued again when a
+        # newer call with its key raises its priority
+        self.heap = []
+        self.counter = itertools.count()
+        self.waiting = dict()
+        self.ready = None
+        self.dropped = 0
+
+    def start(self, loop):
+        """
+        starts the workers on the running loop, calls queued on an earlier
+        loop are forgotten
+        """
+        self.loop = loop
+        self.heap = []
+        self.waiting = dict()
+        self.ready = asyncio.Semaphore(0)
+        self.tasks = [loop.create_task(self.work())
+                      for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self.tasks + list(self.direct):
+            task.cancel()
+        self.tasks = []
+        self.direct = set()
+        self.loop = None
+
+    def submit(self, priority, func, *args, key=None, **kwargs):
+        """
+        queues a call
+
+        :param priority: one of race_start, user_reply or cosmetic
+        :type priority: int
+        :param func: the coroutine function making the call
+        :param key: a queued call with the same key is replaced by this one,
+            or None
+        :return: a future for the call's result, a replaced call's future
+            gets the result of the call that replaced it
+        :rtype: asyncio.Future
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.start(loop)
+
+        call = None if key is None else self.waiting.get(key)
+        if call is not None:
+            call.func = func
+            call.args = args
+            call.kwargs = kwargs
+            self.dropped += 1
+            if priority == race_start:
+                # made now, the worker skips the queued entry
+                del self.waiting[key]
+                self.make_now(call)
+                return call.future
+            if priority >= call.priority:
+                return call.future
+            call.priority = priority
+        else:
+            call = Call(priority, func, args, kwargs, key,
+                        loop.create_future())
+            if priority == race_start:
+                self.make_now(call)
+                return call.future
+            if key is not None:
+                self.waiting[key] = call
+        heapq.heappush(self.heap, (priority, next(self.counter), call))
+        self.ready.release()
+        return call.future
+
+    def make_now(self, call):
+        """
+        makes a call in its own task, so it never waits behind the workers'
+        calls, which can be waiting out a rate limit
+        """
+        call.started = True
+        task = self.loop.create_task(self.make(call))
+        self.direct.add(task)
+        task.add_done_callback(self.direct.discard)
+
+    async def work(self):
+        while True:
+            await self.ready.acquire()
+            call = heapq.heappop(self.heap)[2]
+            if call.started:
+                # queued again at a higher priority and already made
+                continue
+            call.started = True
+            if call.key is not None and self.waiting.get(call.key) is call:
+                del self.waiting[call.key]
+            await self.make(call)
+
+    async def make(self, call):
+        try:
+            result = await call.func(*call.args, **call.kwargs)
+        except asyncio.CancelledError:
+            call.future.cancel()
+            raise
+        except Exception as e:
+            if not call.future.cancelled():
+                call.future.set_exception(e)
+        else:
+            if not call.future.cancelled():
+                call.future.set_result(result)
+
+
+scheduler = Scheduler()
+
+
+def call(priority, func, *args, **kwargs):
+    """
+    queues any api call on the bot's scheduler
+
+    :return: a future for the call's result
+    :rtype: asyncio.Future
+    """
+    return scheduler.submit(priority, func, *args, **kwargs)
+
+
+def send(destination, content=None, priority=user_reply, **kwargs):
+    """
+    queues sending a message
+
+    :param destination: the channel, thread or user to send to
+    :return: a future for the sent message
+    :rtype: asyncio.Future
+    """
+    return scheduler.submit(priority, destination.send, content, **kwargs)
+
+
+def edit(message, priority=cosmetic, **kwargs):
+    """
+    queues editing a message, replacing an edit to the same message that is
+    still waiting, so only for content that doesn't depend on what the
+    message says now
+
+    :param message: the message to edit
+    :type message: discord.Message
+    :return: a future for the edited message
+    :rtype: asyncio.Future
+    """
+    return scheduler.submit(priority, message.edit, key=("edit", message.id),
+                            **kwargs)
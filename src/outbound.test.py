@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+
+import outbound
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    async def record(self, name):
+        self.calls.append(name)
+        return name
+
+    async def slow(self, name, seconds):
+        await asyncio.sleep(seconds)
+        self.calls.append(name)
+        return name
+
+    async def fail(self):
+        raise ValueError("rate limited")
+
+
+class TestOutbound(unittest.TestCase):
+
+    def test_priority_order(self):
+        recorder = Recorder()
+
+        async def run():
+            scheduler = outbound.Scheduler(workers=1)
+            futures = [
+                scheduler.submit(outbound.cosmetic, recorder.record, "edit"),
+                scheduler.submit(outbound.user_reply, recorder.record,
+                                 "welcome 1"),
+                scheduler.submit(outbound.user_reply, recorder.record,
+                                 "welcome 2")]
+            results = await asyncio.gather(*futures)
+            scheduler.stop()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(results, ["edit", "welcome 1", "welcome 2"])
+        self.assertEqual(recorder.calls, ["welcome 1", "welcome 2", "edit"])
+
+    def test_race_start_skips_the_queue(self):
+        recorder = Recorder()
+
+        async def run():
+            scheduler = outbound.Scheduler(workers=2)
+            replies = [scheduler.submit(outbound.user_reply, recorder.slow,
+                                        "welcome", 0.2) for _ in range(6)]
+            await asyncio.sleep(0)
+            start = asyncio.get_running_loop().time()
+            await scheduler.submit(outbound.race_start, recorder.record,
+                                   "go!")
+            waited = asyncio.get_running_loop().time() - start
+            await asyncio.gather(*replies)
+            scheduler.stop()
+            return waited
+
+        self.assertLess(asyncio.run(run()), 0.05)
+        self.assertEqual(recorder.calls[0], "go!")
+
+    def test_superseded_edits(self):
+        recorder = Recorder()
+
+        async def run():
+            scheduler = outbound.Scheduler(workers=1)
+            futures = [
+                scheduler.submit(outbound.cosmetic, recorder.record, "old",
+                                 key="message"),
+                scheduler.submit(outbound.cosmetic, recorder.record,
+                                 "other"),
+                scheduler.submit(outbound.cosmetic, recorder.record, "new",
+                                 key="message")]
+            results = await asyncio.gather(*futures)
+            # once made, a call with the key is queued again
+            results.append(await scheduler.submit(
+                outbound.cosmetic, recorder.record, "newer", key="message"))
+            scheduler.stop()
+            return results, scheduler.dropped
+
+        results, dropped = asyncio.run(run())
+        self.assertEqual(results, ["new", "other", "new", "newer"])
+        self.assertEqual(recorder.calls, ["new", "other", "newer"])
+        self.assertEqual(dropped, 1)
+
+    def test_superseding_raises_priority(self):
+        recorder = Recorder()
+
+        async def run():
+            scheduler = outbound.Scheduler(workers=1)
+            futures = [
+                scheduler.submit(outbound.cosmetic, recorder.record,
+                                 "listing", key="message"),
+                scheduler.submit(outbound.user_reply, recorder.record,
+                                 "reply"),
+                scheduler.submit(outbound.race_start, recorder.record,
+                                 "started", key="message")]
+            results = await asyncio.gather(*futures)
+            scheduler.stop()
+            return results
+
+        self.assertEqual(asyncio.run(run()), ["started", "reply", "started"])
+        # the queued listing is dropped
+        self.assertEqual(sorted(recorder.calls), ["reply", "started"])
+
+    def test_errors_reach_the_caller(self):
+        recorder = Recorder()
+
+        async def run():
+            scheduler = outbound.Scheduler(workers=1)
+            try:
+                await scheduler.submit(outbound.user_reply, recorder.fail)
+                error = None
+            except ValueError as e:
+                error = str(e)
+            # the worker keeps going
+            result = await scheduler.submit(outbound.user_reply,
+                                            recorder.record, "after")
+            scheduler.stop()
+            return error, result
+
+        self.assertEqual(asyncio.run(run()), ("rate limited", "after"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,6 +14,9 @@ from ffrrace import Race, RaceNotLockable
 import logging
 
 import constants
+import logs
+import outbound
+import replies
 
 active_races = dict()
 aliases = dict()
@@ -84,18 +87,21 @@ def is_admin(ctx):
 
 class Races(commands.Cog):
 
-    def __init__(self, bot, redis_db):
+    def __init__(self, bot, storage):
         self.bot = bot
         self.twitchids = dict()
-        self.redis_db = redis_db
+        self.storage = storage
         self.loaddata()
 
     def loaddata(self):
-        temp_twitchids = dict(self.redis_db.hgetall('twitchids'))
-        for k, v in temp_twitchids.items():
-            self.twitchids[k.decode('utf-8')] = v.decode('utf-8')
+        for k, v in self.storage.get_all('twitchids').items():
+            self.twitchids[k] = v.decode('utf-8')
         logging.info('Loading saved Twitch ids')
-        logging.debug('twitch ids:' + str(self.twitchids))
+        logging.debug('twitch ids: %s', self.twitchids)
+
+    async def cog_before_invoke(self, ctx):
+        if ctx.channel.id in active_races:
+            logs.bind(race=ctx.channel.id)
 
     @commands.command(aliases=['sr'])
     @commands.check(is_call_for_races)
@@ -150,15 +156,15 @@ class Races(commands.Cog):
         teamslist[racethread.id] = dict()
         race.owner = ctx.author.id
 
-    @commands.command(aliases=['cr'])
+    @commands.hybrid_command(aliases=['cr'])
     @is_race_started(toggle=False)
     @commands.check(is_race_owner)
     @commands.check(is_race_room)
     async def closerace(self, ctx):
-        await ctx.channel.send('deleting this race in 5 minutes')
+        await replies.announce(ctx, 'deleting this race in 5 minutes')
         await self.removeraceroom(ctx, 300)
 
-    @commands.command()
+    @commands.hybrid_command()
     @is_race_started(toggle=False)
     @commands.check(is_race_owner)
     @commands.check(is_race_room)
@@ -169,12 +175,12 @@ class Races(commands.Cog):
             edited_message = (
                 "Race: " + race.name + " is now locked! "
             )
-            await race.message.edit(content=edited_message)
-            await ctx.channel.send('Race is now locked. New players cannot be added.')
+            await outbound.edit(race.message, content=edited_message)
+            await replies.announce(ctx, 'Race is now locked. New players cannot be added.')
         except RaceNotLockable:
-            await ctx.channel.send('This race cannot be locked')
+            await replies.announce(ctx, 'This race cannot be locked')
 
-    @commands.command()
+    @commands.hybrid_command()
     @is_race_started(toggle=False)
     @commands.check(is_race_owner)
     @commands.check(is_race_room)
@@ -186,10 +192,10 @@ class Races(commands.Cog):
                 "join this multiworld/race with the ?join command, @ any"
                 + " people that will be on your team if playing coop. "
             )
-            await race.message.edit(content=edited_message)
-            await ctx.channel.send('This race is now unlocked. New players can join again.')
+            await outbound.edit(race.message, content=edited_message)
+            await replies.announce(ctx, 'This race is now unlocked. New players can join again.')
         else:
-            await ctx.channel.send('Race is already unlocked.')
+            await replies.announce(ctx, 'Race is already unlocked.')
 
     @commands.command(aliases=["enter"])
     async def join(self, ctx, id=None, name=None):
@@ -200,8 +206,10 @@ class Races(commands.Cog):
             pass
 
         if ctx.channel.id not in active_races.keys():
-            await ctx.author.send(
-                "Join command must be used in an active race channel or thread"
+            await replies.reply(
+                ctx,
+                "Join command must be used in an active race channel or thread",
+                delete=False
             )
             return
 
@@ -210,13 +218,13 @@ class Races(commands.Cog):
         id = int(id)
         try:
             if active_races[id].started is True:
-                await ctx.channel.send("This race has already started")
+                await replies.announce(ctx, "This race has already started")
                 return
             if active_races[id].islocked is True:
-                await ctx.channel.send("This race is locked. No new racers can join.")
+                await replies.announce(ctx, "This race is locked. No new racers can join.")
                 return
         except KeyError:
-            await ctx.author.send("That id doesnt exist")
+            await replies.reply(ctx, "That id doesnt exist", delete=False)
             return
 
         if name is None:
@@ -233,9 +241,9 @@ class Races(commands.Cog):
             aliases[id][r.id] = ctx.author.id
             teamslist[id][ctx.author.id]["members"].append([r.display_name, r.id])
             tagpeople += r.mention + " "
-        await race.channel.send(tagpeople)
+        await outbound.send(race.channel, tagpeople)
 
-    @commands.command(aliases=['quit'])
+    @commands.hybrid_command(aliases=['quit'])
     @is_race_started(toggle=False)
     @is_runner()
     @commands.check(is_race_room)
@@ -243,13 +251,13 @@ class Races(commands.Cog):
         try:
             race = active_races[ctx.channel.id]
         except KeyError:
-            await ctx.author.send("KeyError in unjoin command")
+            await replies.reply(ctx, "KeyError in unjoin command", delete=False)
             return
 
         if race.runners[ctx.author.id]["ready"] is True:
             race.readycount -= 1
         race.removeRunner(ctx.author.id)
-        await ctx.channel.send(ctx.author.display_name
+        await replies.announce(ctx, ctx.author.display_name
                                + " has left the race and is now cheering "
                                + "from the sidelines.")
         del aliases[ctx.channel.id][ctx.author.id]
@@ -269,19 +277,20 @@ class Races(commands.Cog):
             pass
         await self.startcountdown(ctx)
 
-    @commands.command(aliases=['s'])
+    @commands.hybrid_command(aliases=['s'])
     @commands.check(is_call_for_races)
     async def spectate(self, ctx, id):
         try:
             race = active_races[int(id)]
-        except KeyError:
+        except (KeyError, ValueError):
+            await replies.reply(ctx, "That id doesnt exist")
             return
-        await ctx.message.delete()
-        if id:
-            await race.channel.send("%s is now cheering you on from the"
-                                    + " sidelines" % ctx.author.mention)
+        await outbound.send(race.channel, ("%s is now cheering you on from"
+                                           + " the sidelines")
+                            % ctx.author.mention)
+        await replies.finish(ctx)
 
-    @commands.command(aliases=['r'])
+    @commands.hybrid_command(aliases=['r'])
     @is_race_started(toggle=False)
     @is_runner()
     @commands.check(is_race_room)
@@ -289,17 +298,18 @@ class Races(commands.Cog):
         try:
             race = active_races[ctx.channel.id]
             race.ready(ctx.author.id)
-            await ctx.channel.send(
+            await replies.announce(
+                ctx,
                 ctx.author.display_name
                 + " is READY! "
                 + str(len(race.runners) - race.readycount)
                 + " remaining.")
         except KeyError:
-            ctx.channel.send("Key Error in 'ready' command")
+            await replies.announce(ctx, "Key Error in 'ready' command")
             return
         await self.startcountdown(ctx)
 
-    @commands.command(aliases=['ur'])
+    @commands.hybrid_command(aliases=['ur'])
     @is_race_started(toggle=False)
     @is_runner()
     @commands.check(is_race_room)
@@ -307,25 +317,26 @@ class Races(commands.Cog):
         try:
             race = active_races[ctx.channel.id]
             race.unready(ctx.author.id)
-            await ctx.channel.send(
+            await replies.announce(
+                ctx,
                 ctx.author.display_name + " is no longer READY. " + str(
                     len(race.runners) - race.readycount) + " remaining.")
         except KeyError:
-            ctx.channel.send("Key Error in 'ready' command")
+            await replies.announce(ctx, "Key Error in 'ready' command")
             return
 
-    @commands.command(aliases=['e'])
+    @commands.hybrid_command(aliases=['e'])
     @commands.check(is_race_room)
     async def entrants(self, ctx):
         try:
             race = active_races[ctx.channel.id]
         except KeyError:
-            await ctx.channel.send("Key Error in 'entrants' command")
+            await replies.announce(ctx, "Key Error in 'entrants' command")
             return
         msg = race.getUpdate()
-        await ctx.channel.send(msg)
+        await replies.announce(ctx, msg)
 
-    @commands.command()
+    @commands.hybrid_command()
     @is_race_started()
     @is_runner()
     @commands.check(is_race_room)
@@ -333,14 +344,14 @@ class Races(commands.Cog):
         try:
             race = active_races[ctx.channel.id]
             msg = race.done(aliases[race.id][ctx.author.id])
-            thread_msg = await ctx.channel.send(msg)
+            thread_msg = await ctx.send(msg)
             if (all(r["etime"] is not None for r in race.runners.values())):
                 await thread_msg.pin()  # pin the race results message
                 await self.endrace(ctx, msg)
         except KeyError:
-            await ctx.channel.send("Key Error in 'done' command")
+            await replies.announce(ctx, "Key Error in 'done' command")
 
-    @commands.command(aliases=['unforfeit'])
+    @commands.hybrid_command(aliases=['unforfeit'])
     @is_race_started()
     @is_runner()
     @commands.check(is_race_room)
@@ -348,11 +359,11 @@ class Races(commands.Cog):
         try:
             race = active_races[ctx.channel.id]
             msg = race.undone(aliases[race.id][ctx.author.id])
-            await ctx.channel.send(msg)
+            await replies.announce(ctx, msg)
         except KeyError:
-            await ctx.channel.send("Key Error in 'undone' command")
+            await replies.announce(ctx, "Key Error in 'undone' command")
 
-    @commands.command()
+    @commands.hybrid_command()
     @is_race_started()
     @is_runner()
     @commands.check(is_race_room)
@@ -360,24 +371,24 @@ class Races(commands.Cog):
         try:
             race = active_races[ctx.channel.id]
             msg = race.forfeit(aliases[race.id][ctx.author.id])
-            thread_msg = await ctx.channel.send(msg)
+            thread_msg = await ctx.send(msg)
             if (all(r["etime"] is not None for r in race.runners.values())):
                 await thread_msg.pin()  # pin the race results message
                 await self.endrace(ctx, msg)
         except KeyError:
-            await ctx.channel.send("Key Error in the 'forfeit' command")
+            await replies.announce(ctx, "Key Error in the 'forfeit' command")
 
-    @commands.command(aliases=['t'])
+    @commands.hybrid_command(aliases=['t'])
     @commands.check(is_race_room)
     @is_race_started(toggle=True)
     async def time(self, ctx):
         try:
             time = active_races[ctx.channel.id].getTime()
-            await ctx.channel.send(time)
+            await replies.announce(ctx, time)
         except KeyError:
-            await ctx.channel.send("Key Error in the 'time' command")
+            await replies.announce(ctx, "Key Error in the 'time' command")
 
-    @commands.command(aliases=['tl'])
+    @commands.hybrid_command(aliases=['tl'])
     @is_race_started(toggle=False)
     @commands.check(is_race_room)
     async def teamlist(self, ctx):
@@ -390,9 +401,9 @@ class Races(commands.Cog):
                     rstring += " " + member[0] + ","
                 rstring = rstring[:-1]
                 rstring += "\n"
-            await ctx.channel.send(rstring)
+            await replies.announce(ctx, rstring)
         except KeyError:
-            await ctx.channel.send("Key Error in 'teams' command")
+            await replies.announce(ctx, "Key Error in 'teams' command")
 
     @commands.command(aliases=['ta'])
     @is_race_started(toggle=False)
@@ -444,11 +455,13 @@ class Races(commands.Cog):
             + "\nWatch the race at: "
             + (race.restream if race.restream is not None else multi)
         )
-        await race.message.edit(content=edited_message)
+        await outbound.edit(race.message, priority=outbound.race_start,
+                            content=edited_message)
         for i in range(10):
-            await ctx.channel.send(str(10 - i))
+            await outbound.send(ctx.channel, str(10 - i),
+                                priority=outbound.race_start)
             await asyncio.sleep(1)
-        await ctx.channel.send("go!")
+        await outbound.send(ctx.channel, "go!", priority=outbound.race_start)
         race.start()
 
     @commands.command()
@@ -470,7 +483,7 @@ class Races(commands.Cog):
             + race.restream
         )
 
-        await race.message.edit(content=edited_message)
+        await outbound.edit(race.message, content=edited_message)
 
     async def removerace(self, ctx, time=0):
         await asyncio.sleep(time)
@@ -605,8 +618,7 @@ class Races(commands.Cog):
     @commands.command()
     async def twitchid(self, ctx, id=''):
         self.twitchids[str(ctx.author.id)] = id
-        self.redis_db.hset('twitchids', str(
-            ctx.author.id).encode('utf-8'), id.encode('utf-8'))
+        self.storage.put('twitchids', str(ctx.author.id), id.encode('utf-8'))
         await ctx.channel.send('twitch id set to: '
                                + self.twitchids[str(ctx.author.id)])
 
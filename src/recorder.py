@@ -0,0 +1,217 @@
+"""
+Recording the commands the bot is used with, for benchmarks.replay, with
+every discord id swapped for a small number. A user or server is written
+once, after that commands only refer to it by number.
+
+A recording is gzipped JSON lines, one entry per line:
+
+    {"guild": 1, "channels": [[2, "call-for-races", "races"]],
+     "roles": ["Admin"]}
+    {"user": 3, "guild": 1, "roles": ["Admin"], "age": 412, "early": true}
+    {"thread": 4, "parent": 2}
+    {"t": 1.25, "cmd": "startrace", "text": "?startrace ff1 race",
+     "user": 3, "channel": 2, "guild": 1}
+    {"t": 1.9, "thread": 5, "parent": 2}
+    {"t": 7.5, "answer": "yes", "user": 3, "channel": 6}
+
+A thread with a time was created while recording, by a command the replay
+runs again, one without was there before the recording started. An
+answer is a yes or no reply to a confirmation.
+"""
+import asyncio
+import atexit
+from datetime import datetime, timezone
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+import discord
+from discord.ext import commands
+
+import constants
+from voting import electorate
+
+# discord ids are 17 to 20 digits, anything that long in an argument is
+# taken to be one
+snowflake = re.compile(r"\d{15,20}")
+
+
+class Anonymizer:
+    """
+    Swaps discord ids for small numbers, the same id always gets the same
+    number
+    """
+
+    def __init__(self):
+        self.numbers = dict()
+
+    def __call__(self, id):
+        """
+        :param id: a discord id
+        :type id: int
+        :rtype: int
+        """
+        try:
+            return self.numbers[id]
+        except KeyError:
+            number = self.numbers[id] = len(self.numbers) + 1
+            return number
+
+    def text(self, content):
+        """
+        :return: the text with every id in it swapped, including the ids in
+            mentions
+        :rtype: str
+        """
+        return snowflake.sub(lambda match: str(self(int(match.group()))),
+                             content)
+
+
+def read(path):
+    """
+    :param path: the recording's path
+    :type path: str
+    :return: the entries of a recording, in the order they were written
+    :rtype: list
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as recording:
+        return [json.loads(line) for line in recording if line.strip()]
+
+
+class Recorder(commands.Cog):
+    """
+    Writes every invoked command to a new recording in a directory, on a
+    background thread so the event loop never waits on the file
+
+    :param directory: where to put the recording
+    :type directory: str
+    """
+
+    def __init__(self, bot, directory):
+        self.bot = bot
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(
+            directory, datetime.now(timezone.utc).strftime(
+                "commands-%Y%m%d-%H%M%S.jsonl.gz"))
+        self.start = time.monotonic()
+        self.anonymize = Anonymizer()
+        self.written = set()
+        self.entries = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.write_entries,
+                                       daemon=True)
+        self.thread.start()
+        # write what is still queued when the bot exits
+        atexit.register(self.stop)
+
+    async def cog_unload(self):
+        atexit.unregister(self.stop)
+        await asyncio.to_thread(self.stop)
+
+    def stop(self):
+        """
+        writes the queued entries and closes the recording
+        """
+        self.entries.put(None)
+        self.thread.join()
+
+    def write(self, entry):
+        """
+        queues an entry for the writer thread, it shouldn't be changed after
+        """
+        self.entries.put(entry)
+
+    def write_entries(self):
+        unflushed = 0
+        with gzip.open(self.path, "wt", encoding="utf-8") as file:
+            while True:
+                entry = self.entries.get()
+                if entry is None:
+                    return
+                file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                unflushed += 1
+                if unflushed >= constants.record_flush_entries:
+                    # so a bot that is killed loses at most this many entries
+                    file.flush()
+                    unflushed = 0
+
+    def now(self):
+        return round(time.monotonic() - self.start, 3)
+
+    def write_guild(self, guild):
+        if guild is None or ("guild", guild.id) in self.written:
+            return
+        self.written.add(("guild", guild.id))
+        self.write({
+            "guild": self.anonymize(guild.id),
+            "channels": [[self.anonymize(channel.id), channel.name,
+                          None if channel.category is None
+                          else channel.category.name]
+                         for channel in guild.text_channels],
+            "roles": [role.name for role in guild.roles]})
+
+    def write_user(self, user, guild):
+        key = ("user", user.id, None if guild is None else guild.id)
+        if key in self.written:
+            return
+        self.written.add(key)
+        entry = {"user": self.anonymize(user.id),
+                 "age": electorate.account_age_days(
+                     user, datetime.now(timezone.utc))}
+        if guild is not None:
+            entry["guild"] = self.anonymize(guild.id)
+        if isinstance(user, discord.Member):
+            entry["roles"] = [role.name for role in user.roles[1:]]
+            entry["early"] = electorate.joined_before_cutoff(user)
+        if user.bot:
+            entry["bot"] = True
+        self.write(entry)
+
+    def write_channel(self, channel):
+        if (not isinstance(channel, discord.Thread)
+                or ("thread", channel.id) in self.written):
+            return
+        self.written.add(("thread", channel.id))
+        self.write({"thread": self.anonymize(channel.id),
+                    "parent": self.anonymize(channel.parent_id)})
+
+    def write_context(self, entry, author, channel, guild):
+        self.write_guild(guild)
+        self.write_user(author, guild)
+        self.write_channel(channel)
+        entry["user"] = self.anonymize(author.id)
+        entry["channel"] = self.anonymize(channel.id)
+        if guild is not None:
+            entry["guild"] = self.anonymize(guild.id)
+        self.write(entry)
+
+    @commands.Cog.listener()
+    async def on_command(self, ctx):
+        if ctx.interaction is None:
+            content = ctx.message.content
+        else:
+            # a slash command is replayed as the typed command
+            content = " ".join(
+                ["?" + ctx.command.qualified_name]
+                + [str(value) for _, value in ctx.interaction.namespace])
+        self.write_context({"t": self.now(),
+                            "cmd": ctx.command.qualified_name,
+                            "text": self.anonymize.text(content)},
+                           ctx.author, ctx.channel, ctx.guild)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        answer = message.content.lower()
+        if message.author.bot or (answer != "yes" and answer != "no"):
+            return
+        self.write_context({"t": self.now(), "answer": answer},
+                           message.author, message.channel, message.guild)
+
+    @commands.Cog.listener()
+    async def on_thread_create(self, thread):
+        self.written.add(("thread", thread.id))
+        self.write({"t": self.now(), "thread": self.anonymize(thread.id),
+                    "parent": self.anonymize(thread.parent_id)})
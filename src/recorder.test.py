@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import recorder
+
+
+class TestRecorder(unittest.TestCase):
+
+    def test_anonymizer(self):
+        anonymize = recorder.Anonymizer()
+        self.assertEqual(anonymize(140605120579764226), 1)
+        self.assertEqual(anonymize(140605120579764227), 2)
+        self.assertEqual(anonymize(140605120579764226), 1)
+        self.assertEqual(
+            anonymize.text("?submitballot 140605120579764227 <1,"
+                           "<@140605120579764228>,a> ff1 2"),
+            "?submitballot 2 <1,<@3>,a> ff1 2")
+
+    def test_recording(self):
+        guild = SimpleNamespace(
+            id=900000000000000001, roles=[SimpleNamespace(name="@everyone")],
+            text_channels=[SimpleNamespace(
+                id=900000000000000002, name="race-organization",
+                category=SimpleNamespace(name="races"))])
+        author = SimpleNamespace(
+            id=900000000000000003, bot=False,
+            created_at=datetime.now(timezone.utc) - timedelta(days=20))
+        channel = guild.text_channels[0]
+        ctx = SimpleNamespace(
+            interaction=None, author=author, channel=channel, guild=guild,
+            command=SimpleNamespace(qualified_name="startrace"),
+            message=SimpleNamespace(content="?startrace ff1 race"))
+        answer = SimpleNamespace(author=author, channel=channel, guild=guild,
+                                 content="Yes")
+
+        with tempfile.TemporaryDirectory() as directory:
+            cog = recorder.Recorder(None, directory)
+            asyncio.run(cog.on_command(ctx))
+            asyncio.run(cog.on_command(ctx))
+            asyncio.run(cog.on_message(answer))
+            asyncio.run(cog.cog_unload())
+            entries = recorder.read(os.path.join(directory,
+                                                 os.listdir(directory)[0]))
+
+        self.assertEqual(entries[0], {
+            "guild": 1, "channels": [[2, "race-organization", "races"]],
+            "roles": ["@everyone"]})
+        self.assertEqual(entries[1], {"user": 3, "age": 20, "guild": 1})
+        self.assertEqual([entry.get("cmd") for entry in entries[2:]],
+                         ["startrace", "startrace", None])
+        self.assertEqual(entries[2]["text"], "?startrace ff1 race")
+        self.assertEqual((entries[2]["user"], entries[2]["channel"]), (3, 2))
+        self.assertEqual(entries[4]["answer"], "yes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Answering a command whether it was typed or used as a slash command
+"""
+import discord
+
+import outbound
+
+
+async def defer(ctx):
+    """
+    acknowledges a slash command that makes several API calls before it can
+    answer, so it isn't cut off by discord's three second limit, the answer
+    then follows with reply or finish
+    """
+    if ctx.interaction is not None and not ctx.interaction.response.is_done():
+        # not queued, it has to be made within the three seconds
+        await ctx.interaction.response.defer(ephemeral=True, thinking=True)
+
+
+async def respond(interaction, content, ephemeral, view=None):
+    kwargs = {"ephemeral": ephemeral}
+    if view is not None:
+        kwargs["view"] = view
+    if interaction.response.is_done():
+        await outbound.send(interaction.followup, content, **kwargs)
+    else:
+        await interaction.response.send_message(content, **kwargs)
+
+
+async def reply(ctx, content, delete=True, view=None):
+    """
+    answers only the user who used the command
+
+    :param delete: whether to delete a typed command's message
+    :type delete: bool
+    """
+    if ctx.interaction is None:
+        await outbound.send(ctx.author, content, view=view)
+        if delete:
+            await outbound.call(outbound.user_reply, ctx.message.delete)
+    else:
+        await respond(ctx.interaction, content, True, view)
+
+
+async def announce(ctx, content):
+    """
+    answers in the channel, for everyone to see
+    """
+    if ctx.interaction is None:
+        await outbound.send(ctx.channel, content)
+    else:
+        await respond(ctx.interaction, content, False)
+
+
+async def finish(ctx, content="✔", delete=True):
+    """
+    ends a command that has nothing else to say, a typed command's message
+    is deleted and a slash command that hasn't been answered yet gets a
+    short ephemeral answer
+
+    :param delete: whether to delete a typed command's message
+    :type delete: bool
+    """
+    if ctx.interaction is None:
+        if delete:
+            await outbound.call(outbound.user_reply, ctx.message.delete)
+        return
+    response = ctx.interaction.response
+    if (not response.is_done() or response.type
+            == discord.InteractionResponseType.deferred_channel_message):
+        await respond(ctx.interaction, content, True)
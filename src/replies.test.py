@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import discord
+
+import outbound
+import replies
+
+
+class Recorder:
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+
+    async def send(self, content, **kwargs):
+        self.calls.append((self.name, content, kwargs.get("ephemeral")))
+
+    async def delete(self):
+        self.calls.append((self.name, "delete", None))
+
+
+class FakeResponse:
+    def __init__(self, calls):
+        self.calls = calls
+        self.type = None
+
+    def is_done(self):
+        return self.type is not None
+
+    async def send_message(self, content, ephemeral=False, **kwargs):
+        self.calls.append(("response", content, ephemeral))
+        self.type = discord.InteractionResponseType.channel_message
+
+    async def defer(self, ephemeral=False, thinking=False):
+        self.calls.append(("response", "defer", ephemeral))
+        self.type = discord.InteractionResponseType.deferred_channel_message
+
+
+def typed_context(calls):
+    return SimpleNamespace(interaction=None,
+                           author=Recorder(calls, "dm"),
+                           channel=Recorder(calls, "channel"),
+                           message=Recorder(calls, "message"))
+
+
+def slash_context(calls):
+    interaction = SimpleNamespace(response=FakeResponse(calls),
+                                  followup=Recorder(calls, "followup"))
+    return SimpleNamespace(interaction=interaction,
+                           author=Recorder(calls, "dm"),
+                           channel=Recorder(calls, "channel"),
+                           message=None)
+
+
+class TestReplies(unittest.IsolatedAsyncioTestCase):
+
+    async def test_typed(self):
+        calls = []
+        ctx = typed_context(calls)
+        await replies.reply(ctx, "no")
+        await replies.announce(ctx, "hi")
+        await replies.finish(ctx)
+        self.assertEqual(calls, [("dm", "no", None),
+                                 ("message", "delete", None),
+                                 ("channel", "hi", None),
+                                 ("message", "delete", None)])
+
+    async def test_slash(self):
+        calls = []
+        await replies.reply(slash_context(calls), "no")
+        self.assertEqual(calls, [("response", "no", True)])
+
+        calls = []
+        ctx = slash_context(calls)
+        await replies.announce(ctx, "hi")
+        await replies.finish(ctx)
+        self.assertEqual(calls, [("response", "hi", False)])
+
+        calls = []
+        ctx = slash_context(calls)
+        await replies.defer(ctx)
+        await replies.finish(ctx)
+        self.assertEqual(calls, [("response", "defer", True),
+                                 ("followup", "✔", True)])
+
+    async def test_response_not_queued(self):
+        release = asyncio.Event()
+        busy = [outbound.call(outbound.user_reply, release.wait)
+                for _ in range(outbound.scheduler.workers + 1)]
+        await asyncio.sleep(0)
+        calls = []
+        ctx = slash_context(calls)
+        await asyncio.wait_for(replies.defer(ctx), 1)
+        await asyncio.wait_for(replies.announce(slash_context(calls), "hi"),
+                               1)
+        self.assertEqual(calls, [("response", "defer", True),
+                                 ("response", "hi", False)])
+        release.set()
+        await asyncio.gather(*busy)
+        outbound.scheduler.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import discord
+
+import constants
+
+# discord allows 25 options in a select menu
+select_size = 25
+
+
+class RoleView(discord.ui.View):
+    """
+    A select menu of the self assignable roles, posted once in role-requests
+    with ?postroles
+
+    Picking roles toggles them, a role the member has is removed and one
+    they don't have is added, with one role edit and an ephemeral reply.
+    The view has no timeout and a fixed custom id, and the roles cog adds it
+    to the bot when it loads, so the posted message works after a restart.
+
+    :param roles: the roles cog, used to find the guild's roles
+    """
+
+    def __init__(self, roles):
+        super().__init__(timeout=None)
+        self.roles = roles
+        options = [discord.SelectOption(label=name[:100],
+                                        value=name.lower(),
+                                        description=description.strip()[:100])
+                   for name, description in zip(
+                       constants.self_assignable_roles,
+                       constants.self_assignable_roles_descriptions)]
+        select = discord.ui.Select(custom_id="roles:toggle",
+                                   placeholder="Pick roles to add or remove",
+                                   min_values=1,
+                                   max_values=min(len(options), select_size),
+                                   options=options[:select_size])
+        select.callback = self.toggle
+        self.add_item(select)
+
+    async def toggle(self, interaction):
+        member = interaction.user
+        found, unknown = self.roles.find_roles(interaction.guild,
+                                               interaction.data["values"])
+        added = [role for role in found if role not in member.roles]
+        removed = [role for role in found if role in member.roles]
+        if len(added) + len(removed) == 1:
+            if added:
+                await member.add_roles(*added)
+            else:
+                await member.remove_roles(*removed)
+        elif len(added) + len(removed) > 1:
+            # the first role is @everyone, which can't be edited
+            await member.edit(roles=[role for role in member.roles[1:]
+                                     if role not in removed] + added)
+        await interaction.response.send_message(
+            toggled_text(added, removed, unknown), ephemeral=True)
+
+
+def toggled_text(added, removed, unknown):
+    r_val = ""
+    if added:
+        r_val += "added: " + ", ".join(role.name for role in added) + "\n"
+    if removed:
+        r_val += "removed: " + ", ".join(role.name for role in removed) + "\n"
+    if unknown:
+        r_val += "these roles don't exist: " + ", ".join(unknown) + "\n"
+    return r_val or "no roles were changed"
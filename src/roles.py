@@ -1,58 +1,147 @@
 from discord.ext import commands
-from discord.utils import get
 
 import constants
+from role_view import RoleView
 
 
 def is_role_requests_channel(ctx):
     return ctx.channel.name == constants.role_requests
 
 
+def is_admin(ctx):
+    user = ctx.author
+    return (any(role.name in constants.ADMINS for role in user.roles)) or (
+        user.id == int(140605120579764226))
+
+
+def parse_roles(request):
+    """
+    splits a role request into role names, several roles are separated by
+    commas
+
+    :param request: everything after the command
+    :type request: str
+    :return: the lowercased role names, without quotes or repeats
+    :rtype: list
+    """
+    names = dict.fromkeys(name.strip().strip("\"'").strip().lower()
+                          for name in request.split(","))
+    names.pop("", None)
+    return list(names)
+
+
 class Roles(commands.Cog):
+    """
+    Lets members add and remove the self assignable roles, found through an
+    index of each guild's self assignable roles by lowercased name that is
+    rebuilt when a role is created, deleted or renamed
+    """
+
     def __init__(self, bot):
         self.bot = bot
+        self.assignable = {name.lower(): name
+                           for name in constants.self_assignable_roles}
+        # guild id to lowercased name to the guild's self assignable role
+        self.index = dict()
+
+    async def cog_load(self):
+        for guild in self.bot.guilds:
+            self.build_index(guild)
+        # picks on a role menu posted before a restart are routed here
+        self.bot.add_view(RoleView(self))
+
+    def build_index(self, guild):
+        self.index[guild.id] = {role.name.lower(): role
+                                for role in guild.roles
+                                if role.name.lower() in self.assignable}
+
+    def find_roles(self, guild, names):
+        """
+        :param names: lowercased role names
+        :type names: list
+        :return: the roles found, and the names that aren't self assignable
+            roles in the guild
+        :rtype: tuple
+        """
+        if guild.id not in self.index:
+            self.build_index(guild)
+        index = self.index[guild.id]
+        found = []
+        unknown = []
+        for name in names:
+            if name in index:
+                found.append(index[name])
+            else:
+                unknown.append(name)
+        return found, unknown
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild):
+        self.build_index(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.index.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        self.build_index(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.build_index(role.guild)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            self.build_index(after.guild)
 
     @commands.command()
     @commands.check(is_role_requests_channel)
     async def addrole(self, ctx, *, role=None):
-        if role is None:
+        names = [] if role is None else parse_roles(role)
+        if len(names) == 0:
             await ctx.author.send('you forget to ask for a role')
             await ctx.message.delete()
             return
-        role_clean = role.lower().strip("\"'")
-        if role_clean not in\
-                [x.lower() for x in constants.self_assignable_roles]:
+        roles, unknown = self.find_roles(ctx.guild, names)
+        if len(unknown) != 0:
             await ctx.author.send('you cannot give yourself the role: '
-                                  + role + "\n or that role doesnt exist")
+                                  + ", ".join(unknown)
+                                  + "\n or that role doesnt exist")
             await ctx.message.delete()
-        else:
-            roles = ctx.message.guild.roles
-            role_obj = get(roles,
-                           name=next(x for x in constants.self_assignable_roles
-                                     if x.lower() == role_clean))
-            await ctx.author.add_roles(role_obj)
-            await ctx.message.add_reaction('✔')
+            return
+        # added one at a time each role is its own request, with more than
+        # one the member's roles are replaced in a single edit
+        await ctx.author.add_roles(*roles, atomic=len(roles) == 1)
+        await ctx.message.add_reaction('✔')
 
     @commands.command()
     @commands.check(is_role_requests_channel)
     async def removerole(self, ctx, *, role=None):
-        if role is None:
+        names = [] if role is None else parse_roles(role)
+        if len(names) == 0:
             await ctx.author.send('you forget to say which role to remove')
             await ctx.message.delete()
             return
-        role_clean = role.lower().strip("\"'")
-        if role_clean not in\
-                [x.lower() for x in constants.self_assignable_roles]:
+        roles, unknown = self.find_roles(ctx.guild, names)
+        if len(unknown) != 0:
             await ctx.author.send('you cannot remove yourself from the role: '
-                                  + role + "\n or that role doesnt exist")
+                                  + ", ".join(unknown)
+                                  + "\n or that role doesnt exist")
             await ctx.message.delete()
-        else:
-            roles = ctx.message.guild.roles
-            role_obj = get(roles,
-                           name=next(x for x in constants.self_assignable_roles
-                                     if x.lower() == role_clean))
-            await ctx.author.remove_roles(role_obj)
-            await ctx.message.add_reaction('✔')
+            return
+        await ctx.author.remove_roles(*roles, atomic=len(roles) == 1)
+        await ctx.message.add_reaction('✔')
+
+    @commands.command()
+    @commands.check(is_role_requests_channel)
+    @commands.check(is_admin)
+    async def postroles(self, ctx):
+        await ctx.channel.send("Pick roles below to add them, or pick a role"
+                               + " you already have to remove it.",
+                               view=RoleView(self))
+        await ctx.message.delete()
 
     @commands.command()
     @commands.check(is_role_requests_channel)
@@ -67,5 +156,7 @@ class Roles(commands.Cog):
                   + '\n\n\nCommands:\n\n use ?addrole'
                   + ' "rolename" in role-requests'
                   + " to add yourself to a role, or you can"
-                  + '\n\n use ?removerole "rolename" to remove it.')
+                  + '\n\n use ?removerole "rolename" to remove it.'
+                  + "\n\n To add or remove several roles at once, separate"
+                  + ' them with commas: ?addrole "duckling", "spectator"')
         await ctx.message.add_reaction('✔')
@@ -0,0 +1,98 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from roles import Roles, parse_roles
+
+
+class FakeMember:
+    def __init__(self):
+        self.added = []
+        self.sent = []
+
+    async def add_roles(self, *roles, atomic=True):
+        self.added.extend(roles)
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+class FakeMessage:
+    def __init__(self):
+        self.deleted = False
+        self.reactions = []
+
+    async def delete(self):
+        self.deleted = True
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+
+def guild(*names):
+    return SimpleNamespace(id=1, roles=[SimpleNamespace(name=name)
+                                        for name in names])
+
+
+class TestRoles(unittest.TestCase):
+
+    def test_parse_roles(self):
+        self.assertEqual(parse_roles('"Race Crew"'), ["race crew"])
+        self.assertEqual(parse_roles("duckling, He/Him ,'spectator'"),
+                         ["duckling", "he/him", "spectator"])
+        self.assertEqual(parse_roles("duckling, DUCKLING,,"), ["duckling"])
+        self.assertEqual(parse_roles(" , "), [])
+
+    def test_find_roles(self):
+        cog = Roles(None)
+        server = guild("@everyone", "Duckling", "Admin", "Race Crew")
+        found, unknown = cog.find_roles(
+            server, ["race crew", "duckling", "admin", "platypus"])
+        self.assertEqual([role.name for role in found],
+                         ["Race Crew", "Duckling"])
+        # admin isn't self assignable and platypus isn't in the server
+        self.assertEqual(unknown, ["admin", "platypus"])
+
+    def test_unknown_role_rejects_request(self):
+        cog = Roles(None)
+        member = FakeMember()
+        message = FakeMessage()
+        ctx = SimpleNamespace(guild=guild("Duckling"), author=member,
+                              message=message)
+        asyncio.run(Roles.addrole.callback(cog, ctx,
+                                           role="duckling, nonsense"))
+        self.assertEqual(member.added, [])
+        self.assertIn("nonsense", member.sent[0])
+        self.assertTrue(message.deleted)
+
+        asyncio.run(Roles.addrole.callback(cog, ctx, role="duckling"))
+        self.assertEqual([role.name for role in member.added], ["Duckling"])
+        self.assertEqual(message.reactions, ["✔"])
+
+    def test_index_rebuilt(self):
+        cog = Roles(None)
+        server = guild("Duckling")
+        self.assertEqual(cog.find_roles(server, ["platypus"])[1],
+                         ["platypus"])
+
+        created = SimpleNamespace(name="Platypus", guild=server)
+        server.roles.append(created)
+        asyncio.run(cog.on_guild_role_create(created))
+        self.assertEqual(cog.find_roles(server, ["platypus"])[0], [created])
+
+        renamed = SimpleNamespace(name="Restreamer", guild=server)
+        server.roles[1] = renamed
+        asyncio.run(cog.on_guild_role_update(created, renamed))
+        self.assertEqual(cog.find_roles(server, ["platypus"])[1],
+                         ["platypus"])
+        self.assertEqual(cog.find_roles(server, ["restreamer"])[0],
+                         [renamed])
+
+        server.roles.remove(renamed)
+        asyncio.run(cog.on_guild_role_delete(renamed))
+        self.assertEqual(cog.find_roles(server, ["restreamer"])[1],
+                         ["restreamer"])
+
+
+if __name__ == "__main__":
+    unittest.main()
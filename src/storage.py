@@ -0,0 +1,287 @@
+"""
+Storage for the bot's data, with memory, redis and sqlite backends
+"""
+import os
+import sqlite3
+import threading
+
+import constants
+
+# sqlite limits how many values one statement can take
+sqlite_batch_size = 500
+
+
+class Transaction:
+    """
+    Writes to apply together, from Storage.transaction
+    """
+
+    def __init__(self):
+        # (namespace, key, value), value None to delete the key
+        self.writes = []
+
+    def put(self, namespace, key, value):
+        self.writes.append((namespace, key, value))
+
+    def delete(self, namespace, key):
+        self.writes.append((namespace, key, None))
+
+
+class TransactionContext:
+    def __init__(self, storage):
+        self.storage = storage
+        self.transaction = Transaction()
+
+    def __enter__(self):
+        return self.transaction
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.storage.apply(self.transaction.writes)
+        return False
+
+
+class Storage:
+    """
+    The interface the backends implement. Keys are strings and values are
+    bytes, every key belongs to a namespace.
+    """
+
+    def get_many(self, namespace, keys):
+        """
+        :param keys: the keys to read
+        :type keys: list
+        :return: key to value for the keys that are set
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def get_all(self, namespace):
+        """
+        :return: key to value for every key in the namespace
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def put_many(self, namespace, items):
+        """
+        :param items: key to value for the keys to set
+        :type items: dict
+        """
+        raise NotImplementedError
+
+    def delete_many(self, namespace, keys):
+        raise NotImplementedError
+
+    def clear(self, namespace):
+        """
+        deletes every key in the namespace, and nothing outside it
+        """
+        raise NotImplementedError
+
+    def apply(self, writes):
+        """
+        applies a transaction's writes atomically
+
+        :param writes: (namespace, key, value) in order, value None to
+            delete the key
+        :type writes: list
+        """
+        raise NotImplementedError
+
+    def transaction(self):
+        """
+        :return: a context manager giving a Transaction, whose writes are
+            applied together when the with block ends without raising, reads
+            in the block don't see them
+        """
+        return TransactionContext(self)
+
+    def get(self, namespace, key):
+        """
+        :return: the value, or None if the key isn't set
+        :rtype: bytes or None
+        """
+        return self.get_many(namespace, [key]).get(key)
+
+    def put(self, namespace, key, value):
+        self.put_many(namespace, {key: value})
+
+    def delete(self, namespace, key):
+        self.delete_many(namespace, [key])
+
+    def close(self):
+        pass
+
+
+class MemoryStorage(Storage):
+    """
+    Keeps everything in a dict, for tests, benchmarks and replays
+    """
+
+    def __init__(self):
+        self.namespaces = dict()
+
+    def get_many(self, namespace, keys):
+        values = self.namespaces.get(namespace, {})
+        return {key: values[key] for key in keys if key in values}
+
+    def get_all(self, namespace):
+        return dict(self.namespaces.get(namespace, {}))
+
+    def put_many(self, namespace, items):
+        self.namespaces.setdefault(namespace, {}).update(items)
+
+    def delete_many(self, namespace, keys):
+        values = self.namespaces.get(namespace, {})
+        for key in keys:
+            values.pop(key, None)
+
+    def clear(self, namespace):
+        self.namespaces.pop(namespace, None)
+
+    def apply(self, writes):
+        for namespace, key, value in writes:
+            if value is None:
+                self.delete(namespace, key)
+            else:
+                self.put(namespace, key, value)
+
+
+class RedisStorage(Storage):
+    """
+    Keeps a namespace in a redis hash of the same name
+
+    :param client: a redis client without decode_responses
+    :param prefix: put in front of every namespace's hash name
+    :type prefix: str
+    """
+
+    def __init__(self, client, prefix=""):
+        self.client = client
+        self.prefix = prefix
+
+    def name(self, namespace):
+        return self.prefix + namespace
+
+    def get_many(self, namespace, keys):
+        keys = list(keys)
+        if len(keys) == 0:
+            return {}
+        values = self.client.hmget(self.name(namespace), keys)
+        return {key: value for key, value in zip(keys, values)
+                if value is not None}
+
+    def get_all(self, namespace):
+        return {key.decode("utf-8"): value for key, value
+                in self.client.hgetall(self.name(namespace)).items()}
+
+    def put_many(self, namespace, items):
+        if len(items) != 0:
+            self.client.hset(self.name(namespace), mapping=items)
+
+    def delete_many(self, namespace, keys):
+        keys = list(keys)
+        if len(keys) != 0:
+            self.client.hdel(self.name(namespace), *keys)
+
+    def clear(self, namespace):
+        self.client.delete(self.name(namespace))
+
+    def apply(self, writes):
+        pipe = self.client.pipeline(transaction=True)
+        for namespace, key, value in writes:
+            if value is None:
+                pipe.hdel(self.name(namespace), key)
+            else:
+                pipe.hset(self.name(namespace), key, value)
+        pipe.execute()
+
+    def close(self):
+        self.client.close()
+
+
+class SqliteStorage(Storage):
+    """
+    Keeps everything in one table of a sqlite database
+
+    :param path: the database file, or ":memory:"
+    :type path: str
+    """
+
+    def __init__(self, path):
+        # the lock lets the connection be shared with executor threads
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS storage (namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL, value BLOB NOT NULL,"
+                " PRIMARY KEY (namespace, key)) WITHOUT ROWID")
+
+    def get_many(self, namespace, keys):
+        keys = list(keys)
+        r_val = dict()
+        with self.lock:
+            for start in range(0, len(keys), sqlite_batch_size):
+                batch = keys[start:start + sqlite_batch_size]
+                r_val.update(self.connection.execute(
+                    "SELECT key, value FROM storage WHERE namespace = ?"
+                    " AND key IN (" + ",".join("?" * len(batch)) + ")",
+                    [namespace] + batch))
+        return r_val
+
+    def get_all(self, namespace):
+        with self.lock:
+            return dict(self.connection.execute(
+                "SELECT key, value FROM storage WHERE namespace = ?",
+                (namespace,)))
+
+    def put_many(self, namespace, items):
+        self.apply([(namespace, key, value) for key, value in items.items()])
+
+    def delete_many(self, namespace, keys):
+        self.apply([(namespace, key, None) for key in keys])
+
+    def clear(self, namespace):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM storage WHERE namespace = ?", (namespace,))
+
+    def apply(self, writes):
+        with self.lock, self.connection:
+            for namespace, key, value in writes:
+                if value is None:
+                    self.connection.execute(
+                        "DELETE FROM storage WHERE namespace = ? AND key = ?",
+                        (namespace, key))
+                else:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO storage VALUES (?, ?, ?)",
+                        (namespace, key, value))
+
+    def close(self):
+        self.connection.close()
+
+
+def connect(backend=constants.storage_backend):
+    """
+    :param backend: "memory", "redis" or "sqlite"
+    :type backend: str
+    :return: the storage the bot is configured to use
+    :rtype: Storage
+    :raises ValueError: if the backend isn't one of them
+    """
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "redis":
+        # only needed when redis is used
+        import redis
+        return RedisStorage(redis.StrictRedis(
+            host=os.environ.get("REDIS_HOST", "localhost"),
+            port=int(os.environ.get("REDIS_PORT", "6379")),
+            decode_responses=False), constants.redis_prefix)
+    if backend == "sqlite":
+        return SqliteStorage(constants.sqlite_path)
+    raise ValueError(backend)
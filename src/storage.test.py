@@ -0,0 +1,95 @@
+import unittest
+
+import storage
+
+
+class StorageTests:
+    """
+    The same tests for every backend, make_storage returns a new one
+    """
+
+    def setUp(self):
+        self.db = self.make_storage()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_put_get(self):
+        self.assertIsNone(self.db.get("voting", "1"))
+        self.db.put("voting", "1", b"poll")
+        self.assertEqual(self.db.get("voting", "1"), b"poll")
+        self.db.put("voting", "1", b"newer")
+        self.assertEqual(self.db.get("voting", "1"), b"newer")
+
+    def test_namespaces(self):
+        self.db.put("voting", "1", b"open")
+        self.db.put("voting_archive", "1", b"ended")
+        self.assertEqual(self.db.get_all("voting"), {"1": b"open"})
+        self.assertEqual(self.db.get_all("voting_archive"), {"1": b"ended"})
+        self.db.clear("voting")
+        self.assertEqual(self.db.get_all("voting"), {})
+        self.assertEqual(self.db.get("voting_archive", "1"), b"ended")
+
+    def test_batches(self):
+        items = {str(i): str(i).encode() for i in range(1200)}
+        self.db.put_many("voting", items)
+        self.assertEqual(self.db.get_all("voting"), items)
+        keys = [str(i) for i in range(0, 1300, 2)]
+        self.assertEqual(self.db.get_many("voting", keys),
+                         {key: items[key] for key in keys if key in items})
+        self.db.delete_many("voting", keys)
+        self.assertEqual(len(self.db.get_all("voting")), 600)
+        self.assertEqual(self.db.get_many("voting", []), {})
+
+    def test_delete(self):
+        self.db.put("confirmations", "1:2", b"{}")
+        self.db.delete("confirmations", "1:2")
+        self.db.delete("confirmations", "3:4")
+        self.assertEqual(self.db.get_all("confirmations"), {})
+
+    def test_transaction(self):
+        self.db.put("voting", "1", b"poll")
+        with self.db.transaction() as transaction:
+            transaction.put("voting_archive", "1", b"archived")
+            transaction.delete("voting", "1")
+            # nothing is written until the transaction ends
+            self.assertEqual(self.db.get("voting", "1"), b"poll")
+        self.assertIsNone(self.db.get("voting", "1"))
+        self.assertEqual(self.db.get("voting_archive", "1"), b"archived")
+
+    def test_transaction_raises(self):
+        self.db.put("voting", "1", b"poll")
+        try:
+            with self.db.transaction() as transaction:
+                transaction.put("voting_archive", "1", b"archived")
+                transaction.delete("voting", "1")
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        self.assertEqual(self.db.get("voting", "1"), b"poll")
+        self.assertIsNone(self.db.get("voting_archive", "1"))
+
+
+class TestMemoryStorage(StorageTests, unittest.TestCase):
+
+    def make_storage(self):
+        return storage.MemoryStorage()
+
+
+class TestSqliteStorage(StorageTests, unittest.TestCase):
+
+    def make_storage(self):
+        return storage.SqliteStorage(":memory:")
+
+
+class TestConnect(unittest.TestCase):
+
+    def test_backends(self):
+        self.assertIsInstance(storage.connect("memory"),
+                              storage.MemoryStorage)
+        with self.assertRaises(ValueError):
+            storage.connect("postgres")
+
+
+if __name__ == "__main__":
+    unittest.main()
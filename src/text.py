@@ -1,17 +1,31 @@
+import json
+
 add_option_wrong_format = "you passed the incorrect number of parameters"
 already_voted = "it looks like you already voted"
 cannot_convert_to_int = "there was an error converting a string to an integer"
 cannot_vote_poll_closed = "this poll is not open, it either must first be " \
                           "started before voting, or this poll has ended "
+ballot_expired = "this ballot has expired, use ?vote in the poll channel " \
+                 "to get a new one"
 cant_find_poll = "sorry, I cannot find a poll with that id, please try again"
 confirm_end_poll = "Are you sure you want to end this poll?\nNo more votes " \
                    "will be able to be cast and the results will be " \
                    "calculated, to, proceed, reply `yes` to stop, type `no` "
 confirm_vote = "Respond with a `yes` if your vote is correct or respond " \
                "with a `no` if it is not. \nYour vote:"
+count_failed = "counting the votes failed or took too long, the poll has " \
+               "been reopened, use ?endpoll to try again"
+count_failed_provisional = "counting the provisional results failed or " \
+                           "took too long"
+count_failed_recount = "the recount failed or took too long"
+counting_votes = "counting the votes..."
 invalid_poll_type = "That isn't a valid poll type, please try again"
+invalid_trace_format = "That isn't a valid trace format, use jsonl or csv"
 invalid_vote_option = "that option doesnt exist, please try again"
+no_count_trace = "this poll doesn't have a round by round count"
+no_receipt = "you don't have a ballot receipt for that poll"
 no_poll_in_channel = "this channel doesn't have a poll running"
+nothing_to_export = "this poll type doesn't have any ballots to export"
 not_enough_options = "there are less than two options for people to vote " \
                      "on!\n\nHere are the current options:\n\n"
 not_in_server_long_enough = "This discord account has not been in the " \
@@ -22,6 +36,17 @@ poll_already_ended = "this poll has already ended"
 poll_already_started = "this poll has already started"
 poll_not_started = "this poll has not started yet"
 poll_now_closed = "The poll has now been closed."
+recount_not_supported = "only STV elections can be recounted"
+recount_usage = "use `?recount exclude @user` to recount as if a " \
+                "candidate had withdrawn, or `?recount seats <n>` to " \
+                "recount for a different number of seats"
+tie_analysis_failed = "the tie analysis failed or took too long"
+tie_analysis_not_supported = "only STV elections can have their ties " \
+                             "analysed"
+tie_analysis_usage = "use `?tieanalysis [seconds]` to rerun the count with " \
+                     "random tie breaks and resampled ballots, or " \
+                     "`?tieanalysis [seconds] tiebreak` to only break ties " \
+                     "at random"
 stv_submit_text = "To vote in this poll, rank the available options " \
                   "starting at 1, copy and paste the following, and replace " \
                   "the <x>s with your ranking (or leave the <x>s there if " \
@@ -30,9 +55,79 @@ timeout = "Two minute timeout reached, please enter the original command again"
 vote_not_processed = "your vote has not been processed, please try again"
 vote_processed = "your vote has been processed"
 not_in_server = "you were not found in the server."
+not_eligible = "you are not eligible to vote in this poll, only members " \
+               "whose account was old enough and who had joined the " \
+               "server when the poll started can vote"
 
 
 def account_age(user_age, required_age):
     return ("this discord account is " + str(
         user_age) + " days old, your account must be at least " +
         str(required_age) + " days old.")
+
+
+def still_counting(seconds):
+    return "counting the votes... " + str(seconds) + " seconds so far"
+
+
+def counted(seconds):
+    return "counted the votes in " + str(seconds) + " seconds"
+
+
+def ballot_instructions(poll_id):
+    return ("Your ballot for " + str(poll_id) + ":\npick from the menus "
+            + "below, most preferred first if you can pick more than one, "
+            + "then press Submit to cast your vote")
+
+
+def ballot_placeholder(rank, max_choices, ranked):
+    if max_choices == 1:
+        return "choose an option"
+    if not ranked:
+        return "choose another option you approve of"
+    return "choose your number " + str(rank) + " pick"
+
+
+def eligible_voters(count):
+    return str(count) + " members are eligible to vote"
+
+
+def provisional_results(ballot_count):
+    return ("Provisional results from " + str(ballot_count)
+            + " ballots, the poll is still open:\n\n")
+
+
+def recount_results(excluded, seat_count):
+    r_val = "What-if recount"
+    if excluded:
+        r_val += " without " + ", ".join(excluded)
+    if seat_count is not None:
+        r_val += " for " + str(seat_count) + " seats"
+    return r_val + ", the official results are unchanged:\n\n"
+
+
+def analysing_ties(seconds):
+    return ("rerunning the count with random tie breaks for "
+            + str(seconds) + " seconds...")
+
+
+def tie_analysis_results(bootstrap):
+    if bootstrap:
+        return ("Tie analysis with ties broken at random and the ballots "
+                + "resampled, the official results are unchanged:\n\n")
+    return ("Tie analysis with ties broken at random, the official results "
+            + "are unchanged:\n\n")
+
+
+def ballot_receipt(channel_id, receipt):
+    return ("Your ballot receipt, keep it to check your ballot was counted "
+            + "against the root published with the results, or use "
+            + "`?receipt " + channel_id + "` for a proof against "
+            + "the latest root:\n```json\n"
+            + json.dumps(receipt, separators=(",", ":"))
+            + "\n```")
+
+
+def receipt_root(root, size):
+    return ("\nBallot receipt root: `" + root + "` (" + str(size)
+            + " receipts)")
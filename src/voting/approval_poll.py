@@ -0,0 +1,207 @@
+from collections import Counter
+from voting.poll import Poll
+from voting.ffrvoter import FFRVoter
+from voting.exports import csv_export
+import logging
+
+# each byte of a ballot spread out to one field per option, see count_bits
+byte_fields = dict()
+
+
+def bit_indexes(bits):
+    """
+    :param bits: an integer bitset
+    :type bits: int
+    :return: the index of every set bit, lowest first
+    :rtype: list
+    """
+    indexes = []
+    while bits:
+        low = bits & -bits
+        indexes.append(low.bit_length() - 1)
+        bits ^= low
+    return indexes
+
+
+def count_bits(ballots, option_count):
+    """
+    counts how many ballots have each bit set
+
+    Identical ballots are grouped first. Each group is then spread into one
+    packed integer with a fixed width field per option, a byte of the ballot
+    at a time, so a ballot is added to every option's count with one integer
+    addition.
+
+    :param ballots: integer bitsets over the option indexes
+    :type ballots: list
+    :param option_count: the number of options
+    :type option_count: int
+    :return: the count for each option index
+    :rtype: list
+    """
+    groups = Counter(ballots)
+    width = max(1, len(ballots).bit_length())
+    if width not in byte_fields:
+        byte_fields[width] = [sum(1 << (width * bit) for bit in range(8)
+                                  if byte >> bit & 1)
+                              for byte in range(256)]
+    table = byte_fields[width]
+    field = (1 << width) - 1
+
+    packed = 0
+    for bits, count in groups.items():
+        spread = 0
+        shift = 0
+        while bits:
+            spread |= table[bits & 0xff] << shift
+            bits >>= 8
+            shift += 8 * width
+        packed += spread * count
+    return [(packed >> (width * index)) & field
+            for index in range(option_count)]
+
+
+class ApprovalPoll(Poll):
+    """
+    An approval vote, each voter approves of as many options as they like and
+    the option with the most approvals wins
+    https://en.wikipedia.org/wiki/Approval_voting
+
+    A ballot is stored as an integer bitset with bit n set if the voter
+    approves of the option with index n.
+    """
+
+    def __init__(self, poll_id, channel_id):
+        logging.debug("creating approval poll")
+        super().__init__(poll_id, channel_id)
+        self.type = "approval"
+
+    def rebuild_tally(self):
+        self.option_ids = [option["id"] for option in
+                           sorted(self.options.values(),
+                                  key=lambda option: option["index"])]
+        self.tally = count_bits([voter.vote for voter in self.voters.values()],
+                                len(self.option_ids))
+
+    def parse_ballot(self, ballot_args: list):
+        """
+        parses the option numbers a voter approves of, separated by commas or
+        spaces
+
+        :return: the ballot bitset, or None if the ballot isn't valid
+        :rtype: int or None
+        """
+        bits = 0
+        try:
+            for arg in ballot_args:
+                for number in arg.replace(",", " ").split():
+                    index = int(number.strip("<>")) - 1
+                    if not 0 <= index < len(self.options):
+                        return None
+                    bits |= 1 << index
+        except ValueError:
+            return None
+        return bits or None
+
+    def check_valid_ballot(self, ballot_args: list):
+        return self.parse_ballot(ballot_args) is not None
+
+    def confirm_vote_text(self, ballot_args: list):
+        return self.confirm_bits_text(self.parse_ballot(ballot_args) or 0)
+
+    def confirm_bits_text(self, bits):
+        return "approved options: " + ", ".join(
+            self.option_ids[index] for index in bit_indexes(bits))
+
+    def submit_vote(self, voter_id: str, voter_name: str, args: list):
+        self.check_can_vote(voter_id)
+        bits = self.parse_ballot(args)
+        if bits is None:
+            logging.error("invalid ballot in submit_vote")
+            return
+        self.add_vote(voter_id, voter_name, bits)
+
+    def add_vote(self, voter_id: str, voter_name: str, vote):
+        self.sync_tally()
+        voter = FFRVoter(voter_id, voter_name)
+        voter.set_vote(vote)
+        self.voters[str(voter_id)] = voter
+        for index in bit_indexes(vote):
+            self.tally[index] += 1
+        self.ballot_version += 1
+        self.add_receipt(voter_id, vote)
+
+    def remove_voter(self, id):
+        if self.check_if_voted(id):
+            voter = self.voters.pop(id)
+            self.ballot_version += 1
+            self.remove_receipt(id)
+            for index in bit_indexes(voter.vote):
+                self.tally[index] -= 1
+            return True
+        else:
+            return False
+
+    def get_max_choices(self):
+        return len(self.options)
+
+    def choices_to_vote(self, choices: list):
+        if len(choices) == 0 or any(id not in self.options for id in choices):
+            return None
+        bits = 0
+        for id in choices:
+            bits |= 1 << self.options[id]["index"]
+        return bits
+
+    def confirm_choices_text(self, choices: list):
+        return "approved options: " + ", ".join(choices)
+
+    def get_vote_text(self):
+        return ("To vote in this poll, find the numbers of every option you "
+                + "approve of, then copy and paste the following, with the "
+                + "<x> replaced with those numbers separated by commas:")
+
+    def get_results(self, trace=None):
+        winner = self.get_winner()
+        if winner is False:
+            r_val = "Its a Tie!\n"
+        else:
+            r_val = "The winner is: " + winner["id"] + "\n"
+        for index in self.get_ranked_indexes():
+            count = self.tally[index]
+            r_val += "\n" + self.option_ids[index] + ": "\
+                + str(round(100 * count / max(1, len(self.voters))))\
+                + "% approve   " + str(count) + " approvals"
+
+        r_val += "\n\nTotal ballots: " + str(len(self.voters))
+        return r_val
+
+    def restore_voter(self, voter):
+        pass
+
+    def encode_vote(self, vote):
+        return vote
+
+    def decode_vote(self, vote):
+        return vote
+
+    def get_csv(self, compress=False):
+        self.sync_tally()
+        rows = ({option_id: vote >> index & 1
+                 for index, option_id in enumerate(self.option_ids)}
+                for vote in (voter.vote for voter in self.voters.values()))
+        return csv_export(rows, list(self.option_ids), "votes.csv", compress)
+
+    def get_voter_info(self, compress=False):
+        self.sync_tally()
+
+        def rows():
+            for voter in self.voters.values():
+                row = {option_id: voter.vote >> index & 1
+                       for index, option_id in enumerate(self.option_ids)}
+                row["voter name"] = voter.name
+                row["voter id"] = voter.id
+                yield row
+
+        fields = ["voter name", "voter id"] + list(self.option_ids)
+        return csv_export(rows(), fields, "voter_info.csv", compress)
@@ -0,0 +1,62 @@
+import random
+import unittest
+from voting.approval_poll import ApprovalPoll, bit_indexes, count_bits
+from voting.counting import count_poll, load_poll
+from voting.poll import InvalidBallot
+
+
+def make_poll():
+    poll = ApprovalPoll("test", "fake id")
+    poll.add_option(None, ["a", "first"])
+    poll.add_option(None, ["b", "second"])
+    poll.add_option(None, ["c", "third"])
+    poll.start_poll()
+    return poll
+
+
+class TestApprovalPoll(unittest.TestCase):
+
+    def test_count_bits(self):
+        rng = random.Random(3)
+        ballots = [rng.getrandbits(20) for _ in range(500)]
+        self.assertEqual(count_bits(ballots, 20),
+                         [sum(ballot >> index & 1 for ballot in ballots)
+                          for index in range(20)])
+        self.assertEqual(bit_indexes(0b100101), [0, 2, 5])
+
+    def test_submit_vote(self):
+        poll = make_poll()
+        self.assertFalse(poll.check_valid_ballot(["4"]))
+        self.assertFalse(poll.check_valid_ballot(["x"]))
+        self.assertFalse(poll.check_valid_ballot([""]))
+        self.assertEqual(poll.confirm_vote_text(["1,3"]),
+                         "approved options: a, c")
+        poll.submit_vote("1", "one", ["1,3"])
+        poll.submit_vote("2", "two", ["3", "2"])
+        poll.submit_choices("3", "three", ["c"])
+        with self.assertRaises(InvalidBallot):
+            poll.submit_choices("4", "four", ["d"])
+        self.assertEqual(poll.voters["1"].vote, 0b101)
+        self.assertEqual(poll.get_tally(), [("a", 1), ("b", 1), ("c", 3)])
+        poll.remove_voter("2")
+        self.assertEqual(poll.get_tally(), [("a", 1), ("b", 0), ("c", 2)])
+        poll.rebuild_tally()
+        self.assertEqual(poll.get_tally(), [("a", 1), ("b", 0), ("c", 2)])
+
+    def test_results_and_state(self):
+        poll = make_poll()
+        for i in range(10):
+            poll.submit_vote(str(i), "voter", ["1, 2" if i % 2 else "2"])
+        self.assertTrue(poll.get_results().startswith("The winner is: b"))
+        state = poll.to_state()
+        loaded = load_poll(state)
+        self.assertIsInstance(loaded, ApprovalPoll)
+        self.assertEqual(loaded.get_tally(), poll.get_tally())
+        self.assertEqual(loaded.to_state(), state)
+        csv_name, csv_data = count_poll(state)["csv"]
+        self.assertEqual(csv_data.decode().splitlines()[:3],
+                         ["a,b,c", "0,1,0", "1,1,0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
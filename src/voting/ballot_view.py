@@ -0,0 +1,160 @@
+import logging
+
+import discord
+
+import constants
+import text
+from voting.poll import AlreadyVoted, InvalidBallot, VoteAlreadyClosed, \
+    VoteNotOpen
+
+# discord allows 25 options in a select menu and 5 rows in a message, the
+# last row is kept for the buttons
+select_size = 25
+select_rows = 4
+
+
+class BallotView(discord.ui.View):
+    """
+    A ballot sent as select menus
+
+    The voter picks their choices in order from the menus, each pick edits
+    the ballot message to show the ballot so far, and one press of submit
+    validates and records the vote. This replaces copying the ?submitballot
+    template, editing it and replying yes to confirm it.
+
+    :param polls: the polls cog, used to find and save the poll
+    :param channel_id: the id of the channel the poll is in
+    :type channel_id: str
+    :param poll: the poll being voted in
+    """
+
+    def __init__(self, polls, channel_id, poll):
+        super().__init__(timeout=constants.ballot_timeout_seconds)
+        self.polls = polls
+        self.channel_id = channel_id
+        self.choices = []
+        # the dm the ballot was sent in, or the slash command it was the
+        # ephemeral response to
+        self.message = None
+        self.interaction = None
+        self.build(poll)
+
+    @staticmethod
+    def fits(poll):
+        """
+        :return: whether every option fits in the select menus of one message
+        :rtype: bool
+        """
+        return len(poll.options) <= select_size * select_rows
+
+    def get_poll(self):
+        return self.polls.polls.get(self.channel_id)
+
+    def build(self, poll):
+        """
+        rebuilds the menus so they only offer the options not picked yet
+        """
+        self.clear_items()
+        if len(self.choices) < poll.get_max_choices():
+            remaining = [choice for choice in poll.get_ballot_choices()
+                         if choice[0] not in self.choices]
+            placeholder = text.ballot_placeholder(len(self.choices) + 1,
+                                                  poll.get_max_choices(),
+                                                  poll.is_ranked())
+            for row, start in enumerate(range(0, len(remaining),
+                                              select_size)):
+                select = discord.ui.Select(
+                    placeholder=placeholder,
+                    row=row,
+                    options=[discord.SelectOption(
+                        label=label[:100],
+                        value=option_id,
+                        description=(None if description is None
+                                     else description[:100]))
+                        for option_id, label, description
+                        in remaining[start:start + select_size]])
+                select.callback = self.choose
+                self.add_item(select)
+
+        submit = discord.ui.Button(label="Submit",
+                                   style=discord.ButtonStyle.green,
+                                   row=select_rows,
+                                   disabled=len(self.choices) == 0)
+        submit.callback = self.submit
+        self.add_item(submit)
+        clear = discord.ui.Button(label="Clear",
+                                  style=discord.ButtonStyle.grey,
+                                  row=select_rows,
+                                  disabled=len(self.choices) == 0)
+        clear.callback = self.clear
+        self.add_item(clear)
+
+    def render(self, poll):
+        r_val = text.ballot_instructions(poll.poll_id)
+        if len(self.choices) != 0:
+            r_val += "\n\n" + poll.confirm_choices_text(self.choices)
+        return r_val
+
+    async def choose(self, interaction):
+        poll = self.get_poll()
+        if poll is None:
+            await self.close(interaction, text.cant_find_poll)
+            return
+        choice = interaction.data["values"][0]
+        if (choice not in self.choices
+                and len(self.choices) < poll.get_max_choices()):
+            self.choices.append(choice)
+        self.build(poll)
+        await interaction.response.edit_message(content=self.render(poll),
+                                                view=self)
+
+    async def clear(self, interaction):
+        poll = self.get_poll()
+        if poll is None:
+            await self.close(interaction, text.cant_find_poll)
+            return
+        self.choices = []
+        self.build(poll)
+        await interaction.response.edit_message(content=self.render(poll),
+                                                view=self)
+
+    async def submit(self, interaction):
+        poll = self.get_poll()
+        if poll is None:
+            await self.close(interaction, text.cant_find_poll)
+            return
+        user = interaction.user
+        try:
+            poll.submit_choices(str(user.id), user.name, self.choices)
+        except AlreadyVoted:
+            await self.close(interaction, text.already_voted)
+            return
+        except VoteNotOpen:
+            await self.close(interaction, text.poll_not_started)
+            return
+        except VoteAlreadyClosed:
+            await self.close(interaction, text.poll_already_ended)
+            return
+        except InvalidBallot:
+            await self.close(interaction, text.vote_not_processed)
+            return
+        self.polls.save_one(self.channel_id)
+        self.polls.ballots_changed(self.channel_id)
+        await self.close(interaction, text.vote_processed + "\n\n"
+                         + poll.confirm_choices_text(self.choices))
+        await self.polls.send_receipt(user, self.channel_id, poll)
+
+    async def close(self, interaction, content):
+        self.stop()
+        await interaction.response.edit_message(content=content, view=None)
+
+    async def on_timeout(self):
+        try:
+            if self.message is not None:
+                await self.message.edit(content=text.ballot_expired,
+                                        view=None)
+            elif self.interaction is not None:
+                await self.interaction.edit_original_response(
+                    content=text.ballot_expired, view=None)
+        except discord.HTTPException as e:
+            logging.exception(e)
@@ -0,0 +1,145 @@
+"""
+Counting polls in a worker process so a large count or export doesn't hold
+up the bot's event loop. Polls are sent to the worker as the compact state
+from Poll.to_state rather than as the pickled poll.
+"""
+from collections import OrderedDict
+from voting.poll import Poll
+from voting.approval_poll import ApprovalPoll
+from voting.stv_election import StvElection
+from voting.schulze_election import SchulzeElection
+from voting.stv_trace import export_trace
+
+# checkpointed counts kept by this worker process, oldest first, so repeated
+# what-if recounts of the same election can resume them
+engines = OrderedDict()
+engine_cache_size = 4
+
+poll_types = {"poll": Poll, "election": StvElection,
+              "schulze": SchulzeElection, "approval": ApprovalPoll}
+
+
+def load_poll(state):
+    """
+    rebuilds a poll of the right type from its state
+
+    :param state: the poll state from Poll.to_state
+    :type state: dict
+    :rtype: Poll
+    """
+    return poll_types[state["type"]].from_state(state)
+
+
+def count_poll(state, trace_format=None, with_csv=True, compress=False):
+    """
+    counts a poll and builds the files that go with its results
+
+    :param state: the poll state from Poll.to_state
+    :type state: dict
+    :param trace_format: the format for the round by round trace, or None to
+        leave it out
+    :type trace_format: str or None
+    :param with_csv: whether to export the votes csv
+    :type with_csv: bool
+    :param compress: whether to gzip the exports
+    :type compress: bool
+    :return: the results text, and a (file name, bytes) tuple or None for
+        each of the csv and the trace
+    :rtype: dict
+    """
+    poll = load_poll(state)
+    trace = []
+    r_val = {"results": poll.get_results(trace), "csv": None, "trace": None}
+
+    if trace and trace_format is not None:
+        trace_name, trace_file = export_trace(trace, trace_format, compress)
+        r_val["trace"] = (trace_name, trace_file.getvalue())
+
+    if with_csv:
+        r_val["csv"] = export_poll(state, "votes", compress, poll)
+    return r_val
+
+
+def count_results(state):
+    """
+    counts a poll without building a trace or any exports
+
+    :param state: the poll state from Poll.to_state
+    :type state: dict
+    :return: the results text
+    :rtype: str
+    """
+    return load_poll(state).get_results()
+
+
+def recount_poll(state, excluded=(), seat_count=None):
+    """
+    counts what an STV election's results would be with some candidates
+    withdrawn or a different number of seats
+
+    :param state: the poll state from Poll.to_state
+    :type state: dict
+    :param excluded: ids of the candidates to leave out
+    :type excluded: list
+    :param seat_count: the number of seats, or None to keep it
+    :type seat_count: int or None
+    :return: the results text
+    :rtype: str
+    """
+    poll = load_poll(state)
+    key = (state["channel_id"], state["poll_id"],
+           state.get("ballot_version", 0))
+    count = engines.get(key)
+    if count is None:
+        count = poll.checkpointed_count()
+        engines[key] = count
+        while len(engines) > engine_cache_size:
+            engines.popitem(last=False)
+    engines.move_to_end(key)
+    return poll.get_recount_results(count, excluded, seat_count)
+
+
+def analyse_ties(state, seconds, seed, bootstrap=True):
+    """
+    runs one worker's share of an STV election's tie analysis
+
+    :param state: the poll state from Poll.to_state
+    :type state: dict
+    :param seconds: how long to keep running trials for
+    :type seconds: float
+    :param seed: the seed for this worker's trials
+    :type seed: int
+    :param bootstrap: whether to resample the ballots for every trial
+    :type bootstrap: bool
+    :return: the number of trials and how many each candidate won
+    :rtype: dict
+    """
+    return load_poll(state).simulate_ties(seconds, seed, bootstrap)
+
+
+def export_poll(state, export, compress=False, poll=None):
+    """
+    exports a poll's ballots
+
+    :param state: the poll state from Poll.to_state
+    :type state: dict
+    :param export: votes for the anonymous ballots, voter_info to include
+        who cast each ballot
+    :type export: str
+    :param compress: whether to gzip the export
+    :type compress: bool
+    :param poll: the poll, if it has already been rebuilt from the state
+    :return: the file name and the file contents, or None if this poll type
+        has nothing to export
+    :rtype: tuple or None
+    """
+    if poll is None:
+        poll = load_poll(state)
+    if export == "voter_info":
+        exported = poll.get_voter_info(compress)
+    else:
+        exported = poll.get_csv(compress)
+    if not exported:
+        return None
+    file_name, buffer = exported
+    return file_name, buffer.getvalue()
@@ -0,0 +1,50 @@
+"""
+Working out who can vote in a poll. The electorate is snapshotted once when
+the poll starts, from the member cache, so checking a voter is a set lookup
+rather than recomputing their account age and join date on every attempt.
+"""
+from datetime import datetime, timezone
+
+import constants
+
+join_cutoff = datetime.fromisoformat(constants.voting_join_cutoff)
+
+
+def account_age_days(user, now):
+    """
+    :param user: a discord user or member
+    :param now: the time to measure the age at, timezone aware
+    :type now: datetime
+    :return: how many whole days old the account is
+    :rtype: int
+    """
+    return (now - user.created_at.replace(tzinfo=timezone.utc)).days
+
+
+def joined_before_cutoff(member):
+    """
+    :param member: a discord member
+    :return: whether the member joined the server before the cutoff
+    :rtype: bool
+    """
+    if member.joined_at is None:
+        return False
+    return member.joined_at.replace(tzinfo=timezone.utc) < join_cutoff
+
+
+def snapshot(members, now, age_days=constants.voting_age_days):
+    """
+    builds the electorate for a poll
+
+    :param members: the members of the server
+    :param now: the time the poll starts, timezone aware
+    :type now: datetime
+    :param age_days: how old an account has to be to vote
+    :type age_days: int
+    :return: the ids of every member who can vote
+    :rtype: frozenset
+    """
+    return frozenset(member.id for member in members
+                     if not member.bot
+                     and account_age_days(member, now) >= age_days
+                     and joined_before_cutoff(member))
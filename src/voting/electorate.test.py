@@ -0,0 +1,31 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from voting import electorate
+
+
+def member(id, age_days, joined, bot=False):
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return SimpleNamespace(id=id, bot=bot,
+                           created_at=now - timedelta(days=age_days),
+                           joined_at=joined)
+
+
+class TestElectorate(unittest.TestCase):
+
+    def test_snapshot(self):
+        now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        early = datetime(2023, 1, 1, tzinfo=timezone.utc)
+        late = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        members = [member(1, 400, early),
+                   member(2, 3, early),
+                   member(3, 400, late),
+                   member(4, 400, None),
+                   member(5, 400, early, bot=True),
+                   member(6, 14, early)]
+        self.assertEqual(electorate.snapshot(members, now, 14),
+                         frozenset([1, 6]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+In memory exports, so polls exporting at the same time can't overwrite each
+other's files and nothing is left in the working directory
+"""
+import csv
+import gzip
+import io
+
+
+def text_export(write, file_name, compress=False):
+    """
+    streams text into an in memory file, optionally gzip compressed
+
+    :param write: called with a text stream to write the export to
+    :type write: function
+    :param file_name: the name of the file once it is attached
+    :type file_name: str
+    :param compress: whether to gzip the export
+    :type compress: bool
+    :return: the file name and a binary buffer holding the export
+    :rtype: tuple
+    """
+    buffer = io.BytesIO()
+    raw = gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) if compress \
+        else buffer
+    stream = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    write(stream)
+    stream.flush()
+    stream.detach()
+    if compress:
+        raw.close()
+        file_name += ".gz"
+    buffer.seek(0)
+    return file_name, buffer
+
+
+def csv_export(rows, fields, file_name, compress=False):
+    """
+    streams rows into an in memory csv file
+
+    :param rows: dicts keyed by field, can be a generator
+    :param fields: the csv header
+    :type fields: list
+    :return: the file name and a binary buffer holding the csv
+    :rtype: tuple
+    """
+    def write(stream):
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return text_export(write, file_name, compress)
@@ -0,0 +1,237 @@
+"""
+An append only Merkle tree of ballot hashes, hashed the way certificate
+transparency logs are (RFC 6962), so a voter can check their ballot is in
+the tree a published root commits to without seeing anyone else's ballot.
+https://www.rfc-editor.org/rfc/rfc9162#section-2.1
+"""
+import hashlib
+import json
+
+
+def leaf_hash(data):
+    """
+    :param data: the leaf's contents
+    :type data: bytes
+    :rtype: bytes
+    """
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def split_point(size):
+    """
+    :return: the largest power of two smaller than size
+    :rtype: int
+    """
+    return 1 << ((size - 1).bit_length() - 1)
+
+
+class MerkleTree:
+    """
+    Keeps the hash of every complete subtree, level by level, so appending
+    a leaf only hashes the subtrees it completes, O(log n), and the root or
+    an inclusion proof for any earlier size of the tree can be built from
+    O(log n) stored hashes.
+
+    Only the leaf hashes are pickled, the levels above are rebuilt on load.
+    """
+
+    def __init__(self):
+        # levels[h][i] is the hash of the 2^h leaves starting at i * 2^h
+        self.levels = [[]]
+
+    def __getstate__(self):
+        return {"leaves": self.to_bytes()}
+
+    def __setstate__(self, state):
+        self.levels = [[]]
+        self.extend(state["leaves"])
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def append(self, leaf):
+        """
+        adds a leaf hash to the tree
+
+        :param leaf: the leaf hash, from leaf_hash
+        :type leaf: bytes
+        :return: the index of the new leaf
+        :rtype: int
+        """
+        index = len(self.levels[0])
+        self.levels[0].append(leaf)
+        position = index
+        height = 0
+        # an odd position completes a subtree with its left sibling
+        while position & 1:
+            level = self.levels[height]
+            if height + 1 == len(self.levels):
+                self.levels.append([])
+            self.levels[height + 1].append(node_hash(level[position - 1],
+                                                     level[position]))
+            position >>= 1
+            height += 1
+        return index
+
+    def extend(self, leaves):
+        """
+        adds many leaf hashes at once, a level at a time
+
+        :param leaves: leaf hashes concatenated, as from to_bytes
+        :type leaves: bytes
+        """
+        self.levels[0].extend(leaves[start:start + 32]
+                              for start in range(0, len(leaves), 32))
+        height = 0
+        while len(self.levels[height]) >= 2:
+            below = self.levels[height]
+            if height + 1 == len(self.levels):
+                self.levels.append([])
+            above = self.levels[height + 1]
+            above.extend(node_hash(below[i], below[i + 1])
+                         for i in range(2 * len(above), len(below) - 1, 2))
+            height += 1
+
+    def to_bytes(self):
+        return b"".join(self.levels[0])
+
+    def subtree(self, start, size):
+        """
+        :return: the hash of the size leaves starting at start
+        :rtype: bytes
+        """
+        if size & (size - 1) == 0 and start % size == 0:
+            return self.levels[size.bit_length() - 1][start // size]
+        k = split_point(size)
+        return node_hash(self.subtree(start, k),
+                         self.subtree(start + k, size - k))
+
+    def root(self, size=None):
+        """
+        :param size: how many leaves the tree had, or None for all of them
+        :type size: int or None
+        :return: the root hash of the tree at that size
+        :rtype: bytes
+        """
+        if size is None:
+            size = len(self)
+        if size == 0:
+            return hashlib.sha256().digest()
+        return self.subtree(0, size)
+
+    def inclusion_proof(self, index, size=None):
+        """
+        :param index: the index of the leaf
+        :type index: int
+        :param size: how many leaves the tree had, or None for all of them
+        :type size: int or None
+        :return: the sibling hashes from the leaf up to the root
+        :rtype: list
+        :raises IndexError: if the leaf isn't in the tree at that size
+        """
+        if size is None:
+            size = len(self)
+        if not 0 <= index < size <= len(self):
+            raise IndexError(index)
+        proof = []
+        start = 0
+        # walk down from the root, collecting the sibling of each subtree the
+        # leaf is in, then reverse them to run from the leaf up
+        while size > 1:
+            k = split_point(size)
+            if index - start < k:
+                proof.append(self.subtree(start + k, size - k))
+                size = k
+            else:
+                proof.append(self.subtree(start, k))
+                start += k
+                size -= k
+        proof.reverse()
+        return proof
+
+
+def verify_inclusion(leaf, index, size, proof, root):
+    """
+    checks an inclusion proof
+
+    :param leaf: the leaf hash
+    :type leaf: bytes
+    :param index: the index of the leaf
+    :type index: int
+    :param size: how many leaves the tree had
+    :type size: int
+    :param proof: the sibling hashes from the leaf up to the root
+    :type proof: list
+    :param root: the root hash of the tree at that size
+    :type root: bytes
+    :return: whether the proof shows the leaf is in the tree
+    :rtype: bool
+    """
+    if not 0 <= index < size:
+        return False
+    fn = index
+    sn = size - 1
+    r = leaf
+    for sibling in proof:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(sibling, r)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            r = node_hash(r, sibling)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r == root
+
+
+def ballot_leaf(poll_id, voter_id, ballot, nonce):
+    """
+    the leaf contents for a ballot, the random nonce stops anyone who sees
+    the leaf hash in someone else's proof from guessing their ballot
+
+    :param ballot: the encoded ballot, from Poll.encode_vote
+    :param nonce: the random hex string given to the voter with the receipt
+    :type nonce: str
+    :rtype: bytes
+    """
+    return json.dumps([poll_id, str(voter_id), ballot, nonce],
+                      separators=(",", ":")).encode("utf-8")
+
+
+def removal_leaf(poll_id, voter_id, index):
+    """
+    the leaf contents recording that the ballot at index was removed, the
+    removed ballot's own leaf stays in the tree
+
+    :rtype: bytes
+    """
+    return json.dumps([poll_id, str(voter_id), "removed", index],
+                      separators=(",", ":")).encode("utf-8")
+
+
+def verify_receipt(receipt, root=None):
+    """
+    checks a ballot receipt from Poll.get_receipt
+
+    :param receipt: the receipt
+    :type receipt: dict
+    :param root: the published root hash as hex, or None to check against
+        the root in the receipt
+    :type root: str or None
+    :return: whether the ballot in the receipt is in the tree
+    :rtype: bool
+    """
+    if root is None:
+        root = receipt["root"]
+    leaf = leaf_hash(ballot_leaf(receipt["poll"], receipt["voter"],
+                                 receipt["ballot"], receipt["nonce"]))
+    return verify_inclusion(leaf, receipt["index"], receipt["size"],
+                            [bytes.fromhex(x) for x in receipt["proof"]],
+                            bytes.fromhex(root))
@@ -0,0 +1,63 @@
+import hashlib
+import pickle
+import unittest
+from voting import merkle
+
+
+def reference_root(leaves):
+    # the recursive definition from RFC 6962
+    if len(leaves) == 0:
+        return hashlib.sha256().digest()
+    if len(leaves) == 1:
+        return leaves[0]
+    k = merkle.split_point(len(leaves))
+    return merkle.node_hash(reference_root(leaves[:k]),
+                            reference_root(leaves[k:]))
+
+
+class TestMerkleTree(unittest.TestCase):
+
+    def test_root(self):
+        tree = merkle.MerkleTree()
+        leaves = []
+        self.assertEqual(tree.root(), reference_root(leaves))
+        for i in range(40):
+            leaves.append(merkle.leaf_hash(str(i).encode("utf-8")))
+            tree.append(leaves[-1])
+            self.assertEqual(tree.root(), reference_root(leaves))
+        for size in range(41):
+            self.assertEqual(tree.root(size), reference_root(leaves[:size]))
+
+    def test_inclusion_proof(self):
+        tree = merkle.MerkleTree()
+        leaves = [merkle.leaf_hash(str(i).encode("utf-8")) for i in range(33)]
+        for leaf in leaves:
+            tree.append(leaf)
+        for size in range(1, 34):
+            root = tree.root(size)
+            for index in range(size):
+                proof = tree.inclusion_proof(index, size)
+                self.assertLessEqual(len(proof), size.bit_length())
+                self.assertTrue(merkle.verify_inclusion(
+                    leaves[index], index, size, proof, root))
+                self.assertFalse(merkle.verify_inclusion(
+                    leaves[index - 1], index, size, proof, root)
+                    and size > 1)
+        with self.assertRaises(IndexError):
+            tree.inclusion_proof(5, 5)
+
+    def test_extend_and_pickle(self):
+        appended = merkle.MerkleTree()
+        for i in range(100):
+            appended.append(merkle.leaf_hash(str(i).encode("utf-8")))
+        extended = merkle.MerkleTree()
+        data = appended.to_bytes()
+        extended.extend(data[:32 * 37])
+        extended.extend(data[32 * 37:])
+        self.assertEqual(extended.levels, appended.levels)
+        loaded = pickle.loads(pickle.dumps(appended))
+        self.assertEqual(loaded.levels, appended.levels)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 from voting.ffrvoter import FFRVoter
+from voting import merkle
 import logging
+import secrets
 
 
 class Poll:
@@ -12,6 +14,37 @@ class Poll:
         self.channel_id = channel_id
         self.type = "poll"
         self.add_option_arg_len = 2
+        # option ids in index order, and the live vote count for each index
+        self.option_ids = []
+        self.tally = []
+        # ids of the users who can vote, snapshotted when the poll starts
+        self.electorate = None
+        # bumped whenever a ballot is added or removed
+        self.ballot_version = 0
+        # a hash of every ballot cast, and voter id to the (leaf index,
+        # nonce) of their ballot's hash
+        self.receipts = merkle.MerkleTree()
+        self.receipt_leaves = dict()
+
+    def __getstate__(self):
+        # the electorate is saved once by Polls, under its own key, rather
+        # than with every ballot
+        state = dict(self.__dict__)
+        state.pop("electorate", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # polls pickled before tallies existed rebuild them on load
+        if "tally" not in state:
+            self.rebuild_tally()
+        if "electorate" not in state:
+            self.electorate = None
+        if "ballot_version" not in state:
+            self.ballot_version = 0
+        if "receipts" not in state:
+            self.receipts = merkle.MerkleTree()
+            self.receipt_leaves = dict()
 
     def __str__(self):
         r_val = self.poll_id
@@ -44,6 +77,8 @@ class Poll:
                                 "description": description,
                                 "voters": [],
                                 "index": len(self.options)}
+            self.option_ids.append(id)
+            self.tally.append(0)
 
     def list_options(self, name_only=False):
         r_val = ""
@@ -71,8 +106,101 @@ class Poll:
     def undo_end_poll(self):
         self.ended = False
 
+    def set_electorate(self, member_ids):
+        """
+        stores the ids of the users who can vote in this poll
+
+        :param member_ids: discord user ids
+        :type member_ids: frozenset
+        """
+        self.electorate = frozenset(member_ids)
+
+    def is_eligible(self, voter_id):
+        """
+        :param voter_id: the discord id of the user
+        :return: whether the user is in the electorate, always True for polls
+            started without one
+        :rtype: bool
+        """
+        return self.electorate is None or int(voter_id) in self.electorate
+
+    def get_turnout_text(self):
+        if not self.electorate:
+            return ""
+        return ("\nTurnout: " + str(len(self.voters)) + " of "
+                + str(len(self.electorate)) + " eligible voters ("
+                + str(round(100 * len(self.voters) / len(self.electorate)))
+                + "%)")
+
     def check_if_voted(self, voter_id: str):
-        return voter_id in [x for x in self.voters.keys()]
+        return voter_id in self.voters
+
+    def rebuild_tally(self):
+        """
+        rebuilds the index to option array and the tally from the voters
+        """
+        self.option_ids = [option["id"] for option in
+                           sorted(self.options.values(),
+                                  key=lambda option: option["index"])]
+        self.tally = [0] * len(self.option_ids)
+        for voter in self.voters.values():
+            index = self.get_vote_index(voter.vote)
+            if index is not None:
+                self.tally[index] += 1
+
+    def sync_tally(self):
+        """
+        rebuilds the tally if options were added without going through
+        add_option
+        """
+        if len(self.option_ids) != len(self.options):
+            self.rebuild_tally()
+
+    def get_vote_index(self, vote):
+        """
+        returns the index of the option a vote is counted for in the tally
+
+        :param vote: the vote a voter cast
+        :return: index of that option, or None if it doesnt exist
+        :rtype: int or None
+        """
+        try:
+            return self.options[vote]["index"]
+        except (KeyError, TypeError):
+            return None
+
+    def get_tally(self):
+        """
+        returns the live vote count for each option, in index order
+
+        :return: a list of (option id, count) tuples
+        :rtype: list
+        """
+        self.sync_tally()
+        return list(zip(self.option_ids, self.tally))
+
+    def get_tally_text(self):
+        r_val = ""
+        for option_id, count in self.get_tally():
+            r_val += "\n" + option_id + ": " + str(count) + " votes"
+        return r_val
+
+    def check_can_vote(self, voter_id: str):
+        """
+        checks the poll is open and the voter hasn't voted yet
+
+        :raises VoteNotOpen: if the poll hasn't started
+        :raises VoteAlreadyClosed: if the poll has ended
+        :raises AlreadyVoted: if the voter already voted
+        """
+        if self.started is False:
+            raise VoteNotOpen
+
+        if self.ended is True:
+            raise VoteAlreadyClosed
+
+        if self.check_if_voted(voter_id):
+            raise AlreadyVoted
 
     def submit_vote(self, voter_id: str, voter_name: str, args: list):
         """
@@ -85,64 +213,192 @@ class Poll:
         :param option_id: the id for the option being voted for
         :type option_id: str
         """
-        if self.started is False:
-            raise VoteNotOpen
+        self.check_can_vote(voter_id)
+        try:
+            option_id = self.get_option_id_by_index(
+                int(args[0].strip("<>")) - 1)
+            self.add_vote(voter_id, voter_name, option_id)
+        except KeyError:
+            logging.error("KeyError in submit_vote")
+            pass
 
-        if self.ended is True:
-            raise VoteAlreadyClosed
+    def submit_choices(self, voter_id: str, voter_name: str, choices: list):
+        """
+        Adds a vote from the options picked on a ballot view
 
-        if self.check_if_voted(voter_id):
-            raise AlreadyVoted
+        :param voter_id: The id for the discord user voting
+        :type voter_id: str
+        :param voter_name: The name for the discord user voting
+        :type voter_name: str
+        :param choices: the option ids picked, in the order they were picked
+        :type choices: list
+        :raises InvalidBallot: if the choices aren't a valid ballot
+        """
+        self.check_can_vote(voter_id)
+        vote = self.choices_to_vote(choices)
+        if vote is None:
+            raise InvalidBallot
+        self.add_vote(voter_id, voter_name, vote)
 
-        else:
-            voter = FFRVoter(voter_id, voter_name)
-            try:
-                self.voters[str(voter_id)] = voter
-                option_id = self.get_option_id_by_index(
-                    int(args[0].strip("<>")) - 1)
-                voter.set_vote(option_id)
-                self.options[option_id]["voters"].append(voter)
-            except KeyError:
-                logging.error("KeyError in submit_vote")
-                pass
+    def add_vote(self, voter_id: str, voter_name: str, vote):
+        """
+        records a vote that has already been checked
+        """
+        self.sync_tally()
+        option = self.options[vote]
+        voter = FFRVoter(voter_id, voter_name)
+        voter.set_vote(vote)
+        self.voters[str(voter_id)] = voter
+        option["voters"].append(voter)
+        self.tally[option["index"]] += 1
+        self.ballot_version += 1
+        self.add_receipt(voter_id, vote)
+
+    def get_ballot_choices(self):
+        """
+        returns what a ballot can pick between, in index order
+
+        :return: a list of (option id, label, description) tuples, the
+            description may be None
+        :rtype: list
+        """
+        self.sync_tally()
+        return [(option_id, option_id, self.options[option_id]["description"])
+                for option_id in self.option_ids]
+
+    def get_max_choices(self):
+        """
+        :return: how many options a ballot can pick
+        :rtype: int
+        """
+        return 1
+
+    def is_ranked(self):
+        """
+        :return: whether the order a ballot picks options in matters
+        :rtype: bool
+        """
+        return False
+
+    def choices_to_vote(self, choices: list):
+        """
+        validates the options picked on a ballot and converts them to the
+        vote stored for the voter
+
+        :param choices: the option ids picked, in the order they were picked
+        :type choices: list
+        :return: the vote, or None if the choices aren't a valid ballot
+        """
+        if len(choices) != 1 or choices[0] not in self.options:
+            return None
+        return choices[0]
+
+    def confirm_choices_text(self, choices: list):
+        return "option: " + "".join(choices)
 
     def remove_voter(self, id):
         if self.check_if_voted(id):
-            del self.voters[id]
+            voter = self.voters.pop(id)
+            self.ballot_version += 1
+            self.remove_receipt(id)
+            index = self.get_vote_index(voter.vote)
+            if index is not None:
+                self.tally[index] -= 1
+                option = self.options[self.option_ids[index]]
+                if voter in option.get("voters", []):
+                    option["voters"].remove(voter)
             return True
         else:
             return False
 
+    def add_receipt(self, voter_id, vote):
+        """
+        adds the hash of a ballot to the receipt tree
+
+        :param voter_id: the discord id of the voter
+        :param vote: the vote as stored for the voter
+        """
+        nonce = secrets.token_hex(16)
+        leaf = merkle.leaf_hash(merkle.ballot_leaf(
+            self.poll_id, voter_id, self.encode_vote(vote), nonce))
+        self.receipt_leaves[str(voter_id)] = (self.receipts.append(leaf),
+                                              nonce)
+
+    def remove_receipt(self, voter_id):
+        """
+        records in the receipt tree that a voter's ballot was removed
+        """
+        entry = self.receipt_leaves.pop(str(voter_id), None)
+        if entry is not None:
+            self.receipts.append(merkle.leaf_hash(merkle.removal_leaf(
+                self.poll_id, voter_id, entry[0])))
+
+    def get_receipt(self, voter_id):
+        """
+        builds a voter's receipt, proving their ballot is in the tree with
+        the current root
+
+        :param voter_id: the discord id of the voter
+        :return: the receipt, or None if the voter has no ballot with one
+        :rtype: dict or None
+        """
+        entry = self.receipt_leaves.get(str(voter_id))
+        if entry is None or str(voter_id) not in self.voters:
+            return None
+        index, nonce = entry
+        return {"poll": self.poll_id,
+                "voter": str(voter_id),
+                "ballot": self.encode_vote(self.voters[str(voter_id)].vote),
+                "nonce": nonce,
+                "index": index,
+                "size": len(self.receipts),
+                "root": self.get_receipt_root(),
+                "proof": [x.hex()
+                          for x in self.receipts.inclusion_proof(index)]}
+
+    def get_receipt_root(self):
+        """
+        :return: the root hash of the receipt tree as hex
+        :rtype: str
+        """
+        return self.receipts.root().hex()
+
     def update_description(self, id: str, description: str):
         try:
             self.options[id]["description"] = description
         except KeyError:
             raise KeyError("That id doesn't exist")
 
+    def get_ranked_indexes(self):
+        """
+        returns the option indexes ordered by their vote count, most first
+
+        :return: option indexes, ties stay in the order they were added
+        :rtype: list
+        """
+        self.sync_tally()
+        return sorted(range(len(self.tally)),
+                      key=lambda index: self.tally[index],
+                      reverse=True)
+
     def get_winner(self):
-        sorted_options = [value for value in
-                          sorted(self.options.values(),
-                                 key=lambda val: len(val["voters"]),
-                                 reverse=True)]
-        if (len(sorted_options[0]["voters"]) !=
-                len(sorted_options[1]["voters"])):
-            return sorted_options[0]
+        ranked = self.get_ranked_indexes()
+        if self.tally[ranked[0]] != self.tally[ranked[1]]:
+            return self.options[self.option_ids[ranked[0]]]
         else:
             return False
 
-    def get_results(self):
+    def get_results(self, trace=None):
         winner = self.get_winner()
         if winner is False:
             r_val = "Its a Tie!\n"
         else:
-            r_val = "The winner is: " + self.get_winner()["id"] + "\n"
-        for value in sorted(self.options.values(),
-                            key=lambda val: len(val["voters"]),
-                            reverse=True):
-            r_val += "\n" + value["id"] + ": "\
-                     + str(
-                round(100 * len(value["voters"]) / len(self.voters)))\
-                + "%   " + str(len(value["voters"])) + " votes"
+            r_val = "The winner is: " + winner["id"] + "\n"
+        for index in self.get_ranked_indexes():
+            count = self.tally[index]
+            r_val += "\n" + self.option_ids[index] + ": "\
+                + str(round(100 * count / len(self.voters)))\
+                + "%   " + str(count) + " votes"
 
         r_val += "\n\nTotal votes: " + str(len(self.voters))
         return r_val
@@ -166,15 +422,9 @@ class Poll:
         :return: id of the option, or None if that index doesnt exist
         :rtype: string or None
         """
-        logging.debug(self.options.values())
-        logging.debug(len(self.options.values()))
-        try:
-            id = [k for k, v in self.options.items()
-                  if v["index"] == index][0]
-        except IndexError:
-            id = None
-
-        return id
+        if 0 <= index < len(self.option_ids):
+            return self.option_ids[index]
+        return None
 
     def check_valid_ballot(self, ballot_args: list):
         logging.debug(ballot_args[0])
@@ -193,16 +443,102 @@ class Poll:
     def confirm_vote_text(self, ballot_args: list):
         return "option number: " + str(ballot_args[0])
 
-    def get_csv(self):
+    def get_csv(self, compress=False):
+        """
+        exports every ballot
+
+        :param compress: whether to gzip the export
+        :type compress: bool
+        :return: the file name and an in memory file, or False if this poll
+            type has nothing to export
+        :rtype: tuple or bool
+        """
         return False
 
-    def get_voter_info(self):
+    def get_voter_info(self, compress=False):
         return False
 
     def get_voter_names(self):
         voters = [voter.name for voter in self.voters.values()]
         return voters
 
+    def to_state(self):
+        """
+        returns this poll as plain lists and dicts with each vote encoded
+        against the option indexes, compact enough to send to another
+        process
+
+        :return: the poll state
+        :rtype: dict
+        """
+        self.sync_tally()
+        options = []
+        for option_id in self.option_ids:
+            option = dict(self.options[option_id])
+            option.pop("voters", None)
+            options.append(option)
+        return {"type": self.type,
+                "poll_id": self.poll_id,
+                "channel_id": self.channel_id,
+                "started": self.started,
+                "ended": self.ended,
+                "options": options,
+                "voters": [(voter.id, voter.name, self.encode_vote(voter.vote))
+                           for voter in self.voters.values()],
+                "electorate": (None if self.electorate is None
+                               else sorted(self.electorate)),
+                "ballot_version": self.ballot_version,
+                "receipts": self.receipts.to_bytes(),
+                "receipt_leaves": self.receipt_leaves}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        rebuilds a poll from the state returned by to_state
+
+        :param state: the poll state
+        :type state: dict
+        :rtype: Poll
+        """
+        poll = cls(state["poll_id"], state["channel_id"])
+        poll.load_state(state)
+        return poll
+
+    def load_state(self, state):
+        self.started = state["started"]
+        self.ended = state["ended"]
+        for option in state["options"]:
+            self.restore_option(option)
+        self.sync_tally()
+        for voter_id, voter_name, vote in state["voters"]:
+            voter = FFRVoter(voter_id, voter_name)
+            voter.set_vote(self.decode_vote(vote))
+            self.voters[voter_id] = voter
+            self.restore_voter(voter)
+        self.rebuild_tally()
+        if state.get("electorate") is not None:
+            self.set_electorate(state["electorate"])
+        self.ballot_version = state.get("ballot_version", 0)
+        self.receipts = merkle.MerkleTree()
+        self.receipts.extend(state.get("receipts", b""))
+        self.receipt_leaves = dict(state.get("receipt_leaves", {}))
+
+    def restore_option(self, option):
+        self.options[option["id"]] = {"id": option["id"],
+                                      "description": option["description"],
+                                      "voters": [],
+                                      "index": option["index"]}
+
+    def restore_voter(self, voter):
+        if voter.vote in self.options:
+            self.options[voter.vote]["voters"].append(voter)
+
+    def encode_vote(self, vote):
+        return self.get_vote_index(vote)
+
+    def decode_vote(self, vote):
+        return None if vote is None else self.option_ids[vote]
+
 
 class AlreadyVoted(Exception):
     """
@@ -223,3 +559,10 @@ class VoteAlreadyClosed(Exception):
     raised when this vote is already closed
     """
     pass
+
+
+class InvalidBallot(Exception):
+    """
+    raised when a ballot doesn't pick a valid set of options
+    """
+    pass
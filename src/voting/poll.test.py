@@ -1,5 +1,7 @@
+import pickle
 import unittest
-from voting.poll import Poll
+from voting.poll import Poll, AlreadyVoted, InvalidBallot
+from voting import merkle
 
 
 class TestPoll(unittest.TestCase):
@@ -91,6 +93,133 @@ option #2: 50%   50 votes
 
 Total votes: 100""")
 
+    def test_tally(self):
+        poll = Poll("test", "fake id")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        poll.add_option(None, ["option #2", "This is the second option"])
+        poll.start_poll()
+        for i in range(10):
+            option = "1" if i % 3 != 0 else "2"
+            poll.submit_vote(str(i), str(i) + " name", [option])
+        self.assertEqual(poll.get_tally(), [("option #1", 6),
+                                            ("option #2", 4)])
+        self.assertTrue(poll.remove_voter("1"))
+        self.assertFalse(poll.check_if_voted("1"))
+        self.assertEqual(poll.get_tally(), [("option #1", 5),
+                                            ("option #2", 4)])
+        self.assertEqual(poll.get_tally_text(),
+                         "\noption #1: 5 votes\noption #2: 4 votes")
+
+    def test_tally_rebuilt_on_load(self):
+        poll = Poll("test", "fake id")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        poll.add_option(None, ["option #2", "This is the second option"])
+        poll.start_poll()
+        for i in range(5):
+            poll.submit_vote(str(i), str(i) + " name", ["2"])
+        state = dict(poll.__dict__)
+        del state["tally"]
+        del state["option_ids"]
+        loaded = Poll.__new__(Poll)
+        loaded.__setstate__(state)
+        self.assertEqual(loaded.get_tally(), [("option #1", 0),
+                                              ("option #2", 5)])
+        self.assertEqual(loaded.get_option_id_by_index(1), "option #2")
+        self.assertIsNone(loaded.get_option_id_by_index(2))
+
+    def test_state_round_trip(self):
+        poll = Poll("test", "fake id")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        poll.add_option(None, ["option #2", "This is the second option"])
+        poll.start_poll()
+        for i in range(10):
+            option = "1" if i % 3 != 0 else "2"
+            poll.submit_vote(str(i), str(i) + " name", [option])
+        state = poll.to_state()
+        self.assertEqual(state["voters"][0], ("0", "0 name", 1))
+        loaded = Poll.from_state(state)
+        self.assertEqual(loaded.get_results(), poll.get_results())
+        self.assertEqual(str(loaded), str(poll))
+        self.assertEqual(loaded.to_state(), state)
+
+    def test_submit_choices(self):
+        poll = Poll("test", "fake id")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        poll.add_option(None, ["option #2", "This is the second option"])
+        poll.start_poll()
+        self.assertEqual(poll.get_ballot_choices()[1],
+                         ("option #2", "option #2",
+                          "This is the second option"))
+        with self.assertRaises(InvalidBallot):
+            poll.submit_choices("1", "name", ["option #1", "option #2"])
+        with self.assertRaises(InvalidBallot):
+            poll.submit_choices("1", "name", ["option #3"])
+        poll.submit_choices("1", "name", ["option #2"])
+        with self.assertRaises(AlreadyVoted):
+            poll.submit_choices("1", "name", ["option #1"])
+        self.assertEqual(poll.get_tally(), [("option #1", 0),
+                                            ("option #2", 1)])
+        self.assertEqual(poll.options["option #2"]["voters"],
+                         [poll.voters["1"]])
+        self.assertEqual(poll.ballot_version, 1)
+        poll.remove_voter("1")
+        self.assertEqual(poll.ballot_version, 2)
+
+    def test_electorate(self):
+        poll = Poll("test", "fake id")
+        self.assertTrue(poll.is_eligible("123"))
+        self.assertEqual(poll.get_turnout_text(), "")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        poll.set_electorate([1, 2, 3, 4])
+        poll.start_poll()
+        poll.submit_vote("1", "name", ["1"])
+        self.assertTrue(poll.is_eligible("2"))
+        self.assertFalse(poll.is_eligible("5"))
+        self.assertEqual(poll.get_turnout_text(),
+                         "\nTurnout: 1 of 4 eligible voters (25%)")
+        loaded = Poll.from_state(poll.to_state())
+        self.assertEqual(loaded.electorate, frozenset([1, 2, 3, 4]))
+
+    def test_electorate_not_pickled(self):
+        poll = Poll("test", "fake id")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        empty = len(pickle.dumps(poll))
+        poll.set_electorate(range(10 ** 17, 10 ** 17 + 50000))
+        poll.start_poll()
+        self.assertLess(len(pickle.dumps(poll)), empty + 100)
+        loaded = pickle.loads(pickle.dumps(poll))
+        self.assertIsNone(loaded.electorate)
+        self.assertEqual(len(poll.electorate), 50000)
+
+    def test_receipts(self):
+        poll = Poll("test", "fake id")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        poll.add_option(None, ["option #2", "This is the second option"])
+        poll.start_poll()
+        for i in range(5):
+            poll.submit_vote(str(i), str(i) + " name", ["1"])
+        receipt = poll.get_receipt("3")
+        self.assertEqual(receipt["index"], 3)
+        self.assertEqual(receipt["ballot"], 0)
+        for i in range(5, 9):
+            poll.submit_vote(str(i), str(i) + " name", ["2"])
+        # the receipt still proves the ballot is in the tree at its size
+        self.assertTrue(merkle.verify_receipt(receipt))
+        self.assertFalse(merkle.verify_receipt(receipt,
+                                               poll.get_receipt_root()))
+        self.assertTrue(merkle.verify_receipt(poll.get_receipt("3"),
+                                              poll.get_receipt_root()))
+        forged = dict(poll.get_receipt("3"), ballot=1)
+        self.assertFalse(merkle.verify_receipt(forged))
+
+        poll.remove_voter("3")
+        self.assertIsNone(poll.get_receipt("3"))
+        self.assertEqual(len(poll.receipts), 10)
+        loaded = Poll.from_state(poll.to_state())
+        self.assertEqual(loaded.get_receipt_root(), poll.get_receipt_root())
+        self.assertTrue(merkle.verify_receipt(loaded.get_receipt("8"),
+                                              poll.get_receipt_root()))
+
 
 TestPoll().test_instantiation()
 if __name__ == "__main__":
@@ -1,15 +1,31 @@
 from discord.ext import commands
 from discord.utils import get
 from discord import File
+import asyncio
+import io
 import pickle
 import logging
+import random
+import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime, timezone
-from concurrent.futures import TimeoutError
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
 
 import constants
+import logs
+import replies
 import text
-from voting.poll import Poll
+from voting.approval_poll import ApprovalPoll
+from voting.poll import Poll, AlreadyVoted, VoteAlreadyClosed, InvalidBallot
+from voting.ballot_view import BallotView
+from voting import electorate
 from voting.stv_election import StvElection
+from voting.schulze_election import SchulzeElection
+from voting.counting import analyse_ties, count_poll, count_results, \
+    export_poll, load_poll, recount_poll
+from voting import tie_analysis
+from voting.stv_trace import trace_writers
 
 
 def is_admin(ctx):
@@ -24,10 +40,27 @@ def is_steven(ctx):
 
 
 class Polls(commands.Cog):
-    def __init__(self, bot, redis_db):
+    def __init__(self, bot, storage, confirmations, member_lookup):
         self.bot = bot
-        self.redis_db = redis_db
+        self.storage = storage
+        self.member_lookup = member_lookup
         self.polls = dict()
+        # recently used ended polls, oldest first
+        self.archived = OrderedDict()
+        self.executor = None
+        # pool to the counts running in it
+        self.counting = dict()
+        # channel id to the (ballot version, results) of the last
+        # provisional count, and to the pending background recount
+        self.provisional = dict()
+        self.recounts = dict()
+        self.confirmations = confirmations
+        confirmations.register("submitballot", self.confirm_submitballot,
+                               self.submitballot_timeout)
+        confirmations.register("endpoll", self.confirm_endpoll,
+                               self.channel_timeout)
+        confirmations.register("forceclosepoll", self.confirm_forceclosepoll,
+                               self.channel_timeout)
         try:
             self.load_all()
         except Exception as e:
@@ -35,36 +68,269 @@ class Polls(commands.Cog):
                           + " clear_db to wipe stored data")
             logging.exception(e)
 
+    async def cog_before_invoke(self, ctx):
+        if str(ctx.channel.id) in self.polls:
+            logs.bind(poll=str(ctx.channel.id))
+
     def load_all(self):
+        """
+        loads the open polls, ended polls stay in the archive until a
+        command asks for one
+        """
         logging.info("loading saved voting")
-        temp = dict(self.redis_db.hgetall('voting'))
-        for k, v in temp.items():
-            self.polls[k.decode("utf-8")] = pickle.loads(v)
-        for poll in self.polls.values():
+        ended = dict()
+        electorates = self.storage.get_all("electorates")
+        for k, v in self.storage.get_all('voting').items():
+            poll = pickle.loads(v)
             logging.debug(poll)
+            if k in electorates:
+                poll.set_electorate(pickle.loads(electorates[k]))
+            elif poll.electorate is not None:
+                # pickled with the poll before electorates had their own key
+                self.save_electorate(k, poll)
+            if poll.ended:
+                ended[k] = poll
+            else:
+                self.polls[k] = poll
+        # polls that ended before they were archived
+        for id, poll in ended.items():
+            self.archive_poll(id, poll)
+
+    def get_poll(self, id):
+        """
+        returns an open poll, or an ended one from the archive
+
+        :param id: the channel id of the poll
+        :type id: str
+        :raises KeyError: if there is no poll with that id
+        """
+        try:
+            return self.polls[id]
+        except KeyError:
+            pass
+        try:
+            self.archived.move_to_end(id)
+            return self.archived[id]
+        except KeyError:
+            pass
+        data = self.storage.get("voting_archive", id)
+        if data is None:
+            raise KeyError(id)
+        poll = load_poll(pickle.loads(zlib.decompress(data)))
+        self.cache_archived(id, poll)
+        return poll
+
+    def cache_archived(self, id, poll):
+        self.archived[id] = poll
+        self.archived.move_to_end(id)
+        while len(self.archived) > constants.archive_cache_size:
+            self.archived.popitem(last=False)
+
+    def archive_poll(self, id, poll):
+        """
+        moves an ended poll out of the open polls and into the archive, stored
+        as its compressed state rather than the pickled poll
+        """
+        logging.info("archiving poll %s", id)
+        data = zlib.compress(pickle.dumps(poll.to_state(),
+                                          protocol=pickle.HIGHEST_PROTOCOL))
+        with self.storage.transaction() as transaction:
+            transaction.put("voting_archive", id, data)
+            transaction.delete("voting", id)
+            transaction.delete("electorates", id)
+        self.polls.pop(id, None)
+        self.cache_archived(id, poll)
+
+    def unarchive_poll(self, id):
+        """
+        moves an archived poll back into the open polls
+
+        :raises KeyError: if there is no archived poll with that id
+        """
+        logging.info("unarchiving poll %s", id)
+        poll = self.get_poll(id)
+        self.archived.pop(id, None)
+        self.polls[id] = poll
+        with self.storage.transaction() as transaction:
+            transaction.put("voting", id, self.dump(poll))
+            if poll.electorate is not None:
+                transaction.put("electorates", id,
+                                self.dump(poll.electorate))
+            transaction.delete("voting_archive", id)
+        return poll
+
+    async def cog_unload(self):
+        for task in self.recounts.values():
+            task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=constants.count_workers,
+                initializer=logs.setup_worker,
+                initargs=(logging.getLogger().level, constants.log_json))
+        return self.executor
+
+    async def run_count(self, channel, func, *args):
+        """
+        runs a counting or export function in the process pool, editing a
+        status message in the channel while it runs so the bot stays
+        responsive
+
+        :param channel: the channel to post progress in, or None to run
+            without a status message
+        :param func: a picklable function to run in a worker process
+        :return: whatever func returns
+        :raises TimeoutError: if the count takes longer than
+            constants.count_timeout_seconds
+        """
+        status = None
+        if channel is not None:
+            status = await channel.send(text.counting_votes)
+        started = time.monotonic()
+        executor = self.get_executor()
+        future = asyncio.get_running_loop().run_in_executor(
+            executor, func, *args)
+        counting = self.counting.setdefault(executor, set())
+        counting.add(future)
+        future.add_done_callback(counting.discard)
+        while True:
+            done, _ = await asyncio.wait(
+                {future}, timeout=constants.count_progress_seconds)
+            elapsed = round(time.monotonic() - started)
+            if done:
+                if status is not None:
+                    await status.edit(content=text.counted(elapsed))
+                return future.result()
+            if elapsed >= constants.count_timeout_seconds:
+                logging.warning("count timed out after %s seconds", elapsed)
+                future.cancel()
+                self.retire_executor(executor)
+                raise TimeoutError
+            if status is not None:
+                await status.edit(content=text.still_counting(elapsed))
+
+    def retire_executor(self, executor):
+        """
+        replaces a pool with a worker stuck on a count that timed out, the
+        other counts in it finish before its workers are terminated
+        """
+        if self.executor is not executor:
+            # already retired by another count that timed out
+            return
+        self.executor = None
+        # the pool forgets its processes when it is shut down
+        processes = dict(executor._processes or {})
+        logging.warning("replacing the count pool, workers %s",
+                        sorted(processes))
+        executor.shutdown(wait=False)
+        asyncio.create_task(self.terminate_workers(executor, processes))
+
+    async def terminate_workers(self, executor, processes):
+        counting = self.counting.pop(executor, set())
+        pending = {future for future in counting if not future.done()}
+        if pending:
+            await asyncio.wait(pending)
+        # a worker can't be interrupted mid count any other way
+        for pid, process in processes.items():
+            if process.is_alive():
+                logging.warning("terminating count worker %s", pid)
+                process.terminate()
+
+    def ballots_changed(self, id):
+        """
+        schedules a background recount of a poll's provisional results, if
+        an admin has asked for them
+
+        ballots that arrive while a recount is waiting are picked up by it,
+        so a burst of votes costs one count
+        """
+        if id not in self.provisional or id in self.recounts:
+            return
+        self.recounts[id] = asyncio.create_task(self.provisional_recount(id))
+
+    async def provisional_recount(self, id):
+        try:
+            await asyncio.sleep(constants.provisional_debounce_seconds)
+            poll = self.polls.get(id)
+            if poll is None or poll.ended:
+                return
+            await self.count_provisional(id, poll)
+        except Exception as e:
+            logging.error("provisional recount of %s failed", id)
+            logging.exception(e)
+            return
+        finally:
+            self.recounts.pop(id, None)
+        # ballots that arrived during the count need another one
+        cached = self.provisional.get(id)
+        if cached is not None and cached[0] != poll.ballot_version:
+            self.ballots_changed(id)
+
+    async def count_provisional(self, id, poll, channel=None):
+        """
+        counts a poll's provisional results, unless they are already cached
+        for its current ballots
+
+        :return: the results text
+        :rtype: str
+        """
+        version = poll.ballot_version
+        cached = self.provisional.get(id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        results = await self.run_count(channel, count_results,
+                                       poll.to_state())
+        # a poll ended or deleted during the count was already dropped
+        if not poll.ended and self.polls.get(id) is poll:
+            self.provisional[id] = (version, results)
+        return results
+
+    def drop_provisional(self, id):
+        self.provisional.pop(id, None)
+        task = self.recounts.pop(id, None)
+        if task is not None:
+            task.cancel()
+
+    def dump(self, poll):
+        return pickle.dumps(poll, protocol=pickle.HIGHEST_PROTOCOL)
 
     def save_one(self, id):
-        logging.info("saving poll " + id)
-        poll = self.polls[id]
-        self.redis_db.hset("voting",
-                           id, pickle.dumps(poll,
-                                            protocol=pickle.HIGHEST_PROTOCOL))
-        logging.info("saved")
-        self.verify_save(id)
+        """
+        saves a poll, without its electorate, which is saved once with
+        save_electorate when the poll starts
+        """
+        self.storage.put("voting", id, self.dump(self.polls[id]))
+        logging.debug("saved poll %s", id)
+        # reading the poll back is only worth it when someone reads the log
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            self.verify_save(id)
+
+    def save_electorate(self, id, poll):
+        self.storage.put("electorates", id, self.dump(poll.electorate))
 
     def verify_save(self, id):
         original = self.polls[id]
-        saved = pickle.loads(self.redis_db.hget("voting", id))
-        logging.debug("original: " + str(original))
-        logging.debug("saved: " + str(saved))
-        logging.debug(saved == original)
+        saved = pickle.loads(self.storage.get("voting", id))
+        logging.debug("original: %s", original)
+        logging.debug("saved: %s", saved)
+        logging.debug("saved == original: %s", saved == original)
 
     @commands.command()
     @commands.check(is_steven)
     async def clear_db(self, ctx):
-        self.redis_db.flushall()
-        logging.info("cleared redis db")
+        # only the voting namespaces, and the confirmations that would
+        # refer to the deleted polls
+        self.storage.clear("voting")
+        self.storage.clear("voting_archive")
+        self.storage.clear("electorates")
+        self.confirmations.resolve_kinds(
+            {"submitballot", "endpoll", "forceclosepoll"})
+        logging.info("cleared saved polls")
         self.polls = dict()
+        self.archived = OrderedDict()
 
     @commands.command(aliases=["cp"])
     @commands.check(is_admin)
@@ -85,6 +351,10 @@ class Polls(commands.Cog):
             poll = Poll(name, str(pollchannel.id))
         elif poll_type == "election":
             poll = StvElection(name, str(pollchannel.id), constants.seat_count)
+        elif poll_type == "schulze":
+            poll = SchulzeElection(name, str(pollchannel.id))
+        elif poll_type == "approval":
+            poll = ApprovalPoll(name, str(pollchannel.id))
         else:
             await ctx.author.send(text.invalid_poll_type)
             return
@@ -116,12 +386,17 @@ class Polls(commands.Cog):
             await ctx.message.delete()
             return
 
+        guild_members = await self.member_lookup.all_members(ctx.guild)
+        poll.set_electorate(electorate.snapshot(guild_members,
+                                                datetime.now(timezone.utc)))
         poll.start_poll()
         output = "this poll is now open!\nThe following options are avalible"\
                  + ", use `?vote` in this channel to vote, you will recieve "\
                    "a PM "\
-                 + "from FFRBot" + "\n\nOptions:\n\n" + poll.list_options()
+                 + "from FFRBot" + "\n\nOptions:\n\n" + poll.list_options()\
+                 + "\n" + text.eligible_voters(len(poll.electorate))
         await ctx.channel.send(output)
+        self.save_electorate(str(ctx.channel.id), poll)
         self.save_one(str(ctx.channel.id))
 
     @commands.command(aliases=["ao"])
@@ -153,46 +428,84 @@ class Polls(commands.Cog):
         self.save_one(str(ctx.channel.id))
         await ctx.message.add_reaction('✔')
 
-    @commands.command(aliases=["v"])
+    @commands.hybrid_command(aliases=["v"])
     async def vote(self, ctx):
-        # TODO combine vote and submitvote using self.bot.wait_for
         try:
             poll = self.polls[str(ctx.channel.id)]
         except KeyError:
-            await ctx.author.send(text.no_poll_in_channel)
-            await ctx.message.delete()
+            await replies.reply(ctx, text.no_poll_in_channel)
             return
 
-        account_age = (datetime.now(timezone.utc) -
-                       ctx.author.created_at.replace(tzinfo=timezone.utc)).days
-
-        server_join_date = ctx.author.joined_at.replace(tzinfo=timezone.utc)
-        bad_hardcoded_date = datetime.fromisoformat(
-            "2024-03-15 03:59:59.000000+00:00")
-
-        server_join_ok = server_join_date < bad_hardcoded_date
+        reason = self.check_eligible(poll, ctx.author)
 
         if poll.check_if_voted(str(ctx.author.id)):
-            await ctx.author.send(text.already_voted)
+            await replies.reply(ctx, text.already_voted)
 
-        elif account_age < constants.voting_age_days:
-            await ctx.author.send(text.account_age(account_age,
-                                                   constants.voting_age_days))
-
-        elif not server_join_ok:
-            await ctx.author.send(text.not_in_server_long_enough)
+        elif reason is not None:
+            await replies.reply(ctx, reason)
 
         elif poll.started is False:
-            await ctx.channel.send(text.poll_not_started)
+            await replies.announce(ctx, text.poll_not_started)
+            await replies.finish(ctx)
 
         elif poll.ended is True:
-            await ctx.channel.send(text.poll_already_ended)
+            await replies.announce(ctx, text.poll_already_ended)
+            await replies.finish(ctx)
+
+        elif BallotView.fits(poll) and ctx.interaction is not None:
+            # the ballot is the ephemeral response, no dm needed
+            view = BallotView(self, str(ctx.channel.id), poll)
+            view.interaction = ctx.interaction
+            await replies.reply(ctx, view.render(poll), view=view)
+
+        elif BallotView.fits(poll):
+            view = BallotView(self, str(ctx.channel.id), poll)
+            view.message = await ctx.author.send(view.render(poll),
+                                                 view=view)
+            await ctx.message.delete()
 
         else:
+            # too many options for the select menus, fall back to the
+            # ?submitballot template
             await ctx.author.send(poll.get_vote_text())
             await ctx.author.send(poll.get_submitballot_template())
-
-        await ctx.message.delete()
+            await replies.finish(ctx)
+
+    def check_eligible(self, poll, user):
+        """
+        checks whether a user can vote in a poll
+
+        :return: the reason the user can't vote, or None if they can
+        :rtype: str or None
+        """
+        if poll.electorate is not None:
+            return None if poll.is_eligible(user.id) else text.not_eligible
+
+        # polls started before electorates were snapshotted
+        account_age = electorate.account_age_days(user,
+                                                  datetime.now(timezone.utc))
+        if account_age < constants.voting_age_days:
+            return text.account_age(account_age, constants.voting_age_days)
+        # users who can't be found in the server have no join date
+        if (getattr(user, "joined_at", None) is not None
+                and not electorate.joined_before_cutoff(user)):
+            return text.not_in_server_long_enough
+        return None
+
+    async def get_voter(self, channel_id, poll, user):
+        """
+        finds a user who voted in a dm as a member of the poll's server, so
+        polls without an electorate can check their join date
+
+        :return: the member, or the user if they can't be found
+        """
+        if poll.electorate is not None:
+            return user
+        channel = self.bot.get_channel(int(channel_id))
+        if channel is None or getattr(channel, "guild", None) is None:
+            return user
+        member = await self.member_lookup.get_member(channel.guild, user.id)
+        return user if member is None else member
 
     @commands.command()
     @commands.dm_only()
@@ -203,15 +516,15 @@ class Polls(commands.Cog):
             await ctx.author.send(text.cant_find_poll)
             return
 
-        account_age = (datetime.now(timezone.utc) -
-                       ctx.author.created_at.replace(tzinfo=timezone.utc)).days
+        reason = self.check_eligible(poll, await self.get_voter(channel_id,
+                                                                poll,
+                                                                ctx.author))
 
         if poll.check_if_voted(str(ctx.author.id)):
             await ctx.author.send(text.already_voted)
 
-        elif account_age < constants.voting_age_days:
-            await ctx.author.send(text.account_age(account_age,
-                                                   constants.voting_age_days))
+        elif reason is not None:
+            await ctx.author.send(reason)
 
         elif poll.started is False:
             await ctx.channel.send(text.poll_not_started)
@@ -226,30 +539,58 @@ class Polls(commands.Cog):
             await ctx.author.send(text.confirm_vote
                                   + "\n"
                                   + poll.confirm_vote_text(args))
+            await self.confirmations.ask(ctx.author.id, ctx.channel.id,
+                                         "submitballot",
+                                         {"channel_id": channel_id,
+                                          "args": list(args)})
+
+    async def confirm_submitballot(self, reply, confirmed, data):
+        if not confirmed:
+            await reply.author.send(text.vote_not_processed)
+            return
+        try:
+            poll = self.polls[data["channel_id"]]
+        except KeyError:
+            await reply.author.send(text.cant_find_poll)
+            return
+        try:
+            poll.submit_vote(str(reply.author.id), reply.author.name,
+                             data["args"])
+        except AlreadyVoted:
+            await reply.author.send(text.already_voted)
+            return
+        except VoteAlreadyClosed:
+            await reply.author.send(text.poll_already_ended)
+            return
+        except InvalidBallot:
+            await reply.author.send(text.vote_not_processed)
+            return
+        self.save_one(data["channel_id"])
+        self.ballots_changed(data["channel_id"])
+        await reply.author.send(text.vote_processed)
+        await self.send_receipt(reply.author, data["channel_id"], poll)
+
+    async def send_receipt(self, user, channel_id, poll):
+        receipt = poll.get_receipt(str(user.id))
+        if receipt is None:
+            await user.send(text.no_receipt)
+            return
+        await user.send(text.ballot_receipt(channel_id, receipt))
 
-            def check(m):
-                return m.author == ctx.author\
-                    and m.channel == ctx.channel
-
-            reply = None
-            while (reply is None
-                   or not (reply.content.lower() == "yes"
-                           or reply.content.lower() == "no")):
-                try:
-                    reply = await self.bot.wait_for('message',
-                                                    timeout=120,
-                                                    check=check)
-                except TimeoutError:
-                    await ctx.author.send(text.timeout)
-                    return
-            if reply.content.lower() == "yes":
-                print("\n\n" + str(args) + "\n\n")
-                poll.submit_vote(str(ctx.author.id), ctx.author.name, args)
-                self.save_one(channel_id)
-                await ctx.author.send(text.vote_processed)
-            else:
-                await ctx.author.send(text.vote_not_processed)
-                return
+    @commands.command()
+    @commands.dm_only()
+    async def receipt(self, ctx, channel_id):
+        try:
+            poll = self.get_poll(channel_id)
+        except KeyError:
+            await ctx.author.send(text.cant_find_poll)
+            return
+        await self.send_receipt(ctx.author, channel_id, poll)
+
+    async def submitballot_timeout(self, user_id, channel_id, data):
+        user = self.bot.get_user(user_id) or await self.bot.fetch_user(
+            user_id)
+        await user.send(text.timeout)
 
     @commands.command(aliases=["ep"])
     @commands.check(is_admin)
@@ -271,49 +612,70 @@ class Polls(commands.Cog):
             return
 
         await ctx.channel.send(text.confirm_end_poll)
+        await self.confirmations.ask(ctx.author.id, ctx.channel.id,
+                                     "endpoll")
 
-        def check(m):
-            return m.author == ctx.author\
-                and m.channel == ctx.channel
+    async def confirm_endpoll(self, reply, confirmed, data):
+        if not confirmed:
+            await reply.channel.send(text.poll_still_open)
+            return
+        try:
+            poll = self.polls[str(reply.channel.id)]
+        except KeyError:
+            await reply.channel.send(text.no_poll_in_channel)
+            return
+        if poll.ended:
+            await reply.channel.send(text.poll_already_ended)
+            return
 
-        reply = None
-        while (reply is None
-               or not (reply.content.lower() == "yes"
-                       or reply.content.lower() == "no")):
-            try:
-                reply = await self.bot.wait_for('message',
-                                                timeout=120,
-                                                check=check)
-            except TimeoutError:
-                await ctx.channel.send(text.timeout)
-                return
-        if reply.content.lower() == "yes":
-            output = poll.get_results()
-            await ctx.channel.send(text.poll_now_closed)
-            csv_file_name = poll.get_csv()
-            if csv_file_name:
-                with open(csv_file_name, mode="rb") as csv_file:
-                    f = File(csv_file)
-                    await ctx.channel.send(output, file=f)
-            else:
-                await ctx.channel.send(output)
-            poll.end_poll()
-            self.save_one(str(ctx.channel.id))
-        else:
-            await ctx.channel.send(text.poll_still_open)
+        # close the poll before counting so no ballot arrives mid count
+        poll.end_poll()
+        self.drop_provisional(str(reply.channel.id))
+        self.save_one(str(reply.channel.id))
+        await reply.channel.send(text.poll_now_closed)
+        try:
+            count = await self.run_count(reply.channel, count_poll,
+                                         poll.to_state(),
+                                         constants.stv_trace_format,
+                                         True,
+                                         constants.compress_exports)
+        except Exception as e:
+            logging.exception(e)
+            poll.undo_end_poll()
+            self.save_one(str(reply.channel.id))
+            await reply.channel.send(text.count_failed)
             return
+        files = []
+        for export in (count["csv"], count["trace"]):
+            if export is not None:
+                files.append(File(io.BytesIO(export[1]),
+                                  filename=export[0]))
+        await reply.channel.send(count["results"] + poll.get_turnout_text()
+                                 + text.receipt_root(poll.get_receipt_root(),
+                                                     len(poll.receipts)),
+                                 files=files)
+        self.archive_poll(str(reply.channel.id), poll)
+
+    async def channel_timeout(self, user_id, channel_id, data):
+        channel = self.bot.get_channel(channel_id)
+        if channel is not None:
+            await channel.send(text.timeout)
 
     @commands.command()
     @commands.check(is_admin)
     async def undoendpoll(self, ctx):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
             return
         if poll.ended:
             poll.undo_end_poll()
+            if str(ctx.channel.id) in self.polls:
+                self.save_one(str(ctx.channel.id))
+            else:
+                self.unarchive_poll(str(ctx.channel.id))
             await ctx.message.delete()
         else:
             return
@@ -321,69 +683,204 @@ class Polls(commands.Cog):
     @commands.command()
     @commands.check(is_admin)
     async def forceclosepoll(self, ctx):
-        try:
-            poll = self.polls[str(ctx.channel.id)]
-        except KeyError:
+        if str(ctx.channel.id) not in self.polls:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
             return
 
         await ctx.channel.send("reply `yes` to forcibly end this poll, "
                                + "or reply `no` to stop")
+        await self.confirmations.ask(ctx.author.id, ctx.channel.id,
+                                     "forceclosepoll",
+                                     {"message_id": ctx.message.id})
 
-        def check(m):
-            return m.author == ctx.author\
-                and m.channel == ctx.channel
+    async def confirm_forceclosepoll(self, reply, confirmed, data):
+        if not confirmed:
+            return
+        try:
+            poll = self.polls[str(reply.channel.id)]
+        except KeyError:
+            await reply.channel.send(text.no_poll_in_channel)
+            return
+        await reply.channel.send("logging who deleted this poll with "
+                                 + "a role create and delete")
+        reason = poll.poll_id + " force deleted by: " +\
+            reply.author.name + "\ndisplay name: " +\
+            reply.author.display_name
+        role = await reply.guild.create_role(name="deleted-poll",
+                                             reason=reason)
+        await role.delete(reason=reason)
+        poll.end_poll()
+        self.drop_provisional(str(reply.channel.id))
+        self.archive_poll(str(reply.channel.id), poll)
+        await reply.channel.get_partial_message(
+            data["message_id"]).add_reaction('✔')
 
-        reply = None
-        while (reply is None
-               or not (reply.content.lower() == "yes"
-                       or reply.content.lower() == "no")):
-            try:
-                reply = await self.bot.wait_for('message',
-                                                timeout=120,
-                                                check=check)
-            except TimeoutError:
-                await ctx.channel.send(text.timeout)
-                return
-        if reply.content.lower() == "yes":
-            await ctx.channel.send("logging who deleted this poll with "
-                                   + "a role create and delete")
-            reason = poll.poll_id + " force deleted by: " +\
-                ctx.author.name + "\ndisplay name: " +\
-                ctx.author.display_name
-            role = await ctx.guild.create_role(name="deleted-poll",
-                                               reason=reason)
-            await role.delete(reason=reason)
-            poll.end_poll()
-            self.save_one(poll.get_channel())
-            await ctx.message.add_reaction('✔')
+    @commands.command()
+    @commands.check(is_admin)
+    async def getcsv(self, ctx, compress=None):
+        try:
+            poll = self.get_poll(str(ctx.channel.id))
+        except KeyError:
+            await ctx.author.send(text.no_poll_in_channel)
+            await ctx.message.delete()
+            return
+        exported = await self.run_count(None, export_poll, poll.to_state(),
+                                        "votes", compress == "gz")
+        if exported is None:
+            await ctx.author.send(text.nothing_to_export)
+            await ctx.message.delete()
+            return
+        file_name, data = exported
+        await ctx.channel.send("votes", file=File(io.BytesIO(data),
+                                                  filename=file_name))
 
     @commands.command()
     @commands.check(is_admin)
-    async def getcsv(self, ctx):
+    async def gettrace(self, ctx, trace_format=None):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
             return
-        file_name = poll.get_csv()
-        with open(file_name, mode="rb") as csv_file:
-            f = File(csv_file)
-            await ctx.channel.send("votes", file=f)
+        if trace_format is None:
+            trace_format = constants.stv_trace_format
+        if trace_format not in trace_writers:
+            await ctx.author.send(text.invalid_trace_format)
+            await ctx.message.delete()
+            return
+        count = await self.run_count(ctx.channel, count_poll,
+                                     poll.to_state(), trace_format, False)
+        if count["trace"] is None:
+            await ctx.author.send(text.no_count_trace)
+            await ctx.message.delete()
+            return
+        trace_name, trace_data = count["trace"]
+        await ctx.channel.send("count trace",
+                               file=File(io.BytesIO(trace_data),
+                                         filename=trace_name))
 
     @commands.command()
-    async def getcount(self, ctx):
+    @commands.check(is_admin)
+    async def recount(self, ctx, change=None, value=None):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
             return
-        await ctx.author.send("number of ballots cast: "
-                              + str(poll.get_count()))
-        await ctx.message.delete()
+        if poll.type != "election":
+            await ctx.author.send(text.recount_not_supported)
+            await ctx.message.delete()
+            return
+
+        excluded = []
+        seat_count = None
+        if change == "exclude" and len(ctx.message.mentions) != 0:
+            excluded = [str(user.id) for user in ctx.message.mentions]
+            if any(id not in poll.options for id in excluded):
+                await ctx.author.send(text.invalid_vote_option)
+                await ctx.message.delete()
+                return
+        elif change == "seats" and value is not None and value.isdigit() \
+                and 0 < int(value) < len(poll.options):
+            seat_count = int(value)
+        else:
+            await ctx.author.send(text.recount_usage)
+            await ctx.message.delete()
+            return
+
+        try:
+            results = await self.run_count(ctx.channel, recount_poll,
+                                           poll.to_state(), excluded,
+                                           seat_count)
+        except Exception as e:
+            logging.exception(e)
+            await ctx.channel.send(text.count_failed_recount)
+            return
+        await ctx.channel.send(text.recount_results(
+            [poll.options[id]["display_name"] for id in excluded],
+            seat_count) + results)
+
+    @commands.command()
+    @commands.check(is_admin)
+    async def tieanalysis(self, ctx, seconds=None, mode=None):
+        try:
+            poll = self.get_poll(str(ctx.channel.id))
+        except KeyError:
+            await ctx.author.send(text.no_poll_in_channel)
+            await ctx.message.delete()
+            return
+        if poll.type != "election":
+            await ctx.author.send(text.tie_analysis_not_supported)
+            await ctx.message.delete()
+            return
+        if seconds is None:
+            seconds = str(constants.tie_analysis_seconds)
+        if (not seconds.isdigit()
+                or not 0 < int(seconds) <= constants.tie_analysis_max_seconds
+                or mode not in (None, "tiebreak")):
+            await ctx.author.send(text.tie_analysis_usage)
+            await ctx.message.delete()
+            return
+        seconds = int(seconds)
+        bootstrap = mode is None
+
+        # every worker gets its own seed and runs trials for the whole
+        # budget, so the analysis takes the same time however many there are
+        status = await ctx.channel.send(text.analysing_ties(seconds))
+        state = poll.to_state()
+        seed = random.getrandbits(32)
+        try:
+            results = await asyncio.gather(*(
+                self.run_count(None, analyse_ties, state, seconds,
+                               seed + worker, bootstrap)
+                for worker in range(constants.count_workers)))
+        except Exception as e:
+            logging.exception(e)
+            await status.edit(content=text.tie_analysis_failed)
+            return
+        await status.edit(content=text.tie_analysis_results(bootstrap)
+                          + poll.tie_analysis_text(
+                              tie_analysis.combine(results)))
+
+    @commands.hybrid_command()
+    @commands.check(is_admin)
+    async def provisional(self, ctx):
+        try:
+            poll = self.polls[str(ctx.channel.id)]
+        except KeyError:
+            await replies.reply(ctx, text.no_poll_in_channel)
+            return
+        if not poll.started:
+            await replies.reply(ctx, text.poll_not_started)
+            return
+        if poll.ended:
+            await replies.reply(ctx, text.poll_already_ended)
+            return
+        await replies.defer(ctx)
+        try:
+            results = await self.count_provisional(str(ctx.channel.id), poll)
+        except Exception as e:
+            logging.exception(e)
+            await replies.reply(ctx, text.count_failed_provisional)
+            return
+        await replies.reply(ctx, text.provisional_results(poll.get_count())
+                            + results)
+
+    @commands.hybrid_command()
+    async def getcount(self, ctx):
+        try:
+            poll = self.get_poll(str(ctx.channel.id))
+        except KeyError:
+            await replies.reply(ctx, text.no_poll_in_channel)
+            return
+        output = "number of ballots cast: " + str(poll.get_count())\
+            + poll.get_turnout_text()
+        if is_admin(ctx):
+            output += "\n" + poll.get_tally_text()
+        await replies.reply(ctx, output)
 
     @commands.command()
     @commands.check(is_steven)
@@ -402,6 +899,8 @@ class Polls(commands.Cog):
                     await ctx.author.send(
                         "the user id: " + user_id + " was not found in the "
                                                     "voter list")
+                else:
+                    self.ballots_changed(str(ctx.channel.id))
             except Exception:
                 await ctx.author.send(
                     "the user id: " + user_id + " caused an exception")
@@ -409,22 +908,25 @@ class Polls(commands.Cog):
 
     @commands.command()
     @commands.check(is_steven)
-    async def check(self, ctx, pollid=None):
+    async def check(self, ctx, pollid=None, compress=None):
         try:
             if (pollid):
-                poll = self.polls[str(pollid)]
+                poll = self.get_poll(str(pollid))
             else:
-                poll = self.polls[str(ctx.channel.id)]
+                poll = self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
             return
 
         try:
-            file_name = poll.get_voter_info()
-            with open(file_name, mode="rb") as csv_file:
-                f = File(csv_file)
-                await ctx.author.send("voter_info", file=f)
+            file_name, data = await self.run_count(None, export_poll,
+                                                   poll.to_state(),
+                                                   "voter_info",
+                                                   compress == "gz")
+            await ctx.author.send("voter_info",
+                                  file=File(io.BytesIO(data),
+                                            filename=file_name))
             await ctx.message.delete()
         except Exception:
             await ctx.message.delete()
@@ -434,9 +936,9 @@ class Polls(commands.Cog):
     async def check2(self, ctx, pollid=None):
         try:
             if (pollid):
-                poll = self.polls[str(pollid)]
+                poll = self.get_poll(str(pollid))
             else:
-                poll = self.polls[str(ctx.channel.id)]
+                poll = self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
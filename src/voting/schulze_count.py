@@ -0,0 +1,117 @@
+from collections import Counter
+
+
+def pairwise_matrix(candidate_count, ballots):
+    """
+    counts, for every pair of candidates, how many ballots rank the first
+    above the second, a candidate left off a ballot is ranked below every
+    candidate on it
+
+    Each row of the matrix is built as one packed integer with a fixed width
+    field per candidate, so a ballot adds to a whole row with a single
+    integer addition instead of one addition per opponent. Identical ballots
+    are only added once, multiplied by how many there are.
+
+    :param candidate_count: the number of candidates
+    :type candidate_count: int
+    :param ballots: the integer encoded ballots, candidate indexes in
+        preference order
+    :type ballots: list
+    :return: d where d[a][b] is the number of ballots ranking a above b
+    :rtype: list
+    """
+    groups = Counter(tuple(ballot) for ballot in ballots)
+    # wide enough that no field can carry into the next
+    width = max(1, len(ballots).bit_length())
+    field = (1 << width) - 1
+    unit = [1 << (width * candidate) for candidate in range(candidate_count)]
+    everyone = sum(unit)
+
+    rows = [0] * candidate_count
+    for ballot, count in groups.items():
+        below = everyone
+        # a ballot can repeat a candidate, only the first ranking counts
+        for candidate in dict.fromkeys(ballot):
+            below -= unit[candidate]
+            rows[candidate] += below * count
+
+    return [[(row >> (width * other)) & field
+             for other in range(candidate_count)]
+            for row in rows]
+
+
+class SchulzeCount:
+    """
+    Counts a single winner Schulze election over integer encoded ballots
+    https://en.wikipedia.org/wiki/Schulze_method
+
+    :param candidates: the candidate ids, ballots refer to a candidate by its
+        index in this list
+    :type candidates: list
+    :param ballots: the encoded ballots
+    :type ballots: list
+    """
+
+    def __init__(self, candidates, ballots):
+        self.candidates = list(candidates)
+        self.ballots = ballots
+
+    def run(self):
+        """
+        :return: the winning and tied candidate ids, the candidate ids ordered
+            by how many others they beat, and the pairwise matrix
+        :rtype: dict
+        """
+        candidate_count = len(self.candidates)
+        d = pairwise_matrix(candidate_count, self.ballots)
+        p = strongest_paths(d)
+
+        wins = [sum(1 for other in range(candidate_count)
+                    if p[candidate][other] > p[other][candidate])
+                for candidate in range(candidate_count)]
+        winners = [candidate for candidate in range(candidate_count)
+                   if all(p[candidate][other] >= p[other][candidate]
+                          for other in range(candidate_count))]
+        ranking = sorted(range(candidate_count),
+                         key=lambda candidate: wins[candidate], reverse=True)
+
+        r_val = {"winners": set(), "tied": set(),
+                 "ranking": [self.candidates[x] for x in ranking],
+                 "pairwise": d}
+        if len(winners) == 1:
+            r_val["winners"].add(self.candidates[winners[0]])
+        else:
+            r_val["tied"] = set(self.candidates[x] for x in winners)
+        return r_val
+
+
+def strongest_paths(d):
+    """
+    finds the strength of the strongest path between every pair of
+    candidates with the Floyd-Warshall algorithm
+
+    :param d: the pairwise matrix
+    :type d: list
+    :return: p where p[a][b] is the strength of the strongest path from a to b
+    :rtype: list
+    """
+    candidate_count = len(d)
+    p = [[d[a][b] if d[a][b] > d[b][a] else 0
+          for b in range(candidate_count)]
+         for a in range(candidate_count)]
+    for i in range(candidate_count):
+        p_i = p[i]
+        for j in range(candidate_count):
+            if j == i:
+                continue
+            p_j = p[j]
+            p_ji = p_j[i]
+            if p_ji == 0:
+                continue
+            for k in range(candidate_count):
+                if k == i or k == j:
+                    continue
+                strength = p_ji if p_ji < p_i[k] else p_i[k]
+                if strength > p_j[k]:
+                    p_j[k] = strength
+    return p
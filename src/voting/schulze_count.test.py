@@ -0,0 +1,56 @@
+import random
+import unittest
+from voting.schulze_count import SchulzeCount, pairwise_matrix
+
+
+def wikipedia_ballots():
+    # https://en.wikipedia.org/wiki/Schulze_method#Example
+    a, b, c, d, e = range(5)
+    groups = [(5, (a, c, b, e, d)), (5, (a, d, e, c, b)),
+              (8, (b, e, d, a, c)), (3, (c, a, b, e, d)),
+              (7, (c, a, e, b, d)), (2, (c, b, a, d, e)),
+              (7, (d, c, e, b, a)), (8, (e, b, a, d, c))]
+    return [ballot for count, ballot in groups for _ in range(count)]
+
+
+class TestSchulzeCount(unittest.TestCase):
+
+    def test_pairwise_matrix(self):
+        d = pairwise_matrix(5, wikipedia_ballots())
+        self.assertEqual(d, [[0, 20, 26, 30, 22],
+                             [25, 0, 16, 33, 18],
+                             [19, 29, 0, 17, 24],
+                             [15, 12, 28, 0, 14],
+                             [23, 27, 21, 31, 0]])
+
+    def test_unranked_candidates(self):
+        # candidates left off a ballot lose to every ranked candidate and
+        # tie with each other
+        d = pairwise_matrix(3, [(2,), (1, 0)])
+        self.assertEqual(d, [[0, 0, 1], [1, 0, 1], [1, 1, 0]])
+
+    def test_wikipedia_example(self):
+        results = SchulzeCount(list("abcde"), wikipedia_ballots()).run()
+        self.assertEqual(results["winners"], {"e"})
+        self.assertEqual(results["ranking"], list("eacbd"))
+
+    def test_tie(self):
+        results = SchulzeCount(["x", "y"], [(0, 1), (1, 0)]).run()
+        self.assertEqual(results["winners"], set())
+        self.assertEqual(results["tied"], {"x", "y"})
+
+    def test_matches_naive_count(self):
+        rng = random.Random(7)
+        ballots = [tuple(rng.sample(range(6), rng.randint(1, 6)))
+                   for _ in range(300)]
+        naive = [[0] * 6 for _ in range(6)]
+        for ballot in ballots:
+            unranked = [x for x in range(6) if x not in ballot]
+            for position, a in enumerate(ballot):
+                for b in list(ballot[position + 1:]) + unranked:
+                    naive[a][b] += 1
+        self.assertEqual(pairwise_matrix(6, ballots), naive)
+
+
+if __name__ == "__main__":
+    unittest.main()
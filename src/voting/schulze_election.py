@@ -0,0 +1,52 @@
+from voting.stv_election import StvElection
+from voting.schulze_count import SchulzeCount
+import logging
+
+
+class SchulzeElection(StvElection):
+    """
+    A single winner ranked election counted with the Schulze method, the
+    winner is the candidate who beats every other candidate head to head,
+    directly or through a chain of candidates
+    https://en.wikipedia.org/wiki/Schulze_method
+
+    Ballots are cast the same way as in an STV election.
+    """
+
+    def __init__(self, poll_id, channel_id, seat_count=1):
+        logging.debug("creating Schulze election")
+        super().__init__(poll_id, channel_id, 1)
+        self.type = "schulze"
+
+    def get_winners(self, trace=None):
+        """
+        counts the election
+
+        :param trace: unused, a Schulze count has no rounds to trace
+        :return: the winning and tied candidate ids, and the candidate ids in
+            finishing order
+        :rtype: dict
+        """
+        count = SchulzeCount(self.get_candidates(), self.encode_ballots())
+        results = count.run()
+        logging.info("Winners: %s", results["winners"])
+        logging.info("Tied: %s", results["tied"])
+        return results
+
+    def get_results(self, trace=None):
+        results = self.get_winners(trace)
+        if len(results["winners"]) != 0:
+            r_val = ("The winner is: "
+                     + self.options[next(iter(results["winners"]))]["mention"])
+        else:
+            r_val = "The following people tied:"
+            for tie in results["tied"]:
+                r_val += "\n" + self.options[tie]["mention"]
+
+        r_val += "\n\nFinishing order:"
+        for place, option_id in enumerate(results["ranking"]):
+            r_val += ("\n" + str(place + 1) + ". "
+                      + self.options[option_id]["display_name"])
+
+        r_val += "\n\nTotal votes: " + str(len(self.voters))
+        return r_val
@@ -0,0 +1,417 @@
+from collections import Counter
+from fractions import Fraction
+import copy
+import logging
+
+
+class StvCount:
+    """
+    Counts a single transferable vote election over integer encoded ballots
+
+    A ballot is a sequence of candidate indexes in preference order.
+    Identical ballots always move together, so they are grouped into one
+    entry with a count when the count starts and every transfer moves a
+    group at once. Every group keeps a pointer to the preference it
+    currently counts for and an exact fractional weight, so a transfer only
+    ever looks at preferences the group has not used yet and a full count
+    costs O(total preferences of the distinct ballots x rounds).
+
+    With checkpoints on, the count also keeps each round's totals and
+    decision along with an undo log of the pointers and weights its
+    transfers changed, which lets recount resume a what-if count part way
+    through instead of starting again.
+
+    Given a random number generator, a tie for last place is broken by
+    eliminating one of the tied candidates at random instead of eliminating
+    them all, so the count never ends in a tie. Tie analysis uses this to
+    see how often each candidate wins.
+
+    :param candidates: the candidate ids, ballots refer to a candidate by its
+        index in this list
+    :type candidates: list
+    :param ballots: the encoded ballots
+    :type ballots: list
+    :param seat_count: the number of seats to fill
+    :type seat_count: int
+    :param quota: the number of votes needed to be elected
+    :type quota: int
+    :param trace: a list to append a record of each round to, or None to
+        skip building the trace
+    :type trace: list or None
+    :param checkpoints: whether to keep what recount needs
+    :type checkpoints: bool
+    :param rng: the random number generator to break ties with, or None to
+        end the count in a tie
+    :type rng: random.Random or None
+    :param counts: how many of each ballot were cast, if the ballots are
+        already grouped, or None to group them
+    :type counts: list or None
+    """
+
+    def __init__(self, candidates, ballots, seat_count, quota, trace=None,
+                 checkpoints=False, rng=None, counts=None):
+        self.candidates = list(candidates)
+        if counts is None:
+            groups = Counter(tuple(ballot) for ballot in ballots)
+            ballots = groups.keys()
+            counts = groups.values()
+        # the distinct ballots, and how many of each were cast
+        self.ballots = list(ballots)
+        self.counts = list(counts)
+        self.seat_count = seat_count
+        self.quota = quota
+        self.trace = trace
+        self.rounds = [] if checkpoints else None
+        self.changes = None
+        self.rng = rng
+
+    def run(self):
+        """
+        runs the count until every seat is filled or there is a tie
+
+        :return: the winning and tied candidate ids
+        :rtype: dict
+        """
+        candidate_count = len(self.candidates)
+        return self.count([0] * len(self.ballots),
+                          [1] * len(self.ballots),
+                          [[] for _ in range(candidate_count)],
+                          [0] * candidate_count,
+                          set(range(candidate_count)),
+                          set(),
+                          0,
+                          None)
+
+    def count(self, pointers, weights, piles, totals, remaining, winners,
+              round_num, removed):
+        """
+        counts from the start of a round
+
+        :param removed: the candidates removed in the previous round, whose
+            piles are transferred first, or None to start by sorting every
+            ballot to its first continuing preference
+        :return: the winning and tied candidate ids
+        :rtype: dict
+        """
+        candidate_count = len(self.candidates)
+        ballots = self.ballots
+        counts = self.counts
+        quota = self.quota
+        seat_count = self.seat_count
+        continuing = [candidate in remaining
+                      for candidate in range(candidate_count)]
+        if self.rounds is not None:
+            self.pointers = pointers
+            self.weights = weights
+
+        tied = set()
+
+        while (len(winners) < seat_count
+               and len(winners) + len(remaining) != seat_count
+               and len(tied) == 0):
+
+            round_num += 1
+            transfers = []
+            if self.rounds is not None:
+                self.changes = []
+            if removed is None:
+                for ballot_index, ballot in enumerate(ballots):
+                    position = 0
+                    while (position < len(ballot)
+                           and not continuing[ballot[position]]):
+                        position += 1
+                    if position != 0:
+                        pointers[ballot_index] = position
+                    if position < len(ballot):
+                        piles[ballot[position]].append(ballot_index)
+                        totals[ballot[position]] += counts[ballot_index]
+            else:
+                for candidate in removed:
+                    transfers += self.transfer(candidate,
+                                               candidate in winners,
+                                               ballots, pointers, weights,
+                                               piles, totals, continuing)
+
+            if self.rounds is not None:
+                checkpoint = {"totals": list(totals),
+                              "remaining": frozenset(remaining),
+                              "winners": frozenset(winners),
+                              "changes": self.changes}
+                self.rounds.append(checkpoint)
+
+            if len(remaining) == 0:
+                return self.result(winners, tied)
+
+            if self.trace is not None:
+                record = self.record_round(round_num, remaining, totals,
+                                           transfers)
+
+            max_count = max(totals[candidate] for candidate in remaining)
+            if max_count >= quota:
+                removed = set(candidate for candidate in remaining
+                              if totals[candidate] >= quota)
+                winners |= removed
+                remaining -= removed
+            else:
+                min_count = min(totals[candidate] for candidate in remaining)
+                removed = set(candidate for candidate in remaining
+                              if totals[candidate] == min_count)
+                if self.rng is not None and len(removed) > 1:
+                    removed = {self.rng.choice(sorted(removed))}
+                if len(remaining - removed) + len(winners) < seat_count:
+                    tied = removed
+                else:
+                    remaining -= removed
+
+            if self.rounds is not None:
+                checkpoint["removed"] = frozenset(removed)
+                checkpoint["elected"] = max_count >= quota
+                checkpoint["tied"] = len(tied) != 0
+
+            if self.trace is not None:
+                if len(tied) != 0:
+                    record["tied"] = self.ids(tied)
+                elif max_count >= quota:
+                    record["elected"] = self.ids(removed)
+                else:
+                    record["eliminated"] = self.ids(removed)
+                self.trace.append(record)
+
+            if len(tied) == 0:
+                for candidate in removed:
+                    continuing[candidate] = False
+
+        if len(winners) < seat_count and len(tied) == 0:
+            if len(winners) + len(remaining) == seat_count:
+                if self.trace is not None and len(remaining) != 0:
+                    # the remaining candidates fill the open seats without
+                    # another count
+                    record = self.record_round(round_num + 1, set(), totals,
+                                               [])
+                    record["elected"] = self.ids(remaining)
+                    self.trace.append(record)
+                winners |= remaining
+            else:
+                logging.warning("no tied, but winners + remaining"
+                                " is not equal to the seat count!!")
+        return self.result(winners, tied)
+
+    def recount(self, excluded=(), seat_count=None, quota=None):
+        """
+        counts again as if some candidates had withdrawn, or with a different
+        number of seats, resuming from the first round the change affects
+
+        A round is unaffected if the excluded candidates held no ballots in
+        it and the new rules make the same decision from the totals it
+        recorded, if every round before it is unaffected too. The count
+        resumes from the state those rounds left, rebuilt from the undo log.
+
+        :param excluded: ids of the candidates to leave out
+        :type excluded: list
+        :param seat_count: the number of seats, or None to keep it
+        :type seat_count: int or None
+        :param quota: the quota for the new seat count, or None to keep it
+        :type quota: int or None
+        :return: the winning and tied candidate ids, and the round the count
+            resumed from
+        :rtype: dict
+        :raises ValueError: if the count was run without checkpoints or
+            hasn't been run
+        """
+        if not self.rounds:
+            raise ValueError("recount needs a count run with checkpoints")
+        seat_count = self.seat_count if seat_count is None else seat_count
+        quota = self.quota if quota is None else quota
+        excluded = frozenset(self.candidates.index(x) for x in excluded)
+        resume_round = self.first_affected_round(excluded, seat_count, quota)
+
+        what_if = copy.copy(self)
+        what_if.seat_count = seat_count
+        what_if.quota = quota
+        what_if.trace = None
+        what_if.rounds = None
+        candidate_count = len(self.candidates)
+        if resume_round == 1:
+            results = what_if.count([0] * len(self.ballots),
+                                    [1] * len(self.ballots),
+                                    [[] for _ in range(candidate_count)],
+                                    [0] * candidate_count,
+                                    set(range(candidate_count)) - excluded,
+                                    set(),
+                                    0,
+                                    None)
+        else:
+            previous = self.rounds[resume_round - 2]
+            pointers, weights = self.restore(resume_round - 1)
+            piles = [[] for _ in range(candidate_count)]
+            for ballot_index, ballot in enumerate(self.ballots):
+                if pointers[ballot_index] < len(ballot):
+                    piles[ballot[pointers[ballot_index]]].append(ballot_index)
+            winners = set(previous["winners"])
+            if previous["elected"]:
+                winners |= previous["removed"]
+            results = what_if.count(pointers,
+                                    weights,
+                                    piles,
+                                    list(previous["totals"]),
+                                    set(previous["remaining"]
+                                        - previous["removed"] - excluded),
+                                    winners,
+                                    resume_round - 1,
+                                    set(previous["removed"] - excluded))
+        results["resumed_from"] = resume_round
+        return results
+
+    def first_affected_round(self, excluded, seat_count, quota):
+        """
+        checks each round's recorded decision against the new rules
+
+        :return: the first round that has to be counted again
+        :rtype: int
+        """
+        affected = 1
+        for checkpoint in self.rounds:
+            if "removed" not in checkpoint or checkpoint["tied"]:
+                break
+            totals = checkpoint["totals"]
+            if any(totals[candidate] != 0 for candidate in excluded):
+                break
+            remaining = checkpoint["remaining"] - excluded
+            winners = checkpoint["winners"]
+            if (len(remaining) == 0
+                    or len(winners) >= seat_count
+                    or len(winners) + len(remaining) == seat_count):
+                break
+            max_count = max(totals[candidate] for candidate in remaining)
+            elected = max_count >= quota
+            if elected:
+                # a different quota changes the surplus that is transferred
+                if quota != self.quota:
+                    break
+                removed = set(candidate for candidate in remaining
+                              if totals[candidate] >= quota)
+            else:
+                min_count = min(totals[candidate] for candidate in remaining)
+                removed = set(candidate for candidate in remaining
+                              if totals[candidate] == min_count)
+                if len(remaining - removed) + len(winners) < seat_count:
+                    break
+            if (elected != checkpoint["elected"]
+                    or removed != checkpoint["removed"] - excluded):
+                break
+            affected += 1
+        return affected
+
+    def restore(self, round_num):
+        """
+        rebuilds the ballot pointers and weights as they were straight after
+        a round's transfers by undoing the later rounds
+
+        :return: the pointers and the weights
+        :rtype: tuple
+        """
+        pointers = list(self.pointers)
+        weights = list(self.weights)
+        for checkpoint in reversed(self.rounds[round_num:]):
+            for ballot_index, pointer, weight in reversed(
+                    checkpoint["changes"]):
+                pointers[ballot_index] = pointer
+                weights[ballot_index] = weight
+        return pointers, weights
+
+    def transfer(self, candidate, elected, ballots, pointers, weights, piles,
+                 totals, continuing):
+        """
+        moves every ballot in a removed candidate's pile on to its next
+        continuing preference
+
+        ballots leaving an elected candidate carry the surplus fraction of
+        their weight, ballots with no continuing preference left or with no
+        weight left are exhausted
+
+        :return: a summary of where the pile went if a trace is being built
+        :rtype: list
+        """
+        total = totals[candidate]
+        if elected:
+            factor = Fraction(total - self.quota) / total
+        else:
+            factor = 1
+
+        counts = self.counts
+        if self.trace is not None:
+            totals_before = list(totals)
+            moved = dict()
+
+        changes = self.changes
+        for ballot_index in piles[candidate]:
+            ballot = ballots[ballot_index]
+            if changes is not None:
+                changes.append((ballot_index, pointers[ballot_index],
+                                weights[ballot_index]))
+            position = pointers[ballot_index] + 1
+            while position < len(ballot) and not continuing[ballot[position]]:
+                position += 1
+            if position == len(ballot):
+                pointers[ballot_index] = position
+                continue
+
+            weight = weights[ballot_index] * factor
+            if weight == 0:
+                pointers[ballot_index] = len(ballot)
+                continue
+            next_candidate = ballot[position]
+            pointers[ballot_index] = position
+            weights[ballot_index] = weight
+            piles[next_candidate].append(ballot_index)
+            totals[next_candidate] += weight * counts[ballot_index]
+            if self.trace is not None:
+                moved[next_candidate] = (moved.get(next_candidate, 0)
+                                         + counts[ballot_index])
+
+        transfers = []
+        if self.trace is not None:
+            transferred = 0
+            for next_candidate in sorted(moved):
+                value = totals[next_candidate] - totals_before[next_candidate]
+                transferred += value
+                transfers.append({"from": self.candidates[candidate],
+                                  "to": self.candidates[next_candidate],
+                                  "ballots": moved[next_candidate],
+                                  "weight": factor,
+                                  "value": value})
+            exhausted = (sum(counts[x] for x in piles[candidate])
+                         - sum(moved.values()))
+            if exhausted != 0:
+                transfers.append({"from": self.candidates[candidate],
+                                  "to": None,
+                                  "ballots": exhausted,
+                                  "weight": factor,
+                                  "value": total * factor - transferred})
+
+        piles[candidate] = []
+        return transfers
+
+    def record_round(self, round_num, remaining, totals, transfers):
+        """
+        starts the trace record for a round, the decision is filled in once
+        it is made
+
+        :return: the round record
+        :rtype: dict
+        """
+        return {"round": round_num,
+                "quota": self.quota,
+                "totals": {self.candidates[x]: totals[x]
+                           for x in sorted(remaining)},
+                "transfers": transfers,
+                "elected": [],
+                "eliminated": [],
+                "tied": []}
+
+    def ids(self, candidates):
+        return [self.candidates[x] for x in sorted(candidates)]
+
+    def result(self, winners, tied):
+        return {"winners": set(self.candidates[x] for x in winners),
+                "tied": set(self.candidates[x] for x in tied)}
@@ -0,0 +1,149 @@
+import json
+import random
+import unittest
+from voting.stv_count import StvCount
+from voting.stv_trace import export_trace
+
+
+class TestStvCount(unittest.TestCase):
+
+    def test_surplus_transfer(self):
+        # https://en.wikipedia.org/wiki/Single_transferable_vote#Example
+        candidates = ["orange", "pear", "chocolate", "strawberry",
+                      "hamburger"]
+        ballots = ([(0,)] * 4 + [(1, 0)] * 2 + [(2, 3)] * 8 + [(2, 4)] * 4
+                   + [(3,)] + [(4,)])
+        count = StvCount(candidates, ballots, 3, 6)
+        self.assertEqual(count.run(),
+                         {"winners": {"orange", "chocolate", "strawberry"},
+                          "tied": set()})
+
+    def test_ballots_grouped(self):
+        ballots = [(0, 1)] * 500 + [(1, 0)] * 499 + [(1,)] * 2
+        count = StvCount(["a", "b"], ballots, 1, 501)
+        self.assertEqual(len(count.ballots), 3)
+        self.assertEqual(sum(count.counts), 1001)
+        self.assertEqual(count.run(), {"winners": {"b"}, "tied": set()})
+
+    def test_random_tie_break(self):
+        ballots = [(0,), (0,), (1,), (1,), (2,)]
+        count = StvCount(["a", "b", "c"], ballots, 1, 3)
+        self.assertEqual(count.run(), {"winners": set(), "tied": {"a", "b"}})
+        winners = set()
+        for seed in range(20):
+            count = StvCount(["a", "b", "c"], ballots, 1, 3,
+                             rng=random.Random(seed))
+            results = count.run()
+            self.assertEqual(results["tied"], set())
+            self.assertEqual(len(results["winners"]), 1)
+            winners |= results["winners"]
+        self.assertEqual(winners, {"a", "b"})
+
+    def test_trace(self):
+        candidates = ["orange", "pear", "chocolate", "strawberry",
+                      "hamburger"]
+        ballots = ([(0,)] * 4 + [(1, 0)] * 2 + [(2, 3)] * 8 + [(2, 4)] * 4
+                   + [(3,)] + [(4,)])
+        trace = []
+        StvCount(candidates, ballots, 3, 6, trace).run()
+        self.assertEqual([x["elected"] for x in trace],
+                         [["chocolate"], [], ["orange"], [], ["strawberry"]])
+        self.assertEqual([x["eliminated"] for x in trace],
+                         [[], ["pear"], [], ["hamburger"], []])
+        self.assertEqual(trace[1]["totals"],
+                         {"orange": 4, "pear": 2, "strawberry": 5,
+                          "hamburger": 3})
+
+        name, jsonl = export_trace(trace)
+        self.assertEqual(name, "count_trace.jsonl")
+        rounds = [json.loads(line) for line in jsonl.read().splitlines()]
+        self.assertEqual(rounds[1]["transfers"],
+                         [{"from": "chocolate", "to": "strawberry",
+                           "ballots": 8, "weight": 0.5, "value": 4},
+                          {"from": "chocolate", "to": "hamburger",
+                           "ballots": 4, "weight": 0.5, "value": 2}])
+        self.assertEqual(rounds[3]["transfers"],
+                         [{"from": "orange", "to": None, "ballots": 6,
+                           "weight": 0, "value": 0}])
+
+        name, csv_file = export_trace(trace, "csv")
+        lines = csv_file.read().decode().splitlines()
+        self.assertEqual(lines[0],
+                         "round,record,candidate,to,ballots,weight,value,"
+                         "quota")
+        self.assertIn("2,transfer,chocolate,strawberry,8,0.5,4,6", lines)
+
+    def test_exact_weights(self):
+        # a float count leaves "b" at 3.9999999999999996 after the surplus
+        candidates = ["a", "b", "c", "d"]
+        ballots = [(0, 1)] * 7 + [(1,)] + [(2,)] * 2 + [(3,)] * 2
+        count = StvCount(candidates, ballots, 2, 4)
+        self.assertEqual(count.run(), {"winners": {"a", "b"}, "tied": set()})
+
+    def test_tie(self):
+        candidates = ["a", "b", "c"]
+        ballots = [(0,)] * 5 + [(1,)] * 5 + [(2,)] * 5
+        count = StvCount(candidates, ballots, 1, 8)
+        self.assertEqual(count.run(),
+                         {"winners": set(), "tied": {"a", "b", "c"}})
+
+    def test_candidates_fill_seats(self):
+        count = StvCount(["a", "b"], [], 2, 1)
+        self.assertEqual(count.run(), {"winners": {"a", "b"}, "tied": set()})
+
+    def test_recount_resumes(self):
+        candidates = ["orange", "pear", "chocolate", "strawberry",
+                      "hamburger", "kale"]
+        ballots = ([(0,)] * 4 + [(1, 0)] * 2 + [(2, 3)] * 8 + [(2, 4)] * 4
+                   + [(3,)] + [(4,)])
+        count = StvCount(candidates, ballots, 3, 6, checkpoints=True)
+        count.run()
+        # kale never holds a ballot, electing chocolate in round 1 stands
+        # but round 2 eliminated kale on its own so it is counted again
+        results = count.recount(["kale"])
+        self.assertEqual(results["resumed_from"], 2)
+        self.assertEqual(results["winners"],
+                         {"orange", "chocolate", "strawberry"})
+        # hamburger has a first preference, so nothing can be reused
+        results = count.recount(["hamburger"])
+        self.assertEqual(results["resumed_from"], 1)
+        self.assertEqual(results["winners"],
+                         {"orange", "chocolate", "strawberry"})
+
+    def test_recount_matches_fresh_count(self):
+        def fresh(candidates, ballots, excluded, seat_count, quota):
+            keep = [x for x in range(len(candidates))
+                    if candidates[x] not in excluded]
+            index = {old: new for new, old in enumerate(keep)}
+            return StvCount([candidates[x] for x in keep],
+                            [tuple(index[x] for x in ballot if x in index)
+                             for ballot in ballots],
+                            seat_count, quota).run()
+
+        for seed in range(300):
+            rng = random.Random(seed)
+            candidates = [str(x) for x in range(rng.randint(3, 8))]
+            strength = [rng.random() ** 3 for _ in candidates]
+            ballots = []
+            for _ in range(rng.randint(5, 50)):
+                order = sorted(range(len(candidates)),
+                               key=lambda x: -strength[x] * rng.random())
+                ballots.append(tuple(order[:rng.randint(1, len(order))]))
+            seat_count = rng.randint(1, len(candidates) - 2)
+            quota = len(ballots) // (seat_count + 1) + 1
+            count = StvCount(candidates, ballots, seat_count, quota,
+                             checkpoints=True)
+            count.run()
+            excluded = rng.choice(candidates)
+            new_seats = rng.randint(1, len(candidates) - 1)
+            new_quota = len(ballots) // (new_seats + 1) + 1
+            for args in (([excluded], seat_count, quota),
+                         ([], new_seats, new_quota),
+                         ([excluded], new_seats, new_quota)):
+                results = count.recount(*args)
+                del results["resumed_from"]
+                self.assertEqual(results, fresh(candidates, ballots, *args))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
 import math
-from voting.poll import Poll, AlreadyVoted, VoteNotOpen, VoteAlreadyClosed
+from voting.poll import Poll
 from voting.ffrvoter import FFRVoter
+from voting.stv_count import StvCount
+from voting import tie_analysis
+from voting.exports import csv_export
 import logging
-import csv
 
 
 class StvElection(Poll):
@@ -49,6 +51,8 @@ class StvElection(Poll):
                                 "mention": mention,
                                 "display_name": display_name,
                                 "index": len(self.options)}
+            self.option_ids.append(id)
+            self.tally.append(0)
 
     def get_vote_text(self):
         r_val = "\n\n\nCandidates:\n"
@@ -70,50 +74,56 @@ class StvElection(Poll):
         return r_val
 
     def check_valid_ballot(self, ballot_args: list):
-        ranks = []
+        return self.parse_ballot(ballot_args) is not None
+
+    def parse_ballot(self, ballot_args: list):
+        """
+        parses and validates the ?submitballot arguments in one pass, each
+        argument is "rank, display name, id" and a rank of x leaves that
+        candidate unranked
+
+        :param ballot_args: the ballot
+        :type ballot_args: list
+        :return: rank to candidate id, or None if the ballot isn't valid
+        :rtype: dict or None
+        """
+        ballot = dict()
+        ranked = set()
         try:
             for arg in ballot_args:
-                rank = arg.split(",")[0].strip("<>")
-                id = arg.split(",")[2].strip()
-                logging.debug(rank)
-                logging.debug(id)
+                fields = arg.split(",")
+                rank = fields[0].strip("<>")
+                id = fields[2].strip()
                 int(id)
                 if rank == "x":
                     continue
                 rank = int(rank)
-                id_exists = id in self.options.keys()
-                rank_valid = (rank > 0
-                              and rank <= len(self.options)
-                              and rank not in ranks)
-                if not (id_exists and rank_valid):
-                    return False
-                ranks.append(rank)
+                if (id not in self.options or id in ranked
+                        or not 0 < rank <= len(self.options)
+                        or str(rank) in ballot):
+                    return None
+                ballot[str(rank)] = id
+                ranked.add(id)
         except (ValueError, IndexError):
-            return False
-        count = 0
-        for rank in sorted(ranks):
-            count += 1
-            if rank != count:
-                return False
-        if count != len(ranks) or count == 0:
-            return False
-
-        return True
+            return None
+        # the ranks have to run from 1 with no gaps
+        if len(ballot) == 0 or max(int(x) for x in ballot) != len(ballot):
+            return None
+        return ballot
 
     def process_ballot(self, ballot_args):
         ballot = dict()
         for arg in ballot_args:
-            rank = arg.split(",")[0].strip("<>")
+            fields = arg.split(",")
+            rank = fields[0].strip("<>")
             if rank == "x":
                 continue
-            id = arg.split(",")[2].strip()
-            ballot[str(int(rank))] = id
+            ballot[str(int(rank))] = fields[2].strip()
         return ballot
 
     def confirm_vote_text(self, ballot_args: list):
         ballot_text = "Rank | User | display name\n\n"
         ballot = self.process_ballot(ballot_args)
-        logging.info(str(ballot_args) + "\n" + str(ballot))
 
         for key, value in sorted(ballot.items(), key=lambda rank:
                                  int(rank[0])):
@@ -138,27 +148,52 @@ class StvElection(Poll):
         :param ballot_args: the ballot
         :type ballot_args: list
         """
-        if self.started is False:
-            raise VoteNotOpen
+        self.check_can_vote(voter_id)
+        try:
+            self.add_vote(voter_id, voter_name,
+                          self.process_ballot(ballot_args))
+        except KeyError:
+            logging.error("KeyError in submit_vote")
+            pass
+
+    def add_vote(self, voter_id: str, voter_name: str, vote):
+        self.sync_tally()
+        voter = FFRVoter(voter_id, voter_name)
+        voter.set_vote(vote)
+        self.voters[voter_id] = voter
+        self.ballot_version += 1
+        self.tally[self.options[vote["1"]]["index"]] += 1
+        self.add_receipt(voter_id, vote)
+
+    def get_ballot_choices(self):
+        self.sync_tally()
+        return [(option_id, self.options[option_id]["display_name"], None)
+                for option_id in self.option_ids]
+
+    def get_max_choices(self):
+        return len(self.options)
+
+    def is_ranked(self):
+        return True
+
+    def choices_to_vote(self, choices: list):
+        if (len(choices) == 0 or len(set(choices)) != len(choices)
+                or any(id not in self.options for id in choices)):
+            return None
+        return {str(rank + 1): id for rank, id in enumerate(choices)}
 
-        elif self.ended is True:
-            raise VoteAlreadyClosed
+    def confirm_choices_text(self, choices: list):
+        ballot_text = "Rank | display name\n"
+        for rank, id in enumerate(choices):
+            ballot_text += ("\n" + str(rank + 1)
+                            + " | "
+                            + self.options[id]["display_name"])
+        return ballot_text
 
-        elif self.check_if_voted(voter_id):
-            raise AlreadyVoted
+    def get_results(self, trace=None):
+        return self.results_text(self.get_winners(trace))
 
-        else:
-            voter = FFRVoter(voter_id, voter_name)
-            ballot = self.process_ballot(ballot_args)
-            try:
-                voter.set_vote(ballot)
-                self.voters[voter_id] = voter
-            except KeyError:
-                logging.error("KeyError in submit_vote")
-                pass
-
-    def get_results(self):
-        results = self.get_winners()
+    def results_text(self, results):
         r_val = "The winners are: "
         for winner in results["winners"]:
             r_val += "\n" + self.options[winner]["mention"]
@@ -174,228 +209,218 @@ class StvElection(Poll):
     def get_winner(self):
         raise NotImplementedError
 
-    def get_winners(self):
-        quota = self.calc_quota()
-        logging.info("Quota: " + str(quota))
-        winners = set()
-        options = set(self.options.keys())
-        remaining_options = options - winners
-        votes = [voter.get_vote() for voter in self.voters.values()]
-        tied = set()
-        round_num = 1
-        count = None
-
-        while (len(winners) < self.seat_count
-               and len(winners) + len(remaining_options) != self.seat_count
-               and len(tied) == 0):
-
-            count = self.update_count(count,
-                                      round_num,
-                                      votes,
-                                      options,
-                                      winners,
-                                      remaining_options,
-                                      quota)
-
-            try:
-                max_count = max([v["total"] for k, v in count[str(
-                    round_num)].items() if k in remaining_options])
-            except ValueError:
-                logging.info("no remaining options, options: "
-                             + str(remaining_options)
-                             + "\nwinners: "
-                             + str(winners))
-                return {"winners": winners, "tied": tied}
-
-            logging.info("Max count: " + str(max_count))
-            if max_count >= quota:
-
-                in_progress_winners = set()
-                for k, v in count[str(round_num)].items():
-                    if v["total"] >= quota:
-                        in_progress_winners.add(k)
-                        logging.info("winner id: " + str(k))
-
-                winners |= in_progress_winners
-                remaining_options -= winners
-
-            else:
-                min_count = min([v["total"] for k, v in count[str(
-                    round_num)].items() if k in remaining_options])
-                logging.info("Min count: " + str(min_count))
-                options_to_remove = set([option for option
-                                         in options if option
-                                         in remaining_options
-                                         and count[str(round_num)]
-                                         [option]["total"]
-                                         == min_count])
-                logging.info("options to remove" + str(options_to_remove))
-
-                if (len(
-                        remaining_options -
-                        options_to_remove)
-                        + len(winners)) < self.seat_count:
-                    tied = options_to_remove
-                else:
-                    remaining_options -= options_to_remove
-
-            round_num += 1
-
-        if (len(winners) < self.seat_count
-                and len(tied) == 0):
-            if len(winners) + len(remaining_options) == self.seat_count:
-                winners |= remaining_options
-            else:
-                logging.warning("no tied, but winners + remaining"
-                                + " is not equal to the seat count!!")
-        logging.info("Winners: " + str(winners))
-        logging.info("Tied: " + str(tied))
-        return {"winners": winners, "tied": tied}
-
-    def update_count(
-            self,
-            count,
-            round_num,
-            votes,
-            options,
-            winners,
-            remaining_options,
-            quota):
-
-        if count is None:
-            count = {str(round_num): dict()}
-
-            for option in options:
-                count[str(round_num)][option] = {"votes": [], "total": 0}
-
-            logging.info("logging votes")
-            for vote in votes:
-                logging.info(vote)
-                vote["weight"] = 1
-                count[str(round_num)][vote["1"]]["votes"].append(vote)
+    def get_vote_index(self, vote):
+        """
+        returns the index of the first preference of a ballot
 
-        else:
-            count[str(round_num)] = dict()
-            removed_options = []
-            for option_key, option_v in count[str(round_num - 1)].items():
-                if option_key in remaining_options:
-                    count[str(round_num)][option_key] = option_v
-                else:
-                    removed_options.append(option_key)
-
-            for removed_option_key in removed_options:
-                logging.info("removed option key is: "
-                             + str(removed_option_key))
-                option = self.options[removed_option_key]
-                for vote in\
-                        count[str(round_num - 1)][removed_option_key]["votes"]:
-                    logging.info("new voter")
-                    for k, v in sorted(
-                            vote.items(), key=lambda x: self.vote_sort(x)):
-                        if k == "weight":
-                            continue
-                        logging.info("vote info stuff: " + str(k) + " "
-                                     + str(v))
-                        logging.info("remaining options: "
-                                     + str(remaining_options))
-                        logging.info(str(v)
-                                     + " in remaining options: "
-                                     + str(v in remaining_options))
-                        if v in remaining_options:
-                            logging.info("found next ranked option still"
-                                         + " in the running: " + str(v))
-                            if removed_option_key in winners:
-                                logging.info(
-                                    "voter's earlier option won: "
-                                    + str(removed_option_key))
-                                total = count[str(round_num - 1)
-                                              ][removed_option_key]["total"]
-                                surplus = total - quota
-                                old_weight = str(vote["weight"])
-                                vote["weight"] *= surplus / total
-                                weight = str(vote["weight"])
-                                logging.info("\ntotal votes for previous "
-                                             + "option: " + str(total) + "\n"
-                                             + "quota: " + str(quota) + "\n"
-                                             + "surplus: " + str(surplus)
-                                             + "\nold weight: " + old_weight
-                                             + "\nnew weight: " + weight)
-                                if vote["weight"] == 0:
-                                    logging.info("vote weight is zero,"
-                                                 + " skipping")
-                                    break
-                            logging.info("transering vote of weight: "
-                                         + str(vote["weight"])
-                                         + " to: "
-                                         + str(v))
-                            count[str(round_num)][v]["votes"].append(vote)
-                            break
-
-        # update the total vote count for that option
-        for option in count[str(round_num)].values():
-            total = 0
-            for vote in option["votes"]:
-                total += vote["weight"]
-            option["total"] = total
-
-        logging.info("round count: " + str(count[str(round_num)]))
+        :param vote: the ranked ballot a voter cast
+        :return: index of the first preference, or None if there isnt one
+        :rtype: int or None
+        """
+        try:
+            return self.options[vote["1"]]["index"]
+        except (KeyError, TypeError):
+            return None
+
+    def get_tally_text(self):
+        r_val = "\nFirst preferences:"
+        for option_id, count in self.get_tally():
+            r_val += ("\n" + self.options[option_id]["display_name"]
+                      + ": " + str(count))
+        return r_val
+
+    def get_winners(self, trace=None):
+        """
+        counts the election
+
+        :param trace: a list to append a record of each round of the count
+            to, or None
+        :type trace: list or None
+        :return: the winning and tied candidate ids
+        :rtype: dict
+        """
+        count = StvCount(self.get_candidates(),
+                         self.encode_ballots(),
+                         self.seat_count,
+                         self.calc_quota(),
+                         trace)
+        results = count.run()
+        logging.info("Winners: %s", results["winners"])
+        logging.info("Tied: %s", results["tied"])
+        return results
+
+    def checkpointed_count(self):
+        """
+        counts the election keeping the checkpoints get_recount_results
+        resumes from
+
+        :rtype: StvCount
+        """
+        count = StvCount(self.get_candidates(),
+                         self.encode_ballots(),
+                         self.seat_count,
+                         self.calc_quota(),
+                         checkpoints=True)
+        count.run()
         return count
 
-    def vote_sort(self, key):
-        try:
-            return int(key[0])
-        except ValueError:
-            return -1
+    def get_recount_results(self, count, excluded=(), seat_count=None):
+        """
+        counts what the results would be with some candidates withdrawn or a
+        different number of seats
+
+        :param count: the checkpointed count of this election
+        :type count: StvCount
+        :param excluded: ids of the candidates to leave out
+        :type excluded: list
+        :param seat_count: the number of seats, or None to keep it
+        :type seat_count: int or None
+        :return: the results text
+        :rtype: str
+        """
+        if seat_count is None:
+            seat_count = self.seat_count
+        results = count.recount(excluded, seat_count,
+                                self.calc_quota(seat_count))
+        logging.info("Recount resumed from round %s",
+                     results["resumed_from"])
+        return self.results_text(results)
+
+    def simulate_ties(self, seconds, seed, bootstrap=True):
+        """
+        counts the election over and over with ties broken at random, and
+        the ballots resampled if bootstrap is set, for tie analysis
+
+        :return: the number of trials and how many each candidate won
+        :rtype: dict
+        """
+        return tie_analysis.simulate(self.get_candidates(),
+                                     self.encode_ballots(),
+                                     self.seat_count,
+                                     self.calc_quota(),
+                                     seconds,
+                                     seed,
+                                     bootstrap)
+
+    def tie_analysis_text(self, results):
+        """
+        :param results: the trials from every worker, combined
+        :type results: dict
+        :return: each candidate's chance of winning a seat
+        :rtype: str
+        """
+        r_val = "Chance of winning a seat:"
+        for option_id, p, error in tie_analysis.win_probabilities(
+                results, self.get_candidates()):
+            r_val += ("\n" + self.options[option_id]["display_name"]
+                      + ": " + str(round(100 * p, 1))
+                      + "% (±" + str(round(100 * error, 1)) + "%)")
+        r_val += "\n\nTrials: " + str(results["trials"])
+        return r_val
+
+    def get_candidates(self):
+        """
+        returns the candidate ids in index order, the order the counting
+        engine refers to them by
+
+        :return: candidate ids
+        :rtype: list
+        """
+        self.sync_tally()
+        return list(self.option_ids)
+
+    def encode_ballots(self):
+        """
+        converts every ballot to a tuple of candidate indexes in preference
+        order
+
+        :return: the integer encoded ballots
+        :rtype: list
+        """
+        return [self.encode_vote(voter.vote)
+                for voter in self.voters.values()]
+
+    def to_state(self):
+        state = super().to_state()
+        state["seat_count"] = self.seat_count
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        election = cls(state["poll_id"], state["channel_id"],
+                       state["seat_count"])
+        election.load_state(state)
+        return election
+
+    def restore_option(self, option):
+        self.options[option["id"]] = dict(option)
 
-    def calc_quota(self):
+    def restore_voter(self, voter):
+        pass
+
+    def encode_vote(self, vote):
+        """
+        encodes a ranked ballot as a tuple of candidate indexes in
+        preference order
+        """
+        ranking = sorted(vote.items(), key=lambda rank: int(rank[0]))
+        return tuple(self.options[option_id]["index"]
+                     for rank, option_id in ranking
+                     if option_id in self.options)
+
+    def decode_vote(self, vote):
+        return {str(rank + 1): self.option_ids[index]
+                for rank, index in enumerate(vote)}
+
+    def calc_quota(self, seat_count=None):
         """
         https://en.wikipedia.org/wiki/Single_transferable_vote
         #More_refined_method:_setting_the_quota
 
+        :param seat_count: the number of seats, or None for this election's
+        :type seat_count: int or None
         :return: the required number of votes to be elected
         :rtype: int
         """
+        if seat_count is None:
+            seat_count = self.seat_count
         votes = len(self.voters)
-        return (math.floor(votes / (self.seat_count + 1))) + 1
-
-    def get_csv(self):
-        votes = [voter.get_vote() for voter in self.voters.values()]
-        for i in range(len(votes)):
-            for k in votes[i].keys():
-                votes[i][k] += (" - "
-                                + self.options[votes[i][k]]["display_name"]
-                                + " - "
-                                + self.options[votes[i][k]]["mention"])
-        name = "votes.csv"
-        with open(name, 'w') as csvFile:
-            fields = [str(x) for x in range(1, len(self.options) + 1)]
-            writer = csv.DictWriter(csvFile, fieldnames=fields)
-            writer.writeheader()
-            writer.writerows(votes)
-        csvFile.close()
-        return name
-
-    def get_voter_info(self):
-        votes = []
-        for voter in self.voters.values():
-            vote = voter.get_vote()
-            for k in vote.keys():
-                vote[k] += (" - "
-                            + self.options[vote[k]]["display_name"]
+        return (math.floor(votes / (seat_count + 1))) + 1
+
+    def get_option_labels(self):
+        """
+        builds the label each candidate is exported with once, rather than
+        once per ballot
+
+        :return: candidate id to "id - display name - mention"
+        :rtype: dict
+        """
+        return {option_id: (option_id
+                            + " - "
+                            + option["display_name"]
                             + " - "
-                            + self.options[vote[k]]["mention"])
-            vote["voter name"] = voter.name
-            vote["voter id"] = voter.id
-            votes.append(vote)
-
-        name = "voter_info.csv"
-        with open(name, 'w') as csvFile:
-            fields = ["voter name", "voter id"]
-            fields.extend(
-                [str(x) for x in range(1, len(self.options) + 1)])
-            logging.info(fields)
-            writer = csv.DictWriter(csvFile, fieldnames=fields)
-            writer.writeheader()
-            writer.writerows(votes)
-        csvFile.close()
-        return name
+                            + option["mention"])
+                for option_id, option in self.options.items()}
+
+    def get_csv(self, compress=False):
+        labels = self.get_option_labels()
+        rows = ({rank: labels[option_id]
+                 for rank, option_id in voter.get_vote().items()}
+                for voter in self.voters.values())
+        fields = [str(x) for x in range(1, len(self.options) + 1)]
+        return csv_export(rows, fields, "votes.csv", compress)
+
+    def get_voter_info(self, compress=False):
+        labels = self.get_option_labels()
+
+        def rows():
+            for voter in self.voters.values():
+                row = {rank: labels[option_id]
+                       for rank, option_id in voter.get_vote().items()}
+                row["voter name"] = voter.name
+                row["voter id"] = voter.id
+                yield row
+
+        fields = ["voter name", "voter id"]
+        fields.extend([str(x) for x in range(1, len(self.options) + 1)])
+        return csv_export(rows(), fields, "voter_info.csv", compress)
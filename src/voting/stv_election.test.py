@@ -1,5 +1,9 @@
+import gzip
 import unittest
+from voting.counting import count_poll, load_poll, recount_poll
+from voting.poll import InvalidBallot
 from voting.stv_election import StvElection
+from voting.schulze_election import SchulzeElection
 
 
 class TestStvElection(unittest.TestCase):
@@ -37,6 +41,139 @@ class TestStvElection(unittest.TestCase):
         self.assertTrue(election.get_winners()["winners"] ==
                         set(["0", "1", "2", "3", "4"]))
 
+    def test_count_poll_state(self):
+        election = StvElection("test", "fake id", 2)
+        for i in range(4):
+            x = str(i)
+            election.options[x] = {"id": x,
+                                   "mention": x + "asdf",
+                                   "display_name": x + "display_name",
+                                   "index": len(election.options)}
+        election.start_poll()
+        for i in range(40):
+            x = str(i)
+            election.submit_vote(x + "voterid",
+                                 x + "votername",
+                                 ["1,," + str(i % 3), "2,," + str(3 - i % 2)])
+        state = election.to_state()
+        self.assertEqual(state["voters"][1], ("1voterid", "1votername",
+                                              (1, 2)))
+        self.assertEqual(load_poll(state).get_winners(),
+                         election.get_winners())
+        count = count_poll(state, "jsonl", with_csv=False)
+        self.assertEqual(count["results"], election.get_results())
+        self.assertEqual(count["trace"][0], "count_trace.jsonl")
+        self.assertIsNone(count["csv"])
+
+    def test_get_csv(self):
+        election = StvElection("test", "fake id", 1)
+        for i in range(2):
+            x = str(i)
+            election.options[x] = {"id": x,
+                                   "mention": "<@" + x + ">",
+                                   "display_name": "name" + x,
+                                   "index": len(election.options)}
+        election.start_poll()
+        election.submit_vote("5", "voter", ["1,,1", "2,,0"])
+        file_name, csv_file = election.get_csv()
+        self.assertEqual(file_name, "votes.csv")
+        self.assertEqual(csv_file.read().decode().splitlines(),
+                         ["1,2", "1 - name1 - <@1>,0 - name0 - <@0>"])
+        self.assertEqual(election.voters["5"].vote, {"1": "1", "2": "0"})
+
+        file_name, gz_file = election.get_voter_info(compress=True)
+        self.assertEqual(file_name, "voter_info.csv.gz")
+        self.assertEqual(gzip.decompress(gz_file.read()).decode()
+                         .splitlines(),
+                         ["voter name,voter id,1,2",
+                          "voter,5,1 - name1 - <@1>,0 - name0 - <@0>"])
+
+    def test_parse_ballot(self):
+        election = StvElection("test", "fake id", 1)
+        for i in range(3):
+            x = str(i)
+            election.options[x] = {"id": x,
+                                   "mention": "<@" + x + ">",
+                                   "display_name": "name" + x,
+                                   "index": len(election.options)}
+        self.assertEqual(election.parse_ballot(["<2>, name0, 0",
+                                                "<x>, name1, 1",
+                                                "<1>, name2, 2"]),
+                         {"2": "0", "1": "2"})
+        # a gap in the ranks, a repeated candidate, an unknown candidate
+        self.assertIsNone(election.parse_ballot(["2,,0", "3,,1"]))
+        self.assertIsNone(election.parse_ballot(["1,,0", "2,,0"]))
+        self.assertIsNone(election.parse_ballot(["1,,7"]))
+        self.assertIsNone(election.parse_ballot(["x,,0"]))
+        self.assertFalse(election.check_valid_ballot(["1,0"]))
+
+    def test_submit_choices(self):
+        election = StvElection("test", "fake id", 1)
+        for i in range(3):
+            x = str(i)
+            election.options[x] = {"id": x,
+                                   "mention": "<@" + x + ">",
+                                   "display_name": "name" + x,
+                                   "index": len(election.options)}
+        election.start_poll()
+        self.assertEqual(election.get_max_choices(), 3)
+        self.assertEqual(election.get_ballot_choices()[2], ("2", "name2", None))
+        with self.assertRaises(InvalidBallot):
+            election.submit_choices("5", "voter", ["1", "1"])
+        with self.assertRaises(InvalidBallot):
+            election.submit_choices("5", "voter", [])
+        election.submit_choices("5", "voter", ["2", "0"])
+        self.assertEqual(election.voters["5"].vote, {"1": "2", "2": "0"})
+        self.assertEqual(election.get_tally(), [("0", 0), ("1", 0), ("2", 1)])
+
+    def test_schulze_state(self):
+        election = SchulzeElection("test", "fake id")
+        for i in range(3):
+            x = str(i)
+            election.options[x] = {"id": x,
+                                   "mention": "<@" + x + ">",
+                                   "display_name": "name" + x,
+                                   "index": len(election.options)}
+        election.start_poll()
+        for i in range(9):
+            election.submit_vote(str(i), "voter", ["1,,2", "2,,0"] if i % 3
+                                 else ["1,,0", "2,,1"])
+        loaded = load_poll(election.to_state())
+        self.assertIsInstance(loaded, SchulzeElection)
+        self.assertEqual(loaded.get_winners()["winners"], {"2"})
+        self.assertEqual(count_poll(election.to_state())["results"],
+                         election.get_results())
+
+    def test_recount_poll(self):
+        election = StvElection("test", "fake id", 2)
+        for i in range(4):
+            x = str(i)
+            election.options[x] = {"id": x,
+                                   "mention": x + "asdf",
+                                   "display_name": x + "display_name",
+                                   "index": len(election.options)}
+        election.start_poll()
+        for i in range(40):
+            x = str(i)
+            election.submit_vote(x + "voterid",
+                                 x + "votername",
+                                 ["1,," + str(i % 3), "2,," + str(3 - i % 2)])
+        state = election.to_state()
+        without = StvElection("test", "fake id", 2)
+        for i in (0, 2, 3):
+            without.options[str(i)] = dict(election.options[str(i)],
+                                           index=len(without.options))
+        without.start_poll()
+        for voter in election.voters.values():
+            vote = [x for x in voter.vote.values() if x != "1"]
+            without.submit_vote(voter.id, voter.name,
+                                [str(rank + 1) + ",," + x
+                                 for rank, x in enumerate(vote)])
+        self.assertEqual(recount_poll(state, ["1"]),
+                         without.get_results())
+        self.assertEqual(recount_poll(state, [], 1),
+                         load_poll(dict(state, seat_count=1)).get_results())
+
 
 TestStvElection().test_instantiation()
 if __name__ == "__main__":
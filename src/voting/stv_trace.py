@@ -0,0 +1,109 @@
+import csv
+import json
+
+from voting.exports import text_export
+
+
+def number(value):
+    """
+    converts an exact count value to something json and csv can hold
+
+    :param value: a vote total or weight
+    :type value: int or Fraction
+    :return: the value, as an int if it is whole or rounded to 6 places
+    :rtype: int or float
+    """
+    if value == int(value):
+        return int(value)
+    return round(float(value), 6)
+
+
+def round_to_json(record):
+    """
+    converts a round record from StvCount to plain json types
+
+    :param record: the round record
+    :type record: dict
+    :return: the round record with every count as a number
+    :rtype: dict
+    """
+    return {"round": record["round"],
+            "quota": record["quota"],
+            "totals": {k: number(v) for k, v in record["totals"].items()},
+            "elected": record["elected"],
+            "eliminated": record["eliminated"],
+            "tied": record["tied"],
+            "transfers": [{"from": x["from"],
+                           "to": x["to"],
+                           "ballots": x["ballots"],
+                           "weight": number(x["weight"]),
+                           "value": number(x["value"])}
+                          for x in record["transfers"]]}
+
+
+def write_jsonl(trace, stream):
+    """
+    writes the trace to a text stream as one json object per round
+
+    :param trace: the round records from StvCount
+    :type trace: list
+    :param stream: the text stream to write to
+    """
+    for record in trace:
+        stream.write(json.dumps(round_to_json(record),
+                                separators=(",", ":")) + "\n")
+
+
+csv_fields = ["round", "record", "candidate", "to", "ballots", "weight",
+              "value", "quota"]
+
+
+def write_csv(trace, stream):
+    """
+    writes the trace to a text stream as csv, one row per candidate total,
+    decision and transfer
+
+    :param trace: the round records from StvCount
+    :type trace: list
+    :param stream: the text stream to write to
+    """
+    writer = csv.writer(stream)
+    writer.writerow(csv_fields)
+    for record in trace:
+        round_num = record["round"]
+        quota = record["quota"]
+        for transfer in record["transfers"]:
+            writer.writerow([round_num, "transfer", transfer["from"],
+                             "exhausted" if transfer["to"] is None
+                             else transfer["to"],
+                             transfer["ballots"],
+                             number(transfer["weight"]),
+                             number(transfer["value"]), quota])
+        for candidate, total in record["totals"].items():
+            writer.writerow([round_num, "total", candidate, "", "", "",
+                             number(total), quota])
+        for decision in ["elected", "eliminated", "tied"]:
+            for candidate in record[decision]:
+                writer.writerow([round_num, decision, candidate, "", "", "",
+                                 "", quota])
+
+
+trace_writers = {"jsonl": write_jsonl, "csv": write_csv}
+
+
+def export_trace(trace, trace_format="jsonl", compress=False):
+    """
+    writes the trace into an in memory file ready to attach to a message
+
+    :param trace: the round records from StvCount
+    :type trace: list
+    :param trace_format: jsonl or csv
+    :type trace_format: str
+    :param compress: whether to gzip the export
+    :type compress: bool
+    :return: the file name and a binary buffer holding the trace
+    :rtype: tuple
+    """
+    return text_export(lambda stream: trace_writers[trace_format](trace,
+                                                                  stream),
+                       "count_trace." + trace_format, compress)
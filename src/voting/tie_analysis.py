@@ -0,0 +1,109 @@
+"""
+Monte Carlo analysis of how fragile an STV election's result is. The count
+is run over and over with ties broken at random and, optionally, with the
+ballots resampled with replacement, and each candidate's share of the wins
+estimates how likely they are to win. The trials are split between the
+counting workers, each with its own seed, and every worker stops at the
+same time budget.
+"""
+from collections import Counter
+import itertools
+import math
+import random
+import time
+
+from voting.stv_count import StvCount
+
+# a worker checks the clock once per batch of trials
+batch_size = 16
+
+
+def simulate(candidates, ballots, seat_count, quota, seconds, seed,
+             bootstrap=True, max_trials=None):
+    """
+    counts an election repeatedly until the time budget runs out
+
+    :param candidates: the candidate ids
+    :type candidates: list
+    :param ballots: the integer encoded ballots
+    :type ballots: list
+    :param seat_count: the number of seats to fill
+    :type seat_count: int
+    :param quota: the number of votes needed to be elected
+    :type quota: int
+    :param seconds: how long to keep running trials for
+    :type seconds: float
+    :param seed: the seed for this worker's random number generator
+    :type seed: int
+    :param bootstrap: whether to resample the ballots for every trial, or
+        only break ties at random
+    :type bootstrap: bool
+    :param max_trials: stop after this many trials, or None for no limit
+    :type max_trials: int or None
+    :return: the number of trials run, and candidate id to the number of
+        trials they won a seat in
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    groups = Counter(tuple(ballot) for ballot in ballots)
+    distinct = list(groups.keys())
+    cum_counts = list(itertools.accumulate(groups.values()))
+    ballot_count = len(ballots)
+
+    wins = Counter()
+    trials = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for _ in range(batch_size):
+            if max_trials is not None and trials >= max_trials:
+                return {"trials": trials, "wins": wins}
+            if bootstrap:
+                drawn = Counter(rng.choices(range(len(distinct)),
+                                            cum_weights=cum_counts,
+                                            k=ballot_count))
+                sample = [distinct[x] for x in drawn]
+                counts = list(drawn.values())
+            else:
+                sample = distinct
+                counts = list(groups.values())
+            count = StvCount(candidates, sample, seat_count, quota, rng=rng,
+                             counts=counts)
+            wins.update(count.run()["winners"])
+            trials += 1
+    return {"trials": trials, "wins": wins}
+
+
+def combine(results):
+    """
+    adds up the trials from every worker
+
+    :param results: what simulate returned in each worker
+    :type results: list
+    :return: the total number of trials, and candidate id to the number of
+        trials they won a seat in
+    :rtype: dict
+    """
+    wins = Counter()
+    for result in results:
+        wins.update(result["wins"])
+    return {"trials": sum(result["trials"] for result in results),
+            "wins": wins}
+
+
+def win_probabilities(results, candidates):
+    """
+    :param results: the combined trials from combine
+    :type results: dict
+    :param candidates: the candidate ids
+    :type candidates: list
+    :return: (candidate id, probability of winning a seat, half width of the
+        95% confidence interval) for every candidate, most likely first
+    :rtype: list
+    """
+    trials = max(1, results["trials"])
+    r_val = []
+    for candidate in candidates:
+        p = results["wins"][candidate] / trials
+        r_val.append((candidate, p, 1.96 * math.sqrt(p * (1 - p) / trials)))
+    r_val.sort(key=lambda row: row[1], reverse=True)
+    return r_val
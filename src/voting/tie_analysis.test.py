@@ -0,0 +1,41 @@
+import unittest
+from voting import tie_analysis
+
+
+class TestTieAnalysis(unittest.TestCase):
+
+    def test_tie_break_only(self):
+        ballots = [(0,), (0,), (1,), (1,), (2,)]
+        results = tie_analysis.simulate(["a", "b", "c"], ballots, 1, 3, 60,
+                                        1, bootstrap=False, max_trials=400)
+        self.assertEqual(results["trials"], 400)
+        self.assertEqual(results["wins"]["c"], 0)
+        self.assertEqual(results["wins"]["a"] + results["wins"]["b"], 400)
+        self.assertGreater(results["wins"]["a"], 100)
+        self.assertGreater(results["wins"]["b"], 100)
+
+    def test_bootstrap(self):
+        ballots = [(0, 1)] * 90 + [(1, 0)] * 10
+        results = tie_analysis.simulate(["a", "b"], ballots, 1, 51, 60, 1,
+                                        max_trials=100)
+        self.assertEqual(results["wins"]["a"], 100)
+
+    def test_time_budget(self):
+        ballots = [(0,), (1,)]
+        results = tie_analysis.simulate(["a", "b"], ballots, 1, 2, 0, 1)
+        self.assertEqual(results["trials"], 0)
+
+    def test_win_probabilities(self):
+        results = tie_analysis.combine([
+            {"trials": 30, "wins": {"a": 30}},
+            {"trials": 70, "wins": {"a": 45, "b": 25}}])
+        rows = tie_analysis.win_probabilities(results, ["a", "b", "c"])
+        self.assertEqual([row[0] for row in rows], ["a", "b", "c"])
+        self.assertAlmostEqual(rows[0][1], 0.75)
+        self.assertAlmostEqual(rows[1][1], 0.25)
+        self.assertAlmostEqual(rows[0][2], 1.96 * (0.75 * 0.25 / 100) ** 0.5)
+        self.assertEqual(rows[2][1:], (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()